@@ -1,12 +1,15 @@
 import streamlit as st
 import pandas as pd
 import time
-import random
-import os
-import csv
 from datetime import datetime
 import plotly.express as px
 import plotly.graph_objects as go
+from src.dataset import load_all, transaction_dicts
+from src.backtest import ThresholdOptimizer
+from src.synthetic import SyntheticGenerator
+from src.timestamps import now_us
+from src.memory import MemoryBudget, deep_size, trim_oldest
+from src.batching import BatchScheduler
 
 # --- PAGE CONFIGURATION ---
 st.set_page_config(
@@ -103,6 +106,13 @@ AGENT_CONFIG = {
     "retryCountThreshold": 3,
     "latencyThreshold": 500,
     "loopIntervalSec": 2,
+    "syntheticFraudRate": 0.15,
+    "syntheticSpamRate": 0.25,
+    "plotRows": 500,
+    "processMemoryBudgetMB": 1024,
+    "memoryBudgetMB": {"transactions": 16, "logs": 1},
+    "minBatchSize": 2,
+    "maxBatchSize": 50,
 }
 
 class Transaction:
@@ -117,6 +127,7 @@ class Transaction:
         self.fraud_probability = float(data.get("fraud_probability", 0))
         self.error_code = data.get("error_code")
         self.retry_count = int(float(data.get("retry_count", 0)))
+        self.is_suspicious = data.get("is_suspicious")
 
 class SentinelAgent:
     def __init__(self):
@@ -128,6 +139,20 @@ class SentinelAgent:
             "blocked": 0,
             "investigated": 0
         }
+        self.optimizer = ThresholdOptimizer()
+        self.learned_threshold = None
+        self.generator = SyntheticGenerator()
+        # Step batch size and refresh interval (at most loopIntervalSec), sized to keep p99 decision latency under latencyThreshold (ms)
+        self.scheduler = BatchScheduler(AGENT_CONFIG["latencyThreshold"], AGENT_CONFIG["minBatchSize"], AGENT_CONFIG["maxBatchSize"],
+                                        max_interval_sec=AGENT_CONFIG["loopIntervalSec"])
+        # Per-session state is budgeted in bytes; each step trims whatever is over
+        self.memory = MemoryBudget(AGENT_CONFIG["processMemoryBudgetMB"])
+        self.memory.track("transactions", lambda: deep_size(self.transactions),
+                          lambda target, size: trim_oldest(self.transactions, size, target),
+                          AGENT_CONFIG["memoryBudgetMB"]["transactions"])
+        self.memory.track("logs", lambda: deep_size(self.logs),
+                          lambda target, size: trim_oldest(self.logs, size, target, newest_first=True),
+                          AGENT_CONFIG["memoryBudgetMB"]["logs"])
 
     def log(self, phase, message):
         timestamp = datetime.now().strftime('%H:%M:%S')
@@ -136,71 +161,23 @@ class SentinelAgent:
         if len(self.logs) > 100: self.logs.pop()
 
     def load_data(self):
-        # Try to load real data, fallback to synthetic
-        paths = [
-            os.path.join("attached_assets", "fraud_data.csv"),
-            os.path.join("..", "datasettt", "fraud_data_20251225_004640.csv")
-        ]
-        
+        # Real data comes from the memory-mapped dataset cache, synthetic tops it up
         count = 0
-        for path in paths:
-            if os.path.exists(path):
-                try:
-                    with open(path, 'r', encoding='utf-8') as f:
-                        reader = csv.reader(f)
-                        header = next(reader, None)
-                        if not header: continue
-                        for row in reader:
-                            if len(row) < 14: continue
-                            try:
-                                status = row[9]
-                                if status.lower() == 'success': status = 'Processed'
-                                elif status.lower() == 'failed': status = 'Failed'
-                                
-                                tx_data = {
-                                    "id": row[1],
-                                    "timestamp": row[2],
-                                    "amount": row[4],
-                                    "merchant": row[7],
-                                    "bank": row[8],
-                                    "status": status,
-                                    "error_code": row[10] if row[10] else None,
-                                    "risk_score": row[13] if row[13] else 0,
-                                    "fraud_probability": (float(row[13] or 0) / 100),
-                                    "retry_count": row[20] if row[20] else 0
-                                }
-                                self.transactions.append(Transaction(tx_data))
-                                count += 1
-                            except: continue
-                except: pass
+        datasets = load_all()
+        self.optimizer.fit_dataset(datasets)
+        self.generator = SyntheticGenerator.from_datasets(datasets, fraud_rate=AGENT_CONFIG["syntheticFraudRate"],
+                                                          spam_rate=AGENT_CONFIG["syntheticSpamRate"])
+        for path, cols in datasets:
+            for tx_data in transaction_dicts(cols):
+                self.transactions.append(Transaction(tx_data))
+                count += 1
         
         self.log("SYSTEM", f"Dataset loaded: {count} historical records.")
         self.generate_synthetic_stream(20) # Init with some data
 
     def generate_synthetic_stream(self, n=5):
-        merchants = ["Amazon", "Walmart", "Apple", "Netflix", "Uber", "Airbnb"]
-        banks = ["HDFC", "SBI", "Axis", "ICICI", "Chase"]
-        error_codes = ["UPI_AUTHENTICATION_FAILED", "INSUFFICIENT_FUNDS", "BANK_SERVER_ERROR", "RISK_CHECK_FAILED"]
-        
-        new_batch = []
-        for i in range(n):
-            is_spam = random.random() < 0.25
-            is_fraud = random.random() < 0.15
-            
-            tx = Transaction({
-                "id": f"TX_{int(time.time())}_{random.randint(1000,9999)}",
-                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "merchant": random.choice(merchants),
-                "amount": round(random.uniform(10, 5000), 2),
-                "bank": random.choice(banks),
-                "status": "Failed" if is_spam else "Processed",
-                "error_code": random.choice(error_codes) if is_spam else None,
-                "risk_score": random.randint(80, 100) if is_fraud else random.randint(0, 30),
-                "fraud_probability": round(random.uniform(0.8, 0.99) if is_fraud else random.uniform(0.01, 0.2), 2),
-                "retry_count": random.randint(4, 10) if is_spam else 0
-            })
-            self.transactions.append(tx)
-            new_batch.append(tx)
+        new_batch = [Transaction(d) for d in self.generator.transactions(n, start_us=now_us())]
+        self.transactions.extend(new_batch)
             
         # Keep list size manageable
         if len(self.transactions) > 1000:
@@ -209,8 +186,9 @@ class SentinelAgent:
         return new_batch
 
     def run_step(self):
+        start = time.perf_counter()
         # 1. OBSERVE (Generate new data)
-        current_batch = self.generate_synthetic_stream(random.randint(2, 5))
+        current_batch = self.generate_synthetic_stream(self.scheduler.batch_size)
         self.stats["processed"] += len(current_batch)
         self.log("OBSERVE", f"Ingested {len(current_batch)} new transactions.")
 
@@ -244,14 +222,20 @@ class SentinelAgent:
                 for a in actions:
                     self.log("ACT", a)
         
-        # 4. LEARN (Feedback Loop)
-        if random.random() < 0.2:
-            direction = random.choice([-0.01, 0.01])
-            new_thresh = max(0.5, min(0.99, self.fraud_threshold + direction))
-            if new_thresh != self.fraud_threshold:
-                self.fraud_threshold = new_thresh
-                self.log("LEARN", f"Adjusted fraud threshold to {self.fraud_threshold:.2f} based on patterns.")
-
+        # 4. LEARN (Feedback Loop: backtest every threshold over labelled outcomes)
+        for t in current_batch:
+            self.optimizer.update(t.fraud_probability, t.is_suspicious)
+        best = self.optimizer.best_threshold()
+        if best is not None and best[0] != self.learned_threshold:
+            self.learned_threshold, precision, recall = best
+            self.fraud_threshold = self.learned_threshold
+            self.log("LEARN", f"Adjusted fraud threshold to {self.fraud_threshold:.2f} (precision {precision:.2f}, recall {recall:.2f}).")
+
+        # 5. MEMORY
+        for name, before, after in self.memory.check():
+            self.log("SYSTEM", f"Memory budget: trimmed {name} from {before / 1e6:.2f} MB to {after / 1e6:.2f} MB.")
+
+        self.scheduler.record(len(current_batch), time.perf_counter() - start)
         return current_batch
 
 # --- INITIALIZATION ---
@@ -293,8 +277,8 @@ with col1:
     # 3D Visualization Section
     st.subheader("🌐 3D Transaction Topology")
     
-    # Prepare data for 3D plot
-    df = pd.DataFrame([vars(t) for t in st.session_state.agent.transactions])
+    # Prepare data for 3D plot; only the newest plotRows are turned into a frame on each rerun
+    df = pd.DataFrame([vars(t) for t in st.session_state.agent.transactions[-AGENT_CONFIG["plotRows"]:]])
     
     if not df.empty:
         # Create 3D Scatter Plot
@@ -348,6 +332,13 @@ with col2:
     else:
         st.text_area("System Output", "System Ready. Initializing...", height=300, disabled=True)
 
+    with st.expander("🧠 Memory"):
+        st.json({name: {"MB": round(m["bytes"] / 1e6, 2), "budget_MB": round(m["budget_bytes"] / 1e6, 2), "evictions": m["evictions"]}
+                 for name, m in st.session_state.agent.memory.metrics().items()})
+
+    with st.expander("⏱️ Batching"):
+        st.json(st.session_state.agent.scheduler.stats())
+
 # Data Table at Bottom
 st.subheader("📋 Recent Transaction Stream")
 if not df.empty:
@@ -359,5 +350,5 @@ if not df.empty:
 # --- AUTONOMOUS LOOP ---
 if st.session_state.running:
     st.session_state.agent.run_step()
-    time.sleep(1) # Refresh rate
+    time.sleep(st.session_state.agent.scheduler.interval_sec) # Refresh rate
     st.rerun()
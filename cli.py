@@ -0,0 +1,409 @@
+import time
+_IMPORT_START = time.perf_counter()
+
+import sys
+import argparse
+from src.profiling import MODES
+
+# Headless entry point: everything below must stay free of Streamlit/Plotly,
+# and pandas is only pulled in by code paths that ask for a DataFrame. The agent,
+# numpy and the benchmarked subsystems are imported by the commands that use them.
+IMPORT_TIME_MS = (time.perf_counter() - _IMPORT_START) * 1000
+IMPORT_BUDGET_MS = 250
+HEAVY_MODULES = ("streamlit", "plotly", "pandas")
+
+def loaded_heavy_modules():
+    return [m for m in HEAVY_MODULES if m in sys.modules]
+
+def print_action_stats(agent):
+    latency = agent.executor.latency_percentiles()
+    print(f"[ACTIONS] {agent.executor.stats} dispatch latency " +
+          (", ".join(f"p{q}={us / 1000:.2f}ms" for q, us in latency.items()) or "n/a"))
+
+def print_tier_stats(agent):
+    fast, slow = agent.tiers.percentiles("fast"), agent.tiers.percentiles("slow")
+    fmt = lambda p: ", ".join(f"p{q}={us:.1f}us" if us < 1000 else f"p{q}={us / 1000:.2f}ms" for q, us in p.items()) or "n/a"
+    print(f"[TIERS] {agent.tiers.stats} fast per-tx {fmt(fast)} (budget {agent.tiers.budget_us}us), slow lag {fmt(slow)}")
+
+def print_memory_stats(agent):
+    agent.memory.check()
+    print("[MEMORY] " + ", ".join(f"{name}={m['bytes'] / 1e6:.1f}/{m['budget_bytes'] / 1e6:.0f}MB ({m['evictions']} evictions)"
+                                  for name, m in agent.memory.metrics().items()))
+
+def print_profile(agent):
+    if agent.profile is not None and agent.profile.done:
+        print(agent.profile.summary)
+        print(f"[PROFILE] wrote {', '.join(agent.profile.files)}")
+
+def arm_profile(agent, args):
+    if args.profile:
+        agent.start_profile(args.profile, args.profile_mode)
+
+def cmd_ingest(args):
+    from src.agent import SentinelAgent
+    from src.models import clear_all_data
+    if args.reset:
+        clear_all_data()
+    agent = SentinelAgent()
+    start = time.perf_counter()
+    agent.load_historical_data()
+    print(f"[INGEST] Historical dataset loaded in {time.perf_counter() - start:.2f}s")
+
+def cmd_run(args):
+    from src.agent import SentinelAgent
+    from src.models import get_recent_transactions
+    agent = SentinelAgent()
+    if args.ring_rate is not None:
+        agent.generator.ring_rate = args.ring_rate
+    if not get_recent_transactions(1):
+        agent.load_historical_data()
+    arm_profile(agent, args)
+    print("[SYSTEM] Sentinel agent running headless. Ctrl+C to stop.")
+    step = 0
+    try:
+        while args.steps is None or step < args.steps:
+            agent.run_step()
+            step += 1
+            if step % 10 == 0:
+                print(f"[{step}] processed={agent.stats['processed']} blocked={agent.stats['blocked']} "
+                      f"investigated={agent.stats['investigated']} threshold={agent.fraud_threshold:.2f} "
+                      f"batch={agent.scheduler.batch_size}")
+            interval = agent.scheduler.interval_sec if args.interval is None else args.interval
+            if interval:
+                time.sleep(interval)
+    except KeyboardInterrupt:
+        print("\n[SYSTEM] Agent stopped by user.")
+    agent.close()
+    print(f"[DONE] {agent.stats}")
+    print_action_stats(agent)
+    print_tier_stats(agent)
+    print_memory_stats(agent)
+    print_profile(agent)
+
+def cmd_replay(args):
+    from src.agent import SentinelAgent
+    agent = SentinelAgent()
+    arm_profile(agent, args)
+    start = time.perf_counter()
+    replayed = agent.replay(batch_size=args.batch, limit=args.limit, resume=args.resume)
+    agent.close()
+    elapsed = time.perf_counter() - start
+    print(f"[REPLAY] {replayed} transactions in {elapsed:.2f}s ({replayed / max(elapsed, 1e-9):.0f} tx/s)")
+    print(f"[DONE] {agent.stats}")
+    print_action_stats(agent)
+    print_tier_stats(agent)
+    print_memory_stats(agent)
+    print_profile(agent)
+
+def cmd_backtest(args):
+    import numpy as np
+    from src.dataset import load_all
+    from src.backtest import sweep
+    from src.models import fraud_probability_history
+    datasets = load_all()
+    if not datasets:
+        print("[BACKTEST] No labelled dataset found.")
+        return 1
+    scores = np.concatenate([cols["fraud_score"] / 100 for _, cols in datasets])
+    labels = np.concatenate([cols["is_suspicious"] for _, cols in datasets])
+    curve = sweep(scores, labels, fp_cost=args.fp_cost, fn_cost=args.fn_cost)
+    # Stored rows carry no label, so the database and archive only give each threshold's block rate
+    history = np.sort(fraud_probability_history())
+    blocked = 1 - np.searchsorted(history, curve["threshold"], side="right") / max(1, len(history))
+    print(f"{'threshold':>9} {'precision':>9} {'recall':>7} {'fp':>6} {'fn':>6} {'cost':>8} {'blocks':>7}")
+    for i in range(len(curve["threshold"])):
+        print(f"{curve['threshold'][i]:>9.2f} {curve['precision'][i]:>9.3f} {curve['recall'][i]:>7.3f} "
+              f"{curve['fp'][i]:>6} {curve['fn'][i]:>6} {curve['cost'][i]:>8.0f} {blocked[i]:>6.1%}")
+    best = int(np.argmin(curve["cost"]))
+    print(f"[BACKTEST] Cheapest threshold over {len(scores)} outcomes: {curve['threshold'][best]:.2f} "
+          f"(blocks {blocked[best]:.1%} of {len(history)} stored and archived transactions)")
+
+def cmd_bench_dedup(args):
+    # Ids are inserted once and then a disjoint set is probed, so every
+    # probable hit on the second pass is a false positive
+    from src.dedup import IngestDeduper
+    stored = set()
+    deduper = IngestDeduper(lambda ids: stored.intersection(ids), capacity=args.capacity, error_rate=args.error_rate)
+    known = [f"TX_{i}" for i in range(args.capacity)]
+    start = time.perf_counter()
+    for i in range(0, len(known), 1000):
+        stored.update(deduper.filter_batch(known[i:i + 1000], key=lambda k: k))
+    insert_s = time.perf_counter() - start
+
+    dropped_before = deduper.stats["duplicates"]
+    deduper.filter_batch(known[:args.probe], key=lambda k: k)
+    print(f"[DEDUP] replayed {args.probe} known ids, dropped {deduper.stats['duplicates'] - dropped_before}")
+
+    fp_before = deduper.stats["false_positives"]
+    fresh = [f"NEW_{i}" for i in range(args.probe)]
+    deduper.filter_batch(fresh, key=lambda k: k)
+    measured = (deduper.stats["false_positives"] - fp_before) / args.probe
+    print(f"[DEDUP] {args.capacity} ids ingested in {insert_s:.2f}s ({args.capacity / insert_s:.0f} ids/s)")
+    print(f"[DEDUP] false-positive rate {measured:.4%} (target {args.error_rate:.4%}), "
+          f"filter memory {deduper.nbytes / 1024:.1f} KiB ({deduper.nbytes * 8 / args.capacity:.1f} bits/id)")
+
+def cmd_bench_generate(args):
+    from src.dataset import load_all
+    from src.synthetic import SyntheticGenerator
+    generator = SyntheticGenerator.from_datasets(load_all(), fraud_rate=args.fraud_rate, spam_rate=args.spam_rate, seed=args.seed,
+                                                 ring_rate=args.ring_rate)
+    generated = fraud = failed = 0
+    start = time.perf_counter()
+    while generated < args.rows:
+        cols = generator.generate(min(args.batch, args.rows - generated))
+        generated += len(cols["seq"])
+        fraud += int(cols["is_suspicious"].sum())
+        failed += int(cols["failed"].sum())
+    gen_s = time.perf_counter() - start
+
+    sample = generator.generate(min(args.rows, 100_000))
+    start = time.perf_counter()
+    generator.decode(sample)
+    decode_s = time.perf_counter() - start
+    print(f"[GENERATE] {generated} rows in {gen_s:.2f}s ({generated / gen_s:,.0f} rows/s, columnar)")
+    print(f"[GENERATE] decode to dataset columns: {len(sample['seq']) / decode_s:,.0f} rows/s")
+    print(f"[GENERATE] fraud rate {fraud / generated:.3%} (target {generator.fraud_rate:.3%}), "
+          f"spam rate {failed / generated:.3%} (target {generator.spam_rate:.3%})")
+
+def _storage_backend(name, db_path, window_sec):
+    from src.storage import MemoryStore, SQLiteStore, TieredStore
+    import sqlite3
+    from src.partitions import init_partitions
+    if name == "memory":
+        return MemoryStore(window_sec)
+    conn = sqlite3.connect(db_path)
+    init_partitions(conn)
+    conn.close()
+    if name == "sqlite":
+        return SQLiteStore(db_path)
+    return TieredStore(SQLiteStore(db_path), window_sec)
+
+def cmd_bench_storage(args):
+    # Same workload on every backend: live traffic spread over the last
+    # span_sec appended in batches, each followed by the agent's reads
+    # (recent rows, the last minute of rows, a dedup lookup of the batch)
+    import os
+    import tempfile
+    from src.timestamps import now_us
+    from src.dataset import load_all
+    from src.storage import TX_COLUMNS
+    from src.synthetic import SyntheticGenerator
+    generator = SyntheticGenerator.from_datasets(load_all(), seed=args.seed)
+    span_us = int(args.span_sec * 1_000_000)
+    rows = [tuple(d[c] for c in TX_COLUMNS) for d in generator.transactions(args.rows, start_us=now_us() - span_us, span_us=span_us)]
+    batches = [rows[i:i + args.batch] for i in range(0, len(rows), args.batch)]
+    print(f"{'backend':>8} {'append/s':>10} {'recent p50':>11} {'range p50':>10} {'exists p50':>11} {'flush':>8}")
+    for name in args.backends:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = _storage_backend(name, os.path.join(tmp, "bench.db"), args.hot_window_sec)
+            timings = {"append": 0.0, "recent": [], "range": [], "exists": []}
+            for batch in batches:
+                start = time.perf_counter()
+                store.append(batch)
+                timings["append"] += time.perf_counter() - start
+                newest = batch[-1][-1]
+                for op, call in (("recent", lambda: store.recent(100)),
+                                 ("range", lambda: store.between(newest - 60_000_000, newest + 1)),
+                                 ("exists", lambda: store.exists([r[0] for r in batch]))):
+                    start = time.perf_counter()
+                    call()
+                    timings[op].append(time.perf_counter() - start)
+            start = time.perf_counter()
+            store.flush()
+            flush_s = time.perf_counter() - start
+            store.close()
+        p50 = lambda xs: sorted(xs)[len(xs) // 2] * 1000
+        print(f"{name:>8} {len(rows) / timings['append']:>10,.0f} {p50(timings['recent']):>9.2f}ms "
+              f"{p50(timings['range']):>8.2f}ms {p50(timings['exists']):>9.2f}ms {flush_s:>7.2f}s")
+
+def cmd_bench_batching(args):
+    # Replays the dataset at a fixed arrival rate with each fixed batch size and
+    # then the adaptive scheduler; decision latency = wait for the batch + queueing + the step itself.
+    # Each mode starts from its own empty temporary database, so no mode sees another's rows
+    import os
+    import tempfile
+    from src import models
+    from src.agent import SentinelAgent, AGENT_CONFIG
+    from src.models import Transaction
+    from src.dataset import load_all, by_event_time, transaction_dicts
+    from src.batching import BatchScheduler, replay_at_rate, percentile
+    txs = [Transaction(d) for _, cols in load_all() for d in transaction_dicts(by_event_time(cols))][:args.limit]
+    if not txs:
+        print("[BATCHING] No dataset found.")
+        return 1
+    latency_ms = args.latency_ms or AGENT_CONFIG["latencyThreshold"]
+    print(f"[BATCHING] {len(txs)} transactions at {args.rate:.0f} tx/s, p99 target {latency_ms:.0f} ms")
+    print(f"{'batch':>9} {'tx/s':>9} {'p50':>9} {'p99':>9} {'max':>9}  within target")
+    modes = [str(size) for size in args.sizes] + ["adaptive"]
+    db_path, archive_dir = models.DB_PATH, models.ARCHIVE_DIR
+    for mode in modes:
+        with tempfile.TemporaryDirectory() as tmp:
+            models.use_database(os.path.join(tmp, "bench.db"), os.path.join(tmp, "archive"))
+            agent = SentinelAgent(checkpoint=False)
+            scheduler = None
+            if mode == "adaptive":
+                scheduler = BatchScheduler(latency_ms, AGENT_CONFIG["minBatchSize"], args.max_batch)
+            latencies, busy = replay_at_rate(txs, args.rate, agent.run_step, scheduler,
+                                             batch_size=int(mode) if scheduler is None else None, wait_sec=latency_ms / 2000)
+            agent.close()
+            models.use_database(db_path, archive_dir)
+        p50, p99 = percentile(latencies, 50) * 1000, percentile(latencies, 99) * 1000
+        label = f"{mode}->{scheduler.batch_size}" if scheduler else mode
+        print(f"{label:>9} {len(txs) / busy:>9,.0f} {p50:>7.1f}ms {p99:>7.1f}ms {max(latencies) * 1000:>7.1f}ms  "
+              f"{'yes' if p99 <= latency_ms else 'no'}")
+
+def cmd_bench_quantiles(args):
+    # Amount sketches per merchant/bank/hour: per-transaction update rate, then a
+    # serial fit against per-process sketches merged in the parent, both scored
+    # against the exact per-merchant quantile
+    import numpy as np
+    from src.dataset import load_all
+    from src.synthetic import SyntheticGenerator
+    from src.quantiles import AmountSketches, fit_parallel
+    cols = SyntheticGenerator.from_datasets(load_all(), seed=args.seed).generate(args.rows)
+    merchants, banks, hours, amounts = cols["upi_app"], cols["bank"], cols["hour_of_day"], cols["amount"]
+    q = args.quantile
+    n = min(args.rows, args.stream_rows)
+    sketches = AmountSketches(args.k, q)
+    start = time.perf_counter()
+    for m, b, h, a in zip(merchants[:n].tolist(), banks[:n].tolist(), hours[:n].tolist(), amounts[:n].tolist()):
+        sketches.observe(m, b, h, a)
+    print(f"[QUANTILES] streaming observe+check: {n / (time.perf_counter() - start):,.0f} tx/s over {n} transactions")
+
+    start = time.perf_counter()
+    serial = AmountSketches(args.k, q)
+    serial.fit(merchants, banks, hours, amounts)
+    serial_s = time.perf_counter() - start
+    start = time.perf_counter()
+    merged = fit_parallel(merchants, banks, hours, amounts, args.processes, args.k)
+    merged_s = time.perf_counter() - start
+    print(f"[QUANTILES] {args.rows} amounts into {len(serial)} sketches: serial {serial_s:.2f}s, "
+          f"{args.processes or 'all'} processes + merge {merged_s:.2f}s; {merged.retained} items retained "
+          f"(~{merged.retained * 8 / 1024:.0f} KiB of values)")
+    print(f"{'merchant':>8} {'count':>9} {'exact':>10} {'serial':>10} {'merged':>10} {'rank err':>9}")
+    for key in sorted(k for kind, k in merged.sketches if kind == "merchant"):
+        values = amounts[merchants == key]
+        exact = float(np.quantile(values, q))
+        sketch = merged.sketches[("merchant", key)]
+        err = abs(float((values <= sketch.quantile(q)).mean()) - q)
+        print(f"{key:>8} {len(values):>9} {exact:>10,.0f} {serial.sketches[('merchant', key)].quantile(q):>10,.0f} "
+              f"{sketch.quantile(q):>10,.0f} {err:>9.5f}")
+
+def cmd_checkpoint(args):
+    # Writes a checkpoint of the current agent state, then times a restart from it
+    # (read + decode + tail catch-up) against a cold start that refits the dataset
+    from src.agent import SentinelAgent
+    from src.models import CHECKPOINT_PATH
+    start = time.perf_counter()
+    agent = SentinelAgent(checkpoint=False)
+    cold_s = time.perf_counter() - start
+    agent.close()
+    agent = SentinelAgent()
+    start = time.perf_counter()
+    size = agent.checkpoint()
+    write_s = time.perf_counter() - start
+    agent.close()
+    start = time.perf_counter()
+    restored = SentinelAgent()
+    restore_s = time.perf_counter() - start
+    restored.close()
+    print(f"[CHECKPOINT] {CHECKPOINT_PATH}: {size / 1024:.0f} KiB written in {write_s * 1000:.0f} ms "
+          f"(offset {restored.offset_us}, {restored.replayed} rows replayed, {restored.stats['processed']} processed)")
+    print(f"[CHECKPOINT] startup: cold fit {cold_s * 1000:.0f} ms, restore {restore_s * 1000:.0f} ms")
+
+def cmd_startup(args):
+    heavy = loaded_heavy_modules()
+    budget = args.budget_ms
+    print(f"[STARTUP] import time {IMPORT_TIME_MS:.1f} ms (budget {budget} ms)")
+    print(f"[STARTUP] heavy modules loaded: {', '.join(heavy) or 'none'}")
+    if IMPORT_TIME_MS > budget or heavy:
+        print("[STARTUP] FAILED")
+        return 1
+    print("[STARTUP] OK")
+    return 0
+
+def add_profile_args(p):
+    p.add_argument("--profile", type=int, default=0, metavar="N", help="profile the first N agent steps")
+    p.add_argument("--profile-mode", choices=MODES, default="cprofile")
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Sentinel AI headless agent")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("ingest", help="load the historical dataset into the database")
+    p.add_argument("--reset", action="store_true", help="clear all data first")
+    p.set_defaults(func=cmd_ingest)
+
+    p = sub.add_parser("run", help="run the agent loop on the synthetic stream")
+    p.add_argument("--steps", type=int, default=None, help="stop after N steps (default: run forever)")
+    p.add_argument("--interval", type=float, default=None,
+                   help="seconds to sleep between steps (default: the batch scheduler's flush interval)")
+    p.add_argument("--ring-rate", type=float, default=None,
+                   help="share of synthetic fraud drawn from an injected ring (default: syntheticRingRate)")
+    add_profile_args(p)
+    p.set_defaults(func=cmd_run)
+
+    p = sub.add_parser("replay", help="replay the historical dataset through the agent")
+    p.add_argument("--batch", type=int, default=None, help="fixed batch size (default: adaptive)")
+    p.add_argument("--limit", type=int, default=None)
+    p.add_argument("--resume", action="store_true", help="skip the rows replayed before the last checkpoint")
+    add_profile_args(p)
+    p.set_defaults(func=cmd_replay)
+
+    p = sub.add_parser("backtest", help="sweep every fraud threshold over the labelled dataset and stored history")
+    p.add_argument("--fp-cost", type=float, default=1.0)
+    p.add_argument("--fn-cost", type=float, default=5.0)
+    p.set_defaults(func=cmd_backtest)
+
+    p = sub.add_parser("bench-dedup", help="measure the ingest dedup filter's false-positive rate and memory")
+    p.add_argument("--capacity", type=int, default=100_000)
+    p.add_argument("--error-rate", type=float, default=0.001)
+    p.add_argument("--probe", type=int, default=100_000)
+    p.set_defaults(func=cmd_bench_dedup)
+
+    p = sub.add_parser("bench-generate", help="measure synthetic traffic generation throughput")
+    p.add_argument("--rows", type=int, default=10_000_000)
+    p.add_argument("--batch", type=int, default=1_000_000)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--fraud-rate", type=float, default=None, help="override the fitted fraud injection rate")
+    p.add_argument("--spam-rate", type=float, default=None, help="override the fitted spam injection rate")
+    p.add_argument("--ring-rate", type=float, default=0.0, help="share of fraud drawn from the injected ring")
+    p.set_defaults(func=cmd_bench_generate)
+
+    p = sub.add_parser("bench-storage", help="compare the memory, SQLite and tiered transaction stores")
+    p.add_argument("--rows", type=int, default=50_000)
+    p.add_argument("--batch", type=int, default=50)
+    p.add_argument("--span-sec", type=float, default=1800, help="traffic is spread over this many seconds up to now")
+    p.add_argument("--hot-window-sec", type=float, default=900)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--backends", nargs="+", choices=("memory", "sqlite", "tiered"), default=["memory", "sqlite", "tiered"])
+    p.set_defaults(func=cmd_bench_storage)
+
+    p = sub.add_parser("bench-batching", help="compare fixed and adaptive batch sizes on a rate-limited replay")
+    p.add_argument("--rate", type=float, default=2000, help="arrival rate in transactions per second")
+    p.add_argument("--limit", type=int, default=20_000)
+    p.add_argument("--latency-ms", type=float, default=None, help="p99 decision latency target (default: latencyThreshold)")
+    p.add_argument("--sizes", type=int, nargs="+", default=[1, 10, 100, 1000], help="fixed batch sizes to compare")
+    p.add_argument("--max-batch", type=int, default=5000)
+    p.set_defaults(func=cmd_bench_batching)
+
+    p = sub.add_parser("bench-quantiles", help="measure amount quantile sketch speed, size and accuracy")
+    p.add_argument("--rows", type=int, default=1_000_000)
+    p.add_argument("--stream-rows", type=int, default=200_000, help="rows pushed through the per-transaction path")
+    p.add_argument("--k", type=int, default=200)
+    p.add_argument("--quantile", type=float, default=0.995)
+    p.add_argument("--processes", type=int, default=None)
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(func=cmd_bench_quantiles)
+
+    p = sub.add_parser("checkpoint", help="write an agent checkpoint and time a restore from it")
+    p.set_defaults(func=cmd_checkpoint)
+
+    p = sub.add_parser("startup", help="check import time and heavy-module usage")
+    p.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    p.set_defaults(func=cmd_startup)
+    return parser
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    sys.exit(args.func(args) or 0)
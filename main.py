@@ -1,9 +1,9 @@
 import streamlit as st
 import time
-import pandas as pd
 from src.agent import SentinelAgent
 from src.ui import apply_custom_styles, render_3d_plot
-from src.models import get_recent_transactions, get_logs, clear_all_data
+from src.models import get_recent_transactions, get_topology, get_logs, find_logs, get_alerts, clear_all_data, transactions_dataframe
+from src.timestamps import format_us
 
 # Page Configuration
 st.set_page_config(
@@ -43,6 +43,8 @@ with col_ctrl2:
 
 with col_ctrl3:
     if st.button("🔄 RESET ALL", key="reset_btn"):
+        # The old agent's threads finish writing before the database is cleared
+        st.session_state.agent.close()
         clear_all_data()
         st.session_state.agent = SentinelAgent() # Re-init
         st.session_state.agent.load_historical_data()
@@ -53,12 +55,13 @@ with col_ctrl3:
 col1, col2 = st.columns([2, 1])
 
 # Fetch Data for Display
-recent_txs = get_recent_transactions(200) # Get last 200 for 3D plot
+recent_txs = get_recent_transactions(200)
 logs = get_logs(100)
+alerts = get_alerts(20)
 
 with col1:
     st.subheader("🌐 3D Transaction Topology")
-    render_3d_plot(recent_txs)
+    render_3d_plot(get_topology(200))
 
 with col2:
     st.subheader("📊 System Vitality")
@@ -74,16 +77,27 @@ with col2:
     st.markdown("---")
     
     st.subheader("💻 Neural Link Logs")
+    log_query = st.text_input("Search logs", key="log_query")
+    if log_query:
+        logs = find_logs(log_query, 100)
     if logs:
         log_text = "\n".join(logs)
         st.text_area("System Output", log_text, height=300, disabled=True, key=f"logs_{time.time()}")
     else:
         st.text_area("System Output", "System Ready. Initializing...", height=300, disabled=True)
 
+    st.subheader("🚨 Coalesced Alerts")
+    if alerts:
+        st.text_area("Alerts", "\n".join(
+            f"[{format_us(first, '%H:%M:%S')}-{format_us(last, '%H:%M:%S')}] {action} {key} x{count}"
+            for action, key, message, count, first, last in alerts), height=200, disabled=True, key=f"alerts_{time.time()}")
+    else:
+        st.caption("No alerts raised yet.")
+
 # Data Table
 st.subheader("📋 Recent Transaction Stream")
 if recent_txs:
-    df = pd.DataFrame([vars(t) for t in recent_txs])
+    df = transactions_dataframe(recent_txs)
     st.dataframe(
         df[['timestamp', 'id', 'merchant', 'amount', 'bank', 'status', 'fraud_probability', 'error_code']].head(10),
         use_container_width=True
@@ -3,17 +3,81 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import sqlite3
+import threading
 import time
-import random
-import os
-import csv
-from datetime import datetime
+from src.archive import seal_from_db, clear_archive, ArchiveReader
+from src.dataset import load_all, transaction_dicts
+from src.backtest import ThresholdOptimizer
+from src.dedup import IngestDeduper
+from src.synthetic import SyntheticGenerator, new_id_prefix
+from src.rings import FraudRingGraph, ring_entities
+from src.hll import DistinctFeatures
+from src.logstore import init_logs, write_log, recent_logs, search_logs, clear_logs
+from src.alerts import AlertCoalescer, init_alerts, write_alerts, clear_alerts
+from src.profiling import MODES as PROFILE_MODES, ProfileCapture, capture_from_env
+from src.memory import MemoryBudget, track_agent_state
+from src.batching import BatchScheduler
+from src.tiers import TierLatency, SlowPath
+from src.quantiles import AmountSketches, local_hour
+from src.baselines import KINDS, EntityBaselines, init_baselines, write_baselines, read_baselines, clear_baselines
+from src.checkpoint import encode, write_checkpoint, read_checkpoint, remove_checkpoint
+from src.metrics import record_cycle, record_ingest, watch_agent, serve_metrics
+from src.actions import Action, ActionExecutor, StubHandler, init_actions, write_actions, write_action_results, read_actions_since, clear_actions
+from src.timestamps import to_epoch_us, now_us, format_us
+from src.partitions import init_partitions, drop_all_partitions, drop_partitions_before
+from src.storage import TX_COLUMNS, SQLiteStore, TieredStore
+from src.explorer import LIST_FILTERS, page_transactions, distinct_values
 
 # --- CONFIGURATION ---
 DB_PATH = "sentinel_core.db"
+ARCHIVE_DIR = "sentinel_core_archive"
+# What the 3D topology plots and shows on hover
+TOPOLOGY_COLUMNS = ("amount", "risk_score", "fraud_probability", "status", "merchant", "bank", "error_code")
+# Agent state snapshot: a restart resumes from it instead of refitting the dataset. One session per
+# server process owns it (see checkpoint_owner()); the others neither restore nor write it
+CHECKPOINT_PATH = "sentinel_core_state.ckpt"
 AGENT_CONFIG = {
     "highRiskThreshold": 20,
     "retryCountThreshold": 3,
+    "partitionSec": 24 * 3600,
+    "hotWindowSec": 15 * 60,
+    "archiveAfterSec": 24 * 3600,
+    "archiveExpired": True,
+    "archiveEveryCycles": 50,
+    "dedupCapacity": 100_000,
+    "syntheticFraudRate": 0.1,
+    "syntheticSpamRate": 0.2,
+    "syntheticRingRate": 0.0,
+    "ringMinBlocks": 1,
+    "ringMinSize": 3,
+    "ringTtlSec": 24 * 3600,
+    "ringMaxEntities": 100_000,
+    "distinctWindowSec": 600,
+    "subnetDeviceThreshold": 5,
+    "deviceBankThreshold": 6,
+    "deviceAppThreshold": 5,
+    "alertWindowSec": 300,
+    "actionWorkers": 4,
+    "actionMaxPending": 1000,
+    "processMemoryBudgetMB": 1024,
+    "memoryBudgetMB": {"hot_store": 64, "fraud_rings": 64, "distinct_features": 32},
+    "memoryCheckEvery": 10,
+    "metricsPort": 9109,
+    "latencyThreshold": 500,
+    "fastPathBudgetUs": 200,
+    "slowPathMaxPending": 100,
+    "ringBlockAfterBlocks": 3,
+    "baselineAlpha": 0.01,
+    "baselineFastAlpha": 0.1,
+    "baselineMinSamples": 30,
+    "baselineZ": 4.0,
+    "baselineSaveEvery": 20,
+    "amountQuantile": 0.995,
+    "amountSketchK": 200,
+    "amountMinCount": 200,
+    "minBatchSize": 1,
+    "maxBatchSize": 50,
+    "checkpointEveryCycles": 20,
 }
 
 # --- DATABASE LAYER ---
@@ -26,63 +90,70 @@ def init_db():
     try:
         conn = get_db_connection()
         c = conn.cursor()
-        c.execute('''CREATE TABLE IF NOT EXISTS transactions (
-            id TEXT PRIMARY KEY,
-            timestamp TEXT,
-            merchant TEXT,
-            amount REAL,
-            bank TEXT,
-            status TEXT,
-            risk_score INTEGER,
-            fraud_probability REAL,
-            error_code TEXT,
-            retry_count INTEGER
-        )''')
-        c.execute('''CREATE TABLE IF NOT EXISTS logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TEXT,
-            phase TEXT,
-            message TEXT,
-            details TEXT
-        )''')
         c.execute('''CREATE TABLE IF NOT EXISTS config (
             key TEXT PRIMARY KEY,
             value TEXT
         )''')
         c.execute("INSERT OR IGNORE INTO config (key, value) VALUES ('fraud_threshold', '0.8')")
-        
-        # Check if column exists before adding (migration)
-        try:
-            c.execute("SELECT details FROM logs LIMIT 1")
-        except sqlite3.OperationalError:
-            c.execute("ALTER TABLE logs ADD COLUMN details TEXT")
-            
         conn.commit()
+        # Structured, compressed log details with a full-text index over messages and reasons
+        init_logs(conn)
+        init_alerts(conn)
+        init_actions(conn)
+        init_baselines(conn)
+        # Transactions live in per-partitionSec tables behind the `transactions` view
+        init_partitions(conn, AGENT_CONFIG["partitionSec"])
     except Exception as e:
         print(f"DB Init Error: {e}")
     finally:
         conn.close()
 
+@st.cache_resource
+def get_store():
+    # One hot tier per server process, kept across script reruns; SQLite is written behind it
+    return TieredStore(SQLiteStore(DB_PATH, AGENT_CONFIG["partitionSec"]), AGENT_CONFIG["hotWindowSec"])
+
+@st.cache_resource
+def checkpoint_owner():
+    # Held by the agent that owns CHECKPOINT_PATH, kept across script reruns like the store
+    return threading.Lock()
+
+def _tx_frame(rows):
+    return pd.DataFrame(rows, columns=TX_COLUMNS)
+
+def _tx_row(tx):
+    # ts_us is normalized once at ingest; text timestamps are kept only for display
+    if not tx.get("ts_us"):
+        tx["ts_us"] = to_epoch_us(tx["timestamp"]) or 0
+    return tuple(tx[col] for col in TX_COLUMNS)
+
 def db_save_transaction(tx):
+    db_save_transactions([tx])
+
+def db_save_transactions(txs):
     try:
-        conn = get_db_connection()
-        c = conn.cursor()
-        c.execute('''INSERT OR REPLACE INTO transactions VALUES (?,?,?,?,?,?,?,?,?,?)''',
-                  (tx["id"], tx["timestamp"], tx["merchant"], tx["amount"], tx["bank"], 
-                   tx["status"], tx["risk_score"], tx["fraud_probability"], tx["error_code"], tx["retry_count"]))
-        conn.commit()
+        get_store().append([_tx_row(tx) for tx in txs])
     except Exception as e:
         print(f"DB Save Error: {e}")
-    finally:
-        conn.close()
 
-def db_log_event(phase, message, details=""):
+def db_existing_ids(ids):
+    try:
+        return get_store().exists(ids)
+    except Exception as e:
+        print(f"DB Lookup Error: {e}")
+        return set()
+
+def db_recent_ids(limit):
+    try:
+        return get_store().recent_ids(limit)
+    except Exception as e:
+        print(f"DB Lookup Error: {e}")
+        return []
+
+def db_log_event(phase, message, details=None, reasons=()):
     try:
         conn = get_db_connection()
-        c = conn.cursor()
-        ts = datetime.now().strftime('%H:%M:%S')
-        c.execute("INSERT INTO logs (timestamp, phase, message, details) VALUES (?,?,?,?)", (ts, phase, message, str(details)))
-        conn.commit()
+        write_log(conn, phase, message, details, reasons)
     except Exception as e:
         print(f"DB Log Error: {e}")
     finally:
@@ -90,27 +161,155 @@ def db_log_event(phase, message, details=""):
 
 def db_get_recent_tx(limit=200):
     try:
-        conn = get_db_connection()
-        df = pd.read_sql_query(f"SELECT * FROM transactions ORDER BY timestamp DESC LIMIT {limit}", conn)
+        return _tx_frame(get_store().recent(limit))
+    except Exception as e:
+        print(f"DB Fetch Error: {e}")
+        return pd.DataFrame()
+
+def db_get_topology(limit=500):
+    # Newest stored transactions, then archived ones once retention has sealed the older history
+    try:
+        df = db_get_recent_tx(limit)[list(TOPOLOGY_COLUMNS)]
+        archived = ArchiveReader(ARCHIVE_DIR).newest(limit - len(df), TOPOLOGY_COLUMNS)
+        if len(archived["amount"]):
+            df = pd.concat([df, pd.DataFrame(archived)], ignore_index=True)
         return df
     except Exception as e:
         print(f"DB Fetch Error: {e}")
         return pd.DataFrame()
+
+def db_get_tx_between(start_us, end_us, limit=None):
+    # Half-open [start_us, end_us), newest first; the hot window is served from memory
+    try:
+        return _tx_frame(get_store().between(start_us, end_us, limit))
+    except Exception as e:
+        print(f"DB Fetch Error: {e}")
+        return pd.DataFrame()
+
+def db_page_tx(filters, after=None, limit=100):
+    # One keyset page of the explorer, filtered in SQL; returns (DataFrame, next cursor)
+    conn = None
+    try:
+        conn = get_db_connection()
+        rows, cursor = page_transactions(conn, filters, after, limit)
+        return _tx_frame(rows), cursor
+    except Exception as e:
+        print(f"DB Fetch Error: {e}")
+        return pd.DataFrame(), None
     finally:
-        conn.close()
+        if conn is not None:
+            conn.close()
+
+@st.cache_data(ttl=60)
+def db_tx_filter_options():
+    conn = None
+    try:
+        conn = get_db_connection()
+        return {col: distinct_values(conn, col) for col in LIST_FILTERS}
+    except Exception as e:
+        print(f"DB Fetch Error: {e}")
+        return {col: [] for col in LIST_FILTERS}
+    finally:
+        if conn is not None:
+            conn.close()
+
+def db_get_tx_since(seconds, limit=None):
+    end = now_us()
+    return db_get_tx_between(end - int(seconds * 1_000_000), end + 1, limit)
 
 def db_get_logs(limit=50):
     try:
         conn = get_db_connection()
-        c = conn.cursor()
-        c.execute("SELECT timestamp, phase, message, details FROM logs ORDER BY id DESC LIMIT ?", (limit,))
-        return c.fetchall()
+        return [(ts, phase, msg, details) for ts, phase, msg, _, details in recent_logs(conn, limit)]
     except Exception as e:
         print(f"DB Log Fetch Error: {e}")
         return []
     finally:
         conn.close()
 
+def db_search_logs(text, limit=50, phases=None):
+    # Indexed full-text search; rows are (full date-time, phase, message, details)
+    try:
+        conn = get_db_connection()
+        return [(format_us(ts_us), phase, msg, details) for _, phase, msg, ts_us, details in search_logs(conn, text, limit, phases)]
+    except Exception as e:
+        print(f"DB Log Search Error: {e}")
+        return []
+    finally:
+        conn.close()
+
+def db_save_alerts(coalescer):
+    try:
+        conn = get_db_connection()
+        return write_alerts(conn, coalescer)
+    except Exception as e:
+        print(f"DB Alert Save Error: {e}")
+        return 0
+    finally:
+        conn.close()
+
+def db_save_actions(actions):
+    try:
+        conn = get_db_connection()
+        write_actions(conn, actions)
+    except Exception as e:
+        print(f"DB Action Save Error: {e}")
+    finally:
+        conn.close()
+
+def db_save_action_results(actions):
+    if not actions:
+        return
+    try:
+        conn = get_db_connection()
+        write_action_results(conn, actions)
+    except Exception as e:
+        print(f"DB Action Update Error: {e}")
+    finally:
+        conn.close()
+
+def db_save_baselines(baselines):
+    try:
+        conn = get_db_connection()
+        return write_baselines(conn, baselines)
+    except Exception as e:
+        print(f"DB Baseline Save Error: {e}")
+        return 0
+    finally:
+        conn.close()
+
+def db_get_actions_since(since_us):
+    try:
+        conn = get_db_connection()
+        return [tuple(row) for row in read_actions_since(conn, since_us)]
+    except Exception as e:
+        print(f"DB Action Fetch Error: {e}")
+        return []
+    finally:
+        conn.close()
+
+def db_load_baselines():
+    try:
+        conn = get_db_connection()
+        return [tuple(row) for row in read_baselines(conn)]
+    except Exception as e:
+        print(f"DB Baseline Load Error: {e}")
+        return []
+    finally:
+        conn.close()
+
+def db_get_alerts(limit=50):
+    try:
+        conn = get_db_connection()
+        df = pd.read_sql_query("SELECT action, alert_key, message, count, first_seen_us, last_seen_us FROM alerts "
+                               "ORDER BY last_seen_us DESC LIMIT ?", conn, params=(limit,))
+        return df
+    except Exception as e:
+        print(f"DB Alert Fetch Error: {e}")
+        return pd.DataFrame()
+    finally:
+        conn.close()
+
 def db_get_config(key, default):
     try:
         conn = get_db_connection()
@@ -138,16 +337,39 @@ def db_set_config(key, value):
 def db_reset():
     try:
         conn = get_db_connection()
+        get_store().clear_hot()
         c = conn.cursor()
-        c.execute("DELETE FROM transactions")
-        c.execute("DELETE FROM logs")
+        clear_logs(conn)
         c.execute("UPDATE config SET value='0.8' WHERE key='fraud_threshold'")
         conn.commit()
+        clear_alerts(conn)
+        clear_actions(conn)
+        clear_baselines(conn)
+        drop_all_partitions(conn)
+        clear_archive(ARCHIVE_DIR)
+        remove_checkpoint(CHECKPOINT_PATH)
     except Exception as e:
         print(f"DB Reset Error: {e}")
     finally:
         conn.close()
 
+def db_archive_old(max_age_sec, archive=True):
+    # Retention: expired partitions are sealed into the archive (optional) and dropped whole
+    conn = None
+    try:
+        conn = get_db_connection()
+        get_store().flush()
+        cutoff_us = now_us() - int(max_age_sec * 1_000_000)
+        if archive:
+            return seal_from_db(conn, cutoff_us, ARCHIVE_DIR)
+        return drop_partitions_before(conn, cutoff_us)
+    except Exception as e:
+        print(f"DB Archive Error: {e}")
+        return None
+    finally:
+        if conn is not None:
+            conn.close()
+
 # --- AGENT LOGIC ---
 class SentinelAgent:
     def __init__(self):
@@ -157,7 +379,162 @@ class SentinelAgent:
             "blocked": 0,
             "investigated": 0
         }
+        self.cycles = 0
+        self.learned_threshold = None
+        # Newest transaction decided on; a restore replays what was stored after it
+        self.offset_us = 0
+        # Cycle batch size and rerun interval, sized to keep p99 decision latency under latencyThreshold (ms)
+        self.scheduler = BatchScheduler(AGENT_CONFIG["latencyThreshold"], AGENT_CONFIG["minBatchSize"], AGENT_CONFIG["maxBatchSize"])
+        # The owning session resumes from the last checkpoint if there is one; otherwise (and
+        # in every other session) everything is fitted to the dataset
+        self.checkpointing = checkpoint_owner().acquire(blocking=False)
+        state = read_checkpoint(CHECKPOINT_PATH) if self.checkpointing else None
+        if state is not None:
+            self.restore(state)
+        else:
+            self.fit(load_all())
+        # Downstream action handlers by action type ("*" catches the rest); the stub just records calls
+        self.executor = ActionExecutor({"*": StubHandler()}, max_workers=AGENT_CONFIG["actionWorkers"],
+                                       max_pending=AGENT_CONFIG["actionMaxPending"])
+        # Threshold rules decide inline; ring/sketch enrichments escalate later from the slow path
+        self.tiers = TierLatency(AGENT_CONFIG["fastPathBudgetUs"])
+        self.slow_path = SlowPath(self.enrich, self.tiers, max_pending=AGENT_CONFIG["slowPathMaxPending"])
+        # Byte budgets for the in-process state, shrunk before the process outgrows its limit
+        self.memory = MemoryBudget(AGENT_CONFIG["processMemoryBudgetMB"])
+        track_agent_state(self.memory, get_store(), self.rings, self.distinct, AGENT_CONFIG["memoryBudgetMB"])
+        # Prometheus text format on http://127.0.0.1:<metricsPort>/metrics, one endpoint per server process
+        watch_agent(self, get_store())
+        serve_metrics(AGENT_CONFIG["metricsPort"])
+        self.deduper = IngestDeduper(db_existing_ids, capacity=AGENT_CONFIG["dedupCapacity"])
+        if state is not None:
+            self.deduper.filter = state["dedup"]
+            self.catch_up(state["saved_us"])
+        else:
+            self.deduper.warm(db_recent_ids(AGENT_CONFIG["dedupCapacity"]))
+        # Profiling capture of the next N run_cycle calls (SENTINEL_PROFILE or Settings); None when off
+        self.profile = capture_from_env(self, "run_cycle")
+
+    def fit(self, datasets):
+        # Cold start; the dataset stands in for everything stored up to now
+        self.offset_us = now_us()
+        self.optimizer = ThresholdOptimizer()
+        self.optimizer.fit_dataset(datasets)
+        self.generator = SyntheticGenerator.from_datasets(datasets, fraud_rate=AGENT_CONFIG["syntheticFraudRate"],
+                                                          spam_rate=AGENT_CONFIG["syntheticSpamRate"],
+                                                          ring_rate=AGENT_CONFIG["syntheticRingRate"])
+        # Per-bank/merchant running baselines: the last save if there is one, else fitted to the dataset
+        self.baselines = EntityBaselines(AGENT_CONFIG["baselineAlpha"], AGENT_CONFIG["baselineFastAlpha"],
+                                         AGENT_CONFIG["baselineMinSamples"])
+        saved = db_load_baselines()
+        if saved:
+            self.baselines.load(saved)
+        else:
+            self.baselines.fit_dataset(datasets)
+            db_save_baselines(self.baselines)
+        # Amount quantile sketches per merchant, bank and hour of day, seeded from the dataset
+        self.amounts = AmountSketches(AGENT_CONFIG["amountSketchK"], AGENT_CONFIG["amountQuantile"], AGENT_CONFIG["amountMinCount"])
+        self.amounts.fit_dataset(datasets)
+        # Wall-clock windows, so checkpointed timestamps stay valid in the next process
+        self.rings = FraudRingGraph(ttl_sec=AGENT_CONFIG["ringTtlSec"], max_entities=AGENT_CONFIG["ringMaxEntities"], clock=time.time)
+        self.distinct = DistinctFeatures(window_sec=AGENT_CONFIG["distinctWindowSec"], clock=time.time)
+        self.alerts = AlertCoalescer(window_sec=AGENT_CONFIG["alertWindowSec"])
+
+    def state(self):
+        return {
+            "saved_us": now_us(),
+            "stats": dict(self.stats),
+            "cycles": self.cycles,
+            "learned_threshold": self.learned_threshold,
+            "offset_us": self.offset_us,
+            "batch": (self.scheduler.batch_size, self.scheduler.interval_sec),
+            "optimizer": self.optimizer,
+            "generator": self.generator,
+            "baselines": self.baselines,
+            "amounts": self.amounts,
+            "rings": self.rings,
+            "distinct": self.distinct,
+            "alerts": self.alerts,
+            "dedup": self.deduper.filter,
+        }
+
+    def restore(self, state):
+        for name in ("stats", "cycles", "learned_threshold", "offset_us", "optimizer",
+                     "generator", "baselines", "amounts", "rings", "distinct", "alerts"):
+            setattr(self, name, state[name])
+        self.scheduler.resume(*state["batch"])
+        # New id namespace: the saved sequence was already used before the checkpoint
+        self.generator.id_prefix = new_id_prefix()
+        self.generator.seq = 0
+
+    def checkpoint(self):
+        # Snapshot under the slow path's lock, without waiting for its queue; written atomically.
+        # Only the owning session writes it
+        if not self.checkpointing:
+            return 0
+        with self.slow_path.lock:
+            blob = encode(self.state())
+        return write_checkpoint(CHECKPOINT_PATH, blob)
+
+    def catch_up(self, saved_us):
+        # Transactions stored since the checkpoint were decided on already: learn from them
+        # and count their actions. Stored rows have no device/IP or label, so the rings,
+        # distinct counts and backtest stay as checkpointed.
+        start = time.perf_counter()
+        tail = db_get_tx_between(self.offset_us + 1, now_us() + 1)
+        tail = tail.to_dict("records")[::-1] if not tail.empty else []
+        actions = db_get_actions_since(saved_us)
+        for t in tail:
+            for kind in KINDS:
+                if t[kind]:
+                    self.baselines.observe(kind, t[kind], t["amount"], t["status"] == 'Failed', t["retry_count"])
+            self.amounts.observe(t["merchant"], t["bank"], local_hour(t["ts_us"]), t["amount"])
+            self.offset_us = max(self.offset_us, int(t["ts_us"]))
+        self.deduper.warm(t["id"] for t in tail)
+        self.stats["processed"] += len(tail)
+        for action_type, _ in actions:
+            self.stats["blocked" if action_type == "BLOCK" else "investigated"] += 1
+        db_log_event("SYSTEM", f"Session restored from checkpoint: {self.stats['processed']} processed, "
+                     f"{len(tail)} newer transactions replayed in {(time.perf_counter() - start) * 1000:.0f} ms.")
     
+    def baseline_reasons(self, t, spikes):
+        # z-scores against the bank's and merchant's running baselines (scored, then learned);
+        # failure-rate spikes are per entity and collected into spikes
+        reasons = []
+        limit = AGENT_CONFIG["baselineZ"]
+        for kind in KINDS:
+            entity = t[kind]
+            scores = self.baselines.observe(kind, entity, t["amount"], t["status"] == 'Failed', t["retry_count"]) if entity else None
+            if scores is None:
+                continue
+            amount_z, retry_z, failure_z = scores
+            if abs(amount_z) > limit:
+                reasons.append(f"amount {t['amount']:,.0f} is {amount_z:+.1f} sd from {entity}'s baseline")
+            if retry_z > limit:
+                reasons.append(f"{t['retry_count']} retries is {retry_z:+.1f} sd above {entity}'s baseline")
+            if failure_z > limit:
+                spikes[(kind, entity)] = (failure_z, t["id"])
+        return reasons
+
+    def amount_reasons(self, t):
+        # Amounts above the merchant's quantile cutoff, naming any bank/hour cutoffs also exceeded
+        above = self.amounts.observe(t["merchant"], t["bank"], local_hour(t["ts_us"]), t["amount"])
+        if not any(kind == "merchant" for kind, _, _ in above):
+            return None
+        label = f"p{AGENT_CONFIG['amountQuantile'] * 100:g}"
+        return f"amount {t['amount']:,.0f} above {label} of " + ", ".join(
+            f"{key:02d}h ({cutoff:,.0f})" if kind == "hour" else f"{key} ({cutoff:,.0f})" for kind, key, cutoff in above)
+
+    def shared_infra_reasons(self, features):
+        # Approximate (HyperLogLog) distinct counts, so thresholds carry a few percent of slack
+        reasons = []
+        if features["subnet_devices"] > AGENT_CONFIG["subnetDeviceThreshold"]:
+            reasons.append(f"{features['subnet_devices']} devices on {features['subnet']}")
+        if features["device_banks"] > AGENT_CONFIG["deviceBankThreshold"]:
+            reasons.append(f"device used {features['device_banks']} banks")
+        if features["device_apps"] > AGENT_CONFIG["deviceAppThreshold"]:
+            reasons.append(f"device used {features['device_apps']} UPI apps")
+        return reasons
+
     @property
     def fraud_threshold(self):
         return float(db_get_config("fraud_threshold", 0.8))
@@ -167,95 +544,172 @@ class SentinelAgent:
         db_set_config("fraud_threshold", value)
 
     def load_data(self):
-        paths = [
-            os.path.join("attached_assets", "fraud_data.csv"),
-            os.path.join("..", "datasettt", "fraud_data_20251225_004640.csv")
-        ]
         count = 0
-        for path in paths:
-            if os.path.exists(path):
-                try:
-                    with open(path, 'r', encoding='utf-8') as f:
-                        reader = csv.reader(f)
-                        next(reader, None)
-                        for row in reader:
-                            if len(row) < 14: continue
-                            try:
-                                status = 'Processed' if row[9].lower() == 'success' else 'Failed'
-                                tx = {
-                                    "id": row[1], "timestamp": row[2], "amount": float(row[4] or 0),
-                                    "merchant": row[7], "bank": row[8], "status": status,
-                                    "error_code": row[10] if row[10] else None,
-                                    "risk_score": int(float(row[13] or 0)),
-                                    "fraud_probability": float(row[13] or 0)/100,
-                                    "retry_count": int(float(row[20] or 0))
-                                }
-                                db_save_transaction(tx)
-                                count += 1
-                            except: continue
-                except: pass
+        for path, cols in load_all():
+            received = list(transaction_dicts(cols))
+            txs = self.deduper.filter_batch(received, key=lambda t: t["id"])
+            record_ingest("historical", len(received), len(txs))
+            db_save_transactions(txs)
+            count += len(txs)
         db_log_event("SYSTEM", f"Initialized with {count} historical records.")
 
+    def enrich(self, batch, blocked):
+        # Slow path, on the SlowPath thread: ring membership and shared-infrastructure
+        # fan-out; rings with ringBlockAfterBlocks prior blocks are blocked outright
+        actions = []
+        blocked = list(blocked)
+        blocked_ids = {t["id"] for t in blocked}
+        for t in batch:
+            ring = self.rings.observe(ring_entities(t["device_fingerprint"], t["ip_address"]), t["amount"], now=t["ts_us"] / 1_000_000)
+            if ring and ring["size"] >= AGENT_CONFIG["ringMinSize"] and ring["blocked"] >= AGENT_CONFIG["ringMinBlocks"]:
+                if ring["blocked"] >= AGENT_CONFIG["ringBlockAfterBlocks"] and t["id"] not in blocked_ids:
+                    actions.append(Action("BLOCK", "Fraud Ring", t["id"], key=t["device_fingerprint"],
+                                          reason=f"Transaction {t['id']} BLOCKED: shares a device/IP with {ring['size']} linked entities that had {ring['blocked']} prior blocks"))
+                    blocked.append(t)
+                else:
+                    actions.append(Action("INVESTIGATE", "Fraud Ring", t["id"], key=t["device_fingerprint"],
+                                          reason=f"Transaction {t['id']} shares a device/IP with {ring['size']} linked entities that had {ring['blocked']} prior blocks"))
+            infra = self.shared_infra_reasons(self.distinct.observe(t["device_fingerprint"], t["ip_address"], t["bank"], t["merchant"],
+                                                                    now=t["ts_us"] / 1_000_000))
+            if infra:
+                actions.append(Action("INVESTIGATE", "Shared Infrastructure", t["id"], key=t["device_fingerprint"],
+                                      reason=f"Transaction {t['id']} flagged for shared infrastructure: {', '.join(infra)}"))
+        for t in blocked:
+            self.rings.mark_blocked(ring_entities(t["device_fingerprint"], t["ip_address"]))
+        return actions
+
+    def take_escalations(self):
+        escalated = self.slow_path.drain()
+        for a in escalated:
+            self.stats["blocked" if a.action_type == "BLOCK" else "investigated"] += 1
+        return escalated
+
+    def act(self, actions):
+        db_save_action_results(self.executor.drain())
+        if actions:
+            # Structured rows in one batch, then dispatched off-thread so handlers never stall REASON
+            db_save_actions(actions)
+            self.executor.submit(actions)
+            # Only newly opened alerts are logged; repeats bump their count in the alerts table
+            opened = [a for a in actions if self.alerts.add(a.label, a.key, f"{a.label} {a.tx_id}")]
+            if opened:
+                db_log_event("ACT", f"Taken {len(actions)} defensive actions ({len(opened)} new alerts).",
+                             details=[a.record() for a in opened], reasons=[a.label for a in opened])
+                db_log_event("REASON", "Decision logic applied", details=[a.reason for a in opened], reasons=[a.reason for a in opened])
+            db_save_alerts(self.alerts)
+
+    def close(self):
+        # Stops the slow-path worker, the action pool and any profiler sampler, recording what they finish;
+        # the final checkpoint follows the slow path, then the next agent may own it
+        self.slow_path.close()
+        self.act(self.take_escalations())
+        self.checkpoint()
+        self.executor.shutdown()
+        db_save_action_results(self.executor.drain())
+        db_save_baselines(self.baselines)
+        get_store().flush()
+        if self.profile is not None:
+            self.profile.finish()
+        if self.checkpointing:
+            self.checkpointing = False
+            checkpoint_owner().release()
+
     def run_cycle(self):
+        start, stats_before = time.perf_counter(), dict(self.stats)
         # 1. OBSERVE (Generate Synthetic Data)
-        merchants = ["Amazon", "Walmart", "Apple", "Netflix", "Uber"]
-        banks = ["HDFC", "SBI", "Axis", "ICICI"]
-        error_codes = ["UPI_AUTH_FAIL", "INSUFFICIENT_FUNDS", "SERVER_ERR"]
-        
-        new_txs = []
-        for _ in range(random.randint(1, 2)):
-            is_spam = random.random() < 0.2
-            is_fraud = random.random() < 0.1
-            
-            tx = {
-                "id": f"TX_{int(time.time())}_{random.randint(1000,9999)}",
-                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "merchant": random.choice(merchants),
-                "amount": round(random.uniform(10, 5000), 2),
-                "bank": random.choice(banks),
-                "status": "Failed" if is_spam else "Processed",
-                "error_code": random.choice(error_codes) if is_spam else None,
-                "risk_score": random.randint(80, 100) if is_fraud else random.randint(0, 30),
-                "fraud_probability": round(random.uniform(0.8, 0.99) if is_fraud else random.uniform(0.01, 0.2), 2),
-                "retry_count": random.randint(4, 10) if is_spam else 0
-            }
-            db_save_transaction(tx)
-            new_txs.append(tx)
-            self.stats["processed"] += 1
+        received = self.generator.transactions(self.scheduler.batch_size, start_us=now_us())
+        # Colliding synthetic ids are dropped here instead of overwriting stored rows
+        new_txs = self.deduper.filter_batch(received, key=lambda t: t["id"])
+        record_ingest("synthetic", len(received), len(new_txs))
+        db_save_transactions(new_txs)
+        self.stats["processed"] += len(new_txs)
+        if new_txs:
+            self.offset_us = max(self.offset_us, max(t["ts_us"] for t in new_txs))
         
-        db_log_event("OBSERVE", f"Analyzed {len(new_txs)} new transactions.", details=str(new_txs))
+        db_log_event("OBSERVE", f"Analyzed {len(new_txs)} new transactions.",
+                     details=[{col: t[col] for col in TX_COLUMNS} for t in new_txs])
 
-        # 2. REASON & ACT
-        actions = []
-        reasoning = []
+        # 2. FAST PATH (threshold rules decide every transaction inline, within fastPathBudgetUs each)
+        threshold = self.fraud_threshold
+        fast_start = time.perf_counter()
+        actions, blocked, spikes = [], [], {}
         for t in new_txs:
             if t["risk_score"] > AGENT_CONFIG["highRiskThreshold"] and t["status"] == 'Processed':
-                act = f"INVESTIGATE: High Risk {t['id']}"
-                actions.append(act)
-                reasoning.append(f"Transaction {t['id']} flagged for investigation due to risk score {t['risk_score']} > {AGENT_CONFIG['highRiskThreshold']}")
+                actions.append(Action("INVESTIGATE", "High Risk", t["id"], key=t["device_fingerprint"],
+                                      reason=f"Transaction {t['id']} flagged for investigation due to risk score {t['risk_score']} > {AGENT_CONFIG['highRiskThreshold']}"))
                 self.stats["investigated"] += 1
-            if t["fraud_probability"] > self.fraud_threshold:
-                act = f"BLOCK: Fraud Spike {t['id']}"
-                actions.append(act)
-                reasoning.append(f"Transaction {t['id']} BLOCKED due to fraud probability {t['fraud_probability']:.2f} > threshold {self.fraud_threshold:.2f}")
+            if t["fraud_probability"] > threshold:
+                actions.append(Action("BLOCK", "Fraud Spike", t["id"], key=t["device_fingerprint"],
+                                      reason=f"Transaction {t['id']} BLOCKED due to fraud probability {t['fraud_probability']:.2f} > threshold {threshold:.2f}"))
                 self.stats["blocked"] += 1
+                blocked.append(t)
             if t["status"] == 'Failed' and t["retry_count"] > AGENT_CONFIG["retryCountThreshold"]:
-                act = f"ALERT: Banking Spam {t['bank']}"
-                actions.append(act)
-                reasoning.append(f"Banking spam alert triggered for {t['bank']} due to {t['retry_count']} retries")
+                actions.append(Action("ALERT", "Banking Spam", t["id"], key=f"{t['bank']}/{t['error_code']}",
+                                      reason=f"Banking spam alert triggered for {t['bank']} due to {t['retry_count']} retries"))
                 self.stats["investigated"] += 1
+            deviations = self.baseline_reasons(t, spikes)
+            if deviations:
+                actions.append(Action("INVESTIGATE", "Baseline Deviation", t["id"], key=t["device_fingerprint"],
+                                      reason=f"Transaction {t['id']} deviates from its baselines: {', '.join(deviations)}"))
+                self.stats["investigated"] += 1
+            outlier = self.amount_reasons(t)
+            if outlier:
+                actions.append(Action("INVESTIGATE", "Amount Outlier", t["id"], key=t["device_fingerprint"],
+                                      reason=f"Transaction {t['id']} flagged: {outlier}"))
+                self.stats["investigated"] += 1
+        for (kind, entity), (z, tx_id) in spikes.items():
+            base = self.baselines.get(kind, entity)
+            actions.append(Action("ALERT", "Failure Rate Spike", tx_id, key=f"{kind}/{entity}",
+                                  reason=f"{kind} {entity} is failing {base.fail_fast:.0%} of transactions vs a {base.fail_rate:.0%} baseline ({z:+.1f} sd)"))
+            self.stats["investigated"] += 1
+        if new_txs:
+            self.tiers.observe("fast", len(new_txs), time.perf_counter() - fast_start)
+
+        # 3. SLOW PATH (ring graph and sketches run off-thread; their escalations for
+        # earlier cycles are acted on together with this cycle's fast-path actions)
+        self.slow_path.submit(new_txs, blocked)
+        actions.extend(self.take_escalations())
+        self.act(actions)
         
-        if actions:
-            db_log_event("ACT", f"Taken {len(actions)} defensive actions.", details="; ".join(actions))
-            db_log_event("REASON", "Decision logic applied", details="; ".join(reasoning))
-        
-        # 3. LEARN
-        if random.random() < 0.1:
+        # 4. LEARN (backtest every candidate threshold over labelled outcomes)
+        for t in new_txs:
+            self.optimizer.update(t["fraud_probability"], t["is_suspicious"])
+        best = self.optimizer.best_threshold()
+        if best is not None and best[0] != self.learned_threshold:
             current = self.fraud_threshold
-            adj = random.choice([-0.01, 0.01])
-            new_val = max(0.5, min(0.99, current + adj))
+            new_val, precision, recall = best
+            self.learned_threshold = new_val
             self.fraud_threshold = new_val
-            db_log_event("LEARN", f"Optimized threshold: {current:.2f} -> {new_val:.2f}", details="Self-correction based on recent false positives/negatives analysis.")
+            db_log_event("LEARN", f"Optimized threshold: {current:.2f} -> {new_val:.2f}", details={"from": current, "to": new_val, "precision": precision, "recall": recall,
+                                  "outcomes": self.optimizer.pos_total + self.optimizer.neg_total},
+                         reasons=[f"Backtest optimum over {self.optimizer.pos_total + self.optimizer.neg_total} labelled outcomes: precision {precision:.2f}, recall {recall:.2f}."])
+
+        # The decision cycle ends here; maintenance below is not decision latency
+        seconds = time.perf_counter() - start
+        self.scheduler.record(len(received), seconds)
+        record_cycle("run_cycle", stats_before, self.stats, seconds)
+
+        # 5. RETENTION
+        self.cycles += 1
+        if self.cycles % AGENT_CONFIG["archiveEveryCycles"] == 0:
+            dropped = db_archive_old(AGENT_CONFIG["archiveAfterSec"], AGENT_CONFIG["archiveExpired"])
+            if dropped:
+                db_log_event("SYSTEM", f"Retention dropped {len(dropped)} partition(s).", details={"partitions": dropped})
+        if self.cycles % AGENT_CONFIG["baselineSaveEvery"] == 0:
+            db_save_baselines(self.baselines)
+
+        # 6. MEMORY (in-process state over its byte budget is shrunk before the process is;
+        # the slow path owns the rings and sketches, so it pauses meanwhile)
+        if self.cycles % AGENT_CONFIG["memoryCheckEvery"] == 0:
+            with self.slow_path.lock:
+                shrunk = self.memory.check()
+            for name, before, after in shrunk:
+                db_log_event("SYSTEM", f"Memory budget: shrank {name} from {before / 1e6:.2f} MB to {after / 1e6:.2f} MB.",
+                             details={"structure": name, "before": before, "after": after})
+
+        # 7. CHECKPOINT (a restart resumes from here)
+        if self.cycles % AGENT_CONFIG["checkpointEveryCycles"] == 0:
+            self.checkpoint()
 
 # --- UI LAYER ---
 st.set_page_config(page_title="Sentinel AI", page_icon="🛡️", layout="wide")
@@ -350,6 +804,8 @@ with st.sidebar:
         st.session_state.running = False
         st.rerun()
     if st.button("🔄 SYSTEM RESET", key="reset"):
+        # The old agent's threads finish writing before the database is cleared
+        st.session_state.agent.close()
         db_reset()
         st.session_state.agent = SentinelAgent()
         st.session_state.agent.load_data()
@@ -365,7 +821,7 @@ if page == "Dashboard":
     
     # Top Stats
     k1, k2, k3, k4 = st.columns(4)
-    df_recent = db_get_recent_tx(500)
+    df_topology = db_get_topology(500)
     
     with k1:
         st.metric("Total Transactions", st.session_state.agent.stats["processed"], delta_color="normal")
@@ -382,8 +838,8 @@ if page == "Dashboard":
     
     with c1:
         st.subheader("3D Transaction Topology")
-        if not df_recent.empty:
-            fig = px.scatter_3d(df_recent, x='amount', y='risk_score', z='fraud_probability',
+        if not df_topology.empty:
+            fig = px.scatter_3d(df_topology, x='amount', y='risk_score', z='fraud_probability',
                                color='status', symbol='status',
                                color_discrete_map={'Processed': '#10b981', 'Failed': '#ef4444'},
                                hover_data=['merchant', 'bank', 'error_code'],
@@ -410,6 +866,15 @@ if page == "Dashboard":
         log_text = "\n".join([f"[{r[0]}] {r[2]}" for r in logs])
         st.text_area("", log_text, height=400, disabled=True)
 
+        st.subheader("Coalesced Alerts")
+        df_alerts = db_get_alerts(20)
+        if not df_alerts.empty:
+            df_alerts["first_seen"] = [format_us(us, '%H:%M:%S') for us in df_alerts.pop("first_seen_us")]
+            df_alerts["last_seen"] = [format_us(us, '%H:%M:%S') for us in df_alerts.pop("last_seen_us")]
+            st.dataframe(df_alerts, use_container_width=True, hide_index=True)
+        else:
+            st.caption("No alerts raised yet.")
+
 # --- PAGE: AGENT LOGIC ---
 elif page == "Agent Logic":
     st.title("🧠 Autonomous Agent Logic")
@@ -453,10 +918,17 @@ elif page == "Agent Logic":
 
     with col_details:
         st.subheader("Reasoning Engine Output")
-        recent_reasoning = db_get_logs(10)
-        # Filter for REASON or LEARN phases
-        filtered_logs = [r for r in recent_reasoning if r[2] in ['REASON', 'LEARN', 'ACT']]
-        
+        s1, s2 = st.columns([2, 1])
+        with s1:
+            log_query = st.text_input("Search agent decisions", placeholder="e.g. spam HDFC")
+        with s2:
+            log_phases = st.multiselect("Phases", ["OBSERVE", "REASON", "ACT", "LEARN", "SYSTEM", "CONFIG"])
+        if log_query or log_phases:
+            recent_reasoning = db_search_logs(log_query, 50, log_phases)
+            st.caption(f"{len(recent_reasoning)} matching entries (newest first)")
+        else:
+            recent_reasoning = db_get_logs(10)
+
         for log in recent_reasoning:
             ts, phase, msg, details = log
             if phase == "REASON":
@@ -477,28 +949,66 @@ elif page == "Agent Logic":
             
             with st.expander(f"{icon} {phase} - {ts}"):
                 st.write(f"**Message:** {msg}")
-                if details:
+                if isinstance(details, (dict, list)):
+                    st.json(details, expanded=False)
+                elif details:
                     st.code(details, language="text")
 
 # --- PAGE: TRANSACTIONS ---
 elif page == "Transactions":
     st.title("📊 Transaction Explorer")
     
-    df = db_get_recent_tx(1000)
-    
-    # Filters
-    f1, f2 = st.columns(2)
+    options = db_tx_filter_options()
+    time_ranges = {"All time": None, "Last hour": 3600, "Last 24 hours": 24 * 3600, "Last 7 days": 7 * 24 * 3600}
+
+    # Filters are applied in SQL; a filter with every value selected is left out entirely
+    f1, f2, f3 = st.columns(3)
     with f1:
-        status_filter = st.multiselect("Filter by Status", df['status'].unique(), default=df['status'].unique())
+        status_filter = st.multiselect("Filter by Status", options["status"], default=options["status"])
     with f2:
-        bank_filter = st.multiselect("Filter by Bank", df['bank'].unique(), default=df['bank'].unique())
-    
+        bank_filter = st.multiselect("Filter by Bank", options["bank"], default=options["bank"])
+    with f3:
+        merchant_filter = st.multiselect("Filter by Merchant", options["merchant"], default=options["merchant"])
+    f4, f5, f6 = st.columns(3)
+    with f4:
+        risk_range = st.slider("Risk Score", 0, 100, (0, 100))
+    with f5:
+        time_range = st.selectbox("Time Range", list(time_ranges))
+    with f6:
+        page_size = st.selectbox("Rows per page", [50, 100, 250, 500], index=1)
+
+    filters = {col: None if set(selected) == set(options[col]) else selected
+               for col, selected in zip(LIST_FILTERS, (status_filter, bank_filter, merchant_filter))}
+    filters["risk_min"] = risk_range[0] if risk_range[0] > 0 else None
+    filters["risk_max"] = risk_range[1] if risk_range[1] < 100 else None
+
+    # Keyset pagination: a stack of page cursors, reset whenever the filters change
+    filter_key = repr((filters, time_range, page_size))
+    if st.session_state.get("tx_filter_key") != filter_key:
+        st.session_state.tx_filter_key = filter_key
+        st.session_state.tx_cursors = [None]
+    if time_ranges[time_range]:
+        filters["start_us"] = now_us() - time_ranges[time_range] * 1_000_000
+    cursors = st.session_state.tx_cursors
+    df, next_cursor = db_page_tx(filters, cursors[-1], page_size)
+
     if not df.empty:
-        filtered_df = df[df['status'].isin(status_filter) & df['bank'].isin(bank_filter)]
-        st.dataframe(filtered_df, use_container_width=True, height=600)
+        st.dataframe(df, use_container_width=True, height=600)
     else:
         st.info("No transaction data found.")
 
+    p1, p2, p3 = st.columns([1, 1, 2])
+    with p1:
+        if st.button("◀ Newer", disabled=len(cursors) == 1):
+            cursors.pop()
+            st.rerun()
+    with p2:
+        if st.button("Older ▶", disabled=next_cursor is None):
+            cursors.append(next_cursor)
+            st.rerun()
+    with p3:
+        st.caption(f"Page {len(cursors)}")
+
 # --- PAGE: SETTINGS ---
 elif page == "Settings":
     st.title("⚙️ System Configuration")
@@ -511,8 +1021,57 @@ elif page == "Settings":
         st.success(f"Threshold updated to {new_threshold}")
         db_log_event("CONFIG", f"Manual threshold override to {new_threshold}")
 
+    st.subheader("Memory")
+    memory = st.session_state.agent.memory
+    if not memory.checks:
+        with st.session_state.agent.slow_path.lock:
+            memory.check()
+    st.dataframe(pd.DataFrame([{"structure": name, "MB": m["bytes"] / 1e6, "budget MB": m["budget_bytes"] / 1e6,
+                                "evictions": m["evictions"]} for name, m in memory.metrics().items()]),
+                 use_container_width=True, hide_index=True)
+
+    st.subheader("Batching")
+    batching = st.session_state.agent.scheduler.stats()
+    b1, b2, b3 = st.columns(3)
+    b1.metric("Batch size", batching["batch_size"])
+    b2.metric("Cycle p99", "n/a" if batching["p99_cycle_ms"] is None else f"{batching['p99_cycle_ms']:.1f} ms")
+    b3.metric("Flush interval", f"{batching['interval_sec'] * 1000:.0f} ms")
+    st.caption(f"Target p99 decision latency {AGENT_CONFIG['latencyThreshold']} ms; "
+               f"{batching['grow']} grows, {batching['shrink']} shrinks so far.")
+
+    st.subheader("Decision Tiers")
+    tiers = st.session_state.agent.tiers
+    fast, slow = tiers.percentiles("fast"), tiers.percentiles("slow")
+    t1, t2, t3, t4 = st.columns(4)
+    t1.metric("Fast path p99 / tx", f"{fast[99]:.0f} µs" if fast else "n/a", help=f"Budget {tiers.budget_us} µs per transaction")
+    t2.metric("Slow path p99 lag", f"{slow[99] / 1000:.1f} ms" if slow else "n/a")
+    t3.metric("Escalations", tiers.stats["escalations"])
+    t4.metric("Fast batches over budget", tiers.stats["fast_over_budget"])
+    if tiers.stats["slow_dropped"]:
+        st.caption(f"{tiers.stats['slow_dropped']} batches skipped the slow path while its queue was full.")
+
+    st.subheader("Profiling")
+    agent = st.session_state.agent
+    pr1, pr2, pr3 = st.columns([1, 1, 1])
+    with pr1:
+        profile_cycles = st.number_input("Cycles to capture", 1, 1000, 20)
+    with pr2:
+        profile_mode = st.selectbox("Profiler", PROFILE_MODES, help="cprofile: exact call counts; sample: collapsed stacks for flamegraphs")
+    with pr3:
+        capturing = agent.profile is not None and not agent.profile.done
+        if st.button("Capture", disabled=capturing):
+            agent.profile = ProfileCapture(agent, "run_cycle", int(profile_cycles), profile_mode)
+            db_log_event("CONFIG", f"Profiling the next {int(profile_cycles)} cycles ({profile_mode})")
+            st.rerun()
+    if agent.profile is not None:
+        if agent.profile.done:
+            st.code(agent.profile.summary, language="text")
+            st.caption("Written: " + ", ".join(agent.profile.files))
+        else:
+            st.info(f"Capturing: {agent.profile.remaining} of {agent.profile.cycles} cycles left (start the system to run them).")
+
 # --- SYSTEM LOOP ---
 if st.session_state.running:
     st.session_state.agent.run_cycle()
-    time.sleep(1)
+    time.sleep(st.session_state.agent.scheduler.interval_sec)
     st.rerun()
@@ -1,8 +1,19 @@
 import time
-import csv
 import os
+import csv
 import random
+import argparse
+import itertools
 from datetime import datetime, timedelta
+from multiprocessing import Pool, shared_memory
+import numpy as np
+from src.dataset import DATASET_PATHS, load_dataset, transaction_dicts
+from src.backtest import ThresholdOptimizer, FP_COST, FN_COST
+from src.synthetic import SyntheticGenerator, new_id_prefix
+from src.timestamps import now_us
+from src.windows import RollingCounter, TimeWindowCounter
+from src.memory import MemoryBudget, deep_size, downsample_oldest
+from src.batching import BatchScheduler
 
 # Configuration
 AGENT_CONFIG = {
@@ -11,6 +22,14 @@ AGENT_CONFIG = {
     "retryCountThreshold": 3,
     "latencyThreshold": 500,
     "loopIntervalSec": 2,
+    "feedbackWindow": 20,
+    "feedbackWindowSec": 300,
+    "syntheticFraudRate": 0.1,
+    "syntheticSpamRate": 0.2,
+    "processMemoryBudgetMB": 1024,
+    "transactionsBudgetMB": 64,
+    "minBatchSize": 5,
+    "maxBatchSize": 1000,
 }
 
 class Transaction:
@@ -31,95 +50,51 @@ class Transaction:
 class SentinelAgent:
     def __init__(self):
         self.transactions = []
-        self.investigations = []
+        # Outcome feedback is kept in fixed-size windows with running counts,
+        # so memory and per-cycle cost stay flat however long the loop runs
+        self.investigations = RollingCounter(AGENT_CONFIG["feedbackWindow"])
+        self.recent_outcomes = TimeWindowCounter(AGENT_CONFIG["feedbackWindowSec"])
         self.is_running = False
         self.fraud_threshold = AGENT_CONFIG["fraudProbThreshold"]
+        self.optimizer = ThresholdOptimizer()
+        # Loop batch size and interval (at most loopIntervalSec), sized to keep p99 decision latency under latencyThreshold (ms)
+        self.scheduler = BatchScheduler(AGENT_CONFIG["latencyThreshold"], AGENT_CONFIG["minBatchSize"], AGENT_CONFIG["maxBatchSize"],
+                                        max_interval_sec=AGENT_CONFIG["loopIntervalSec"])
+        # The sampling pool is thinned (not truncated) when over budget, so old data stays represented
+        self.memory = MemoryBudget(AGENT_CONFIG["processMemoryBudgetMB"])
+        self.memory.track("transactions", lambda: deep_size(self.transactions),
+                          lambda target, size: downsample_oldest(self.transactions, size, target),
+                          AGENT_CONFIG["transactionsBudgetMB"])
 
     def load_data(self):
-        paths = [
-            os.path.join("attached_assets", "fraud_data.csv"),
-            os.path.join("..", "datasettt", "fraud_data_20251225_004640.csv")
-        ]
-        
         print("\n[SYSTEM] Loading datasets...")
-        count = 0
-        for path in paths:
-            if os.path.exists(path):
-                try:
-                    with open(path, 'r', encoding='utf-8') as f:
-                        reader = csv.reader(f)
-                        header = next(reader, None) # Skip header
-                        if not header: continue
-                        
-                        for row in reader:
-                            if len(row) < 14: continue
-                            
-                            # Parse based on known CSV structure
-                            # 1: razorpay_payment_id -> id
-                            # 2: timestamp
-                            # 4: amount
-                            # 7: upi_app -> merchant
-                            # 8: bank
-                            # 9: status
-                            # 10: error_code
-                            # 13: fraud_score
-                            # 15: fraud_reasons
-                            # 20: attempt_count
-                            
-                            try:
-                                status = row[9]
-                                if status.lower() == 'success': status = 'Processed'
-                                elif status.lower() == 'failed': status = 'Failed'
-                                
-                                tx_data = {
-                                    "id": row[1],
-                                    "timestamp": row[2],
-                                    "amount": row[4],
-                                    "merchant": row[7],
-                                    "bank": row[8],
-                                    "status": status,
-                                    "error_code": row[10] if row[10] else None,
-                                    "risk_score": row[13] if row[13] else 0,
-                                    "fraud_probability": (float(row[13] or 0) / 100),
-                                    "fraud_reason": row[15] if row[15] else None,
-                                    "retry_count": row[20] if row[20] else 0
-                                }
-                                self.transactions.append(Transaction(tx_data))
-                                count += 1
-                            except Exception as e:
-                                continue
-                    print(f"[SYSTEM] Loaded {count} transactions from {path}")
-                except Exception as e:
-                    print(f"[ERROR] Failed to load {path}: {e}")
-            else:
+        datasets = []
+        for path in DATASET_PATHS:
+            if not os.path.exists(path):
                 print(f"[WARNING] Dataset not found: {path}")
+                continue
+            try:
+                # Parsed once, then served from the memory-mapped column cache
+                cols = load_dataset(path)
+                datasets.append((path, cols))
+                self.optimizer.fit(cols["fraud_score"] / 100, cols["is_suspicious"])
+                count = 0
+                for tx_data in transaction_dicts(cols):
+                    self.transactions.append(Transaction(tx_data))
+                    count += 1
+                print(f"[SYSTEM] Loaded {count} transactions from {path}")
+            except Exception as e:
+                print(f"[ERROR] Failed to load {path}: {e}")
         
-        # Generate some synthetic live data for the loop
+        # Generate some synthetic live data for the loop, drawn from the loaded data's distributions
+        self.generator = SyntheticGenerator.from_datasets(datasets, fraud_rate=AGENT_CONFIG["syntheticFraudRate"],
+                                                          spam_rate=AGENT_CONFIG["syntheticSpamRate"], id_prefix=new_id_prefix("LIVE_TX"))
         self.generate_synthetic_stream()
 
-    def generate_synthetic_stream(self):
+    def generate_synthetic_stream(self, n=50):
         # Add some "future" transactions to simulate a live stream
-        merchants = ["Amazon", "Walmart", "Apple", "Netflix"]
-        banks = ["HDFC", "SBI", "Axis"]
-        error_codes = ["UPI_AUTHENTICATION_FAILED", "INSUFFICIENT_FUNDS", "BANK_SERVER_ERROR"]
-        
-        for i in range(50):
-            is_spam = random.random() < 0.2
-            is_fraud = random.random() < 0.1
-            
-            tx = Transaction({
-                "id": f"LIVE_TX_{int(time.time())}_{i}",
-                "timestamp": datetime.now().isoformat(),
-                "merchant": random.choice(merchants),
-                "amount": random.uniform(10, 5000),
-                "bank": random.choice(banks),
-                "status": "Failed" if is_spam else "Processed",
-                "error_code": random.choice(error_codes) if is_spam else None,
-                "risk_score": random.randint(80, 100) if is_fraud else random.randint(0, 20),
-                "fraud_probability": 0.9 if is_fraud else 0.1,
-                "retry_count": random.randint(4, 10) if is_spam else 0
-            })
-            self.transactions.append(tx)
+        for tx_data in self.generator.transactions(n, start_us=now_us()):
+            self.transactions.append(Transaction(tx_data))
 
     def start(self):
         self.is_running = True
@@ -131,16 +106,16 @@ class SentinelAgent:
         try:
             while self.is_running:
                 self.run_loop()
-                time.sleep(AGENT_CONFIG["loopIntervalSec"])
+                time.sleep(self.scheduler.interval_sec)
         except KeyboardInterrupt:
             print("\n[SYSTEM] Agent stopped by user.")
 
     def run_loop(self):
+        start = time.perf_counter()
         # 1. OBSERVE
         print(f"[{datetime.now().strftime('%H:%M:%S')}] [OBSERVE] Monitoring transaction stream...")
         # Simulate getting recent transactions (random sample for demo)
-        batch_size = 10
-        current_batch = random.sample(self.transactions, batch_size)
+        current_batch = random.sample(self.transactions, min(self.scheduler.batch_size, len(self.transactions)))
         
         # 2. REASON
         print(f"[{datetime.now().strftime('%H:%M:%S')}] [REASON]  Analyzing {len(current_batch)} transactions...")
@@ -177,38 +152,215 @@ class SentinelAgent:
             for action, tx, reason in decisions:
                 if action == "BLOCK":
                     print(f"    >>> BLOCKED Transaction {tx.id} ({reason})")
-                    self.investigations.append({"status": "BLOCKED", "reason": reason})
+                    self.record_outcome("BLOCKED")
+                    self.optimizer.update(tx.fraud_probability, True)
                 elif action == "INVESTIGATE":
                     print(f"    >>> OPENED CASE for {tx.id} ({reason})")
                     # Simulate outcome for learning
                     outcome = "RESOLVED" if random.random() > 0.3 else "BLOCKED"
-                    self.investigations.append({"status": outcome, "reason": reason})
+                    self.record_outcome(outcome)
+                    self.optimizer.update(tx.fraud_probability, outcome == "BLOCKED")
         else:
             print(f"[{datetime.now().strftime('%H:%M:%S')}] [ACT]     No immediate actions required.")
 
         # 5. LEARN
         print(f"[{datetime.now().strftime('%H:%M:%S')}] [LEARN]   Updating thresholds based on recent outcomes...")
         self.learn_from_history()
+        for name, before, after in self.memory.check():
+            print(f"    -> Memory budget: thinned {name} from {before / 1e6:.2f} MB to {after / 1e6:.2f} MB")
+        self.scheduler.record(len(current_batch), time.perf_counter() - start)
+        print(f"    [BATCH] next {self.scheduler.batch_size} transactions in {self.scheduler.interval_sec:.2f}s "
+              f"(cycle p99 {self.scheduler.stats()['p99_cycle_ms']} ms)")
         print("-" * 50)
 
+    def record_outcome(self, status):
+        self.investigations.push(status)
+        self.recent_outcomes.push(status)
+
     def learn_from_history(self):
-        # Feedback Loop
-        recent = self.investigations[-20:]
-        if not recent: return
+        # Feedback Loop: the optimizer already holds every resolved outcome, so
+        # picking the cheapest threshold is a single pass over the cost curve
+        if not len(self.investigations): return
         
-        false_positives = len([i for i in recent if i["status"] == "RESOLVED"])
-        true_positives = len([i for i in recent if i["status"] == "BLOCKED"])
+        false_positives = self.investigations.count("RESOLVED")
+        true_positives = self.investigations.count("BLOCKED")
         
         old_threshold = self.fraud_threshold
-        if false_positives > true_positives + 2:
-            self.fraud_threshold = min(0.95, self.fraud_threshold + 0.01)
-            print(f"    [FEEDBACK] Too many false alarms. Relaxing threshold: {old_threshold:.2f} -> {self.fraud_threshold:.2f}")
-        elif true_positives > false_positives + 2:
-            self.fraud_threshold = max(0.60, self.fraud_threshold - 0.01)
-            print(f"    [FEEDBACK] Threat level high. Tightening threshold: {old_threshold:.2f} -> {self.fraud_threshold:.2f}")
+        best = self.optimizer.best_threshold(lo=0.60, hi=0.95)
+        if best is None: return
+        new_threshold, precision, recall = best
+        if new_threshold != old_threshold:
+            self.fraud_threshold = new_threshold
+            print(f"    [FEEDBACK] Recent window: {false_positives} false alarms, {true_positives} confirmed. "
+                  f"Backtest optimum {old_threshold:.2f} -> {new_threshold:.2f} (precision {precision:.2f}, recall {recall:.2f})")
         else:
-            print(f"    [FEEDBACK] Threshold stable at {self.fraud_threshold:.2f}")
+            print(f"    [FEEDBACK] Threshold stable at {self.fraud_threshold:.2f} "
+                  f"({self.recent_outcomes.count('BLOCKED')} blocked / {self.recent_outcomes.count('RESOLVED')} resolved "
+                  f"in the last {AGENT_CONFIG['feedbackWindowSec']}s)")
+
+# --- PARAMETER SWEEP ---
+# Every simulated agent reads the same dataset columns from one shared-memory
+# block; workers attach to it once and then run their cycles without sleeping.
+SWEEP_COLUMNS = {
+    "fraud_probability": np.float64,
+    "risk_score": np.int32,
+    "failed": np.bool_,
+    "has_error": np.bool_,
+    "auth_error": np.bool_,
+    "retry_count": np.int32,
+    "is_suspicious": np.bool_,
+}
+_shared = {}
+# Share of the dataset the learning agents are pre-fitted on; cycles sample the rest
+HOLDOUT_SHARE = 0.2
+
+def build_sweep_columns():
+    parts = [load_dataset(path) for path in DATASET_PATHS if os.path.exists(path)]
+    parts = [cols for cols in parts if cols is not None]
+    if not parts:
+        raise SystemExit("[ERROR] No dataset found for the sweep.")
+    cat = lambda name: np.concatenate([np.asarray(cols[name]) for cols in parts])
+    error_code = cat("error_code")
+    return {
+        "fraud_probability": cat("fraud_score") / 100,
+        "risk_score": cat("fraud_score").astype(np.int32),
+        "failed": cat("status") == "Failed",
+        "has_error": error_code != "",
+        "auth_error": np.char.find(error_code, "AUTHENTICATION_FAILED") >= 0,
+        "retry_count": cat("attempt_count"),
+        "is_suspicious": cat("is_suspicious"),
+    }
+
+def share_columns(columns):
+    blocks, layout = [], {}
+    for name, dtype in SWEEP_COLUMNS.items():
+        arr = np.ascontiguousarray(columns[name], dtype=dtype)
+        shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        np.ndarray(arr.shape, dtype=dtype, buffer=shm.buf)[:] = arr
+        blocks.append(shm)
+        layout[name] = (shm.name, arr.shape)
+    return blocks, layout
+
+def _attach_shared(layout):
+    for name, (shm_name, shape) in layout.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        _shared[name] = (shm, np.ndarray(shape, dtype=SWEEP_COLUMNS[name], buffer=shm.buf))
+
+def simulate_config(config):
+    # Same REASON/ACT/LEARN rules as SentinelAgent.run_loop, vectorized per batch.
+    # Investigation outcomes come from the dataset's is_suspicious label. The split
+    # is the same for every config, so none is scored on rows it was fitted on
+    col = {name: arr for name, (_, arr) in _shared.items()}
+    holdout = np.random.default_rng(0).random(len(col["fraud_probability"])) < HOLDOUT_SHARE
+    rows = np.flatnonzero(~holdout)
+    rng = np.random.default_rng(config["seed"])
+    threshold = config["fraudProbThreshold"]
+    optimizer = None
+    if config["learn"]:
+        optimizer = ThresholdOptimizer()
+        optimizer.fit(col["fraud_probability"][holdout], col["is_suspicious"][holdout])
+
+    blocked = investigated = tp = fp = fn = suspicious_seen = clean_seen = 0
+    start = time.perf_counter()
+    for _ in range(config["cycles"]):
+        idx = rows[rng.integers(0, len(rows), config["batchSize"])]
+        prob = col["fraud_probability"][idx]
+        failed = col["failed"][idx]
+        label = col["is_suspicious"][idx]
+
+        high_risk = (col["risk_score"][idx] > config["highRiskThreshold"]) & ~failed
+        spikes = prob > threshold
+        spam = failed & col["has_error"][idx] & ((col["retry_count"][idx] > config["retryCountThreshold"]) | col["auth_error"][idx])
+        flagged = high_risk | spikes | spam
+
+        blocked += int(spikes.sum())
+        investigated += int(high_risk.sum() + spam.sum())
+        tp += int((flagged & label).sum())
+        fp += int((flagged & ~label).sum())
+        fn += int((~flagged & label).sum())
+        suspicious_seen += int(label.sum())
+        clean_seen += int((~label).sum())
+
+        if optimizer is not None and flagged.any():
+            # Outcomes of the transactions acted on, one at a time as learn_from_history() sees them
+            for p, is_fraud in zip(prob[flagged], label[flagged]):
+                optimizer.update(p, is_fraud)
+            best = optimizer.best_threshold(lo=0.60, hi=0.95)
+            if best is not None:
+                threshold = best[0]
+
+    return {
+        "fraudProbThreshold": config["fraudProbThreshold"],
+        "highRiskThreshold": config["highRiskThreshold"],
+        "retryCountThreshold": config["retryCountThreshold"],
+        "seed": config["seed"],
+        "final_threshold": threshold,
+        "blocked": blocked,
+        "investigated": investigated,
+        "tp": tp,
+        "fp": fp,
+        "tp_rate": tp / suspicious_seen if suspicious_seen else 0.0,
+        "fp_rate": fp / clean_seen if clean_seen else 0.0,
+        "cost": fp * FP_COST + fn * FN_COST,
+        "elapsed_s": round(time.perf_counter() - start, 4),
+    }
+
+def sweep_configs(fraud_thresholds, risk_thresholds, retry_thresholds, seeds, cycles, batch_size, learn):
+    return [
+        {"fraudProbThreshold": f, "highRiskThreshold": r, "retryCountThreshold": c, "seed": s,
+         "cycles": cycles, "batchSize": batch_size, "learn": learn}
+        for f, r, c, s in itertools.product(fraud_thresholds, risk_thresholds, retry_thresholds, range(seeds))
+    ]
+
+def run_sweep(configs, processes=None):
+    blocks, layout = share_columns(build_sweep_columns())
+    try:
+        with Pool(processes=processes, initializer=_attach_shared, initargs=(layout,)) as pool:
+            return pool.map(simulate_config, configs, chunksize=max(1, len(configs) // ((processes or os.cpu_count() or 1) * 4)))
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+
+def write_results(results, path):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(results[0]))
+        writer.writeheader()
+        writer.writerows(results)
+
+def _floats(text):
+    return [float(v) for v in text.split(",")]
+
+def _ints(text):
+    return [int(v) for v in text.split(",")]
 
 if __name__ == "__main__":
-    agent = SentinelAgent()
-    agent.start()
+    parser = argparse.ArgumentParser(description="Sentinel AI simulation")
+    parser.add_argument("--sweep", action="store_true", help="run a parallel parameter sweep instead of the live loop")
+    parser.add_argument("--fraud-thresholds", type=_floats, default=[0.5, 0.6, 0.7, 0.8, 0.9])
+    parser.add_argument("--risk-thresholds", type=_ints, default=[10, 20, 30, 40])
+    parser.add_argument("--retry-thresholds", type=_ints, default=[2, 3, 4, 5])
+    parser.add_argument("--seeds", type=int, default=3)
+    parser.add_argument("--cycles", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--learn", action="store_true", help="let each agent retune its fraud threshold")
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--out", default="sweep_results.csv")
+    args = parser.parse_args()
+
+    if args.sweep:
+        configs = sweep_configs(args.fraud_thresholds, args.risk_thresholds, args.retry_thresholds,
+                                args.seeds, args.cycles, args.batch_size, args.learn)
+        print(f"[SWEEP] Running {len(configs)} configurations x {args.cycles} cycles...")
+        start = time.perf_counter()
+        results = run_sweep(configs, args.processes)
+        print(f"[SWEEP] Done in {time.perf_counter() - start:.1f}s")
+        write_results(results, args.out)
+        print(f"{'fraud':>6} {'risk':>5} {'retry':>5} {'seed':>4} {'blocked':>8} {'invest.':>8} {'tp_rate':>8} {'fp_rate':>8} {'cost':>9}")
+        for r in sorted(results, key=lambda r: r["cost"])[:10]:
+            print(f"{r['fraudProbThreshold']:>6.2f} {r['highRiskThreshold']:>5} {r['retryCountThreshold']:>5} {r['seed']:>4} "
+                  f"{r['blocked']:>8} {r['investigated']:>8} {r['tp_rate']:>8.3f} {r['fp_rate']:>8.3f} {r['cost']:>9.0f}")
+        print(f"[SWEEP] Full table written to {args.out}")
+    else:
+        agent = SentinelAgent()
+        agent.start()
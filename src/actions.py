@@ -0,0 +1,162 @@
+import time
+import uuid
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from src.timestamps import now_us
+from src.metrics import DB_WRITE_SECONDS, counter, histogram
+
+ACTIONS_DONE = counter("sentinel_actions_total", "Actions by type and final status", ("type", "status"))
+DISPATCH_SECONDS = histogram("sentinel_action_dispatch_seconds", "Action latency from submit to handler completion")
+
+# Every decision the agent takes is one structured row: written in a batch per
+# step with status 'queued', then updated with the handler outcome and the
+# dispatch latency once the executor pool has run it.
+ACTIONS_TABLE = "actions"
+ACTIONS_SCHEMA = f'''CREATE TABLE IF NOT EXISTS {ACTIONS_TABLE} (
+    id TEXT PRIMARY KEY,
+    action_type TEXT,
+    rule TEXT,
+    tx_id TEXT,
+    reason TEXT,
+    ts_us INTEGER,
+    status TEXT,
+    latency_us INTEGER
+)'''
+
+class Action:
+    def __init__(self, action_type, rule, tx_id, reason="", key=None, ts_us=None):
+        self.id = uuid.uuid4().hex
+        self.action_type = action_type
+        self.rule = rule
+        self.tx_id = tx_id
+        self.reason = reason
+        # Alert-coalescing key (device, bank/error_code, ...); defaults to the transaction
+        self.key = key or tx_id
+        self.ts_us = ts_us or now_us()
+        self.status = "queued"
+        self.latency_us = None
+
+    @property
+    def label(self):
+        return f"{self.action_type}: {self.rule}"
+
+    def record(self):
+        # Compact form for structured log details
+        return {"id": self.id, "type": self.action_type, "rule": self.rule, "tx_id": self.tx_id,
+                "key": self.key, "reason": self.reason}
+
+    def row(self):
+        return (self.id, self.action_type, self.rule, self.tx_id, self.reason, self.ts_us, self.status, self.latency_us)
+
+class StubHandler:
+    # Local stand-in for a downstream system: records what it was asked to do,
+    # optionally after a fixed delay or with an injected failure
+    def __init__(self, delay_sec=0.0, fail_types=()):
+        self.delay_sec = delay_sec
+        self.fail_types = set(fail_types)
+        self.calls = deque(maxlen=10_000)
+        self.lock = threading.Lock()
+
+    def __call__(self, action):
+        if self.delay_sec:
+            time.sleep(self.delay_sec)
+        if action.action_type in self.fail_types:
+            raise RuntimeError(f"stub failure for {action.action_type}")
+        with self.lock:
+            self.calls.append((action.action_type, action.tx_id))
+
+class ActionExecutor:
+    # Dispatches actions to handlers[action_type] (or handlers["*"]) on a
+    # bounded thread pool. submit() never blocks: past max_pending in-flight
+    # actions new ones are marked 'rejected' instead of queueing behind a slow
+    # handler. Finished actions are collected for drain().
+    def __init__(self, handlers, max_workers=4, max_pending=1000):
+        self.handlers = handlers
+        self.max_pending = max_pending
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sentinel-action")
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.done = deque()
+        self.latencies_us = deque(maxlen=1000)
+        self.stats = {"dispatched": 0, "failed": 0, "rejected": 0}
+
+    def _run(self, action, handler, queued_at):
+        try:
+            handler(action)
+            action.status = "done"
+        except Exception:
+            action.status = "failed"
+        # Queue wait included: this is what a caller waiting on the action would see
+        action.latency_us = int((time.perf_counter() - queued_at) * 1_000_000)
+        with self.lock:
+            self.pending -= 1
+            self.stats["dispatched"] += 1
+            if action.status == "failed":
+                self.stats["failed"] += 1
+            self.latencies_us.append(action.latency_us)
+            self.done.append(action)
+        ACTIONS_DONE.inc(type=action.action_type, status=action.status)
+        DISPATCH_SECONDS.observe(action.latency_us / 1_000_000)
+
+    def submit(self, actions):
+        for action in actions:
+            handler = self.handlers.get(action.action_type) or self.handlers.get("*")
+            with self.lock:
+                full = self.pending >= self.max_pending
+                if handler is None or full:
+                    action.status = "rejected" if full else "unhandled"
+                    self.stats["rejected"] += 1
+                    self.done.append(action)
+                    ACTIONS_DONE.inc(type=action.action_type, status=action.status)
+                    continue
+                self.pending += 1
+            self.pool.submit(self._run, action, handler, time.perf_counter())
+
+    def drain(self):
+        # Actions that finished (or were turned away) since the last drain
+        with self.lock:
+            done, self.done = list(self.done), deque()
+        return done
+
+    def latency_percentiles(self, qs=(50, 95, 99)):
+        with self.lock:
+            values = sorted(self.latencies_us)
+        if not values:
+            return {}
+        return {q: values[min(len(values) - 1, int(len(values) * q / 100))] for q in qs}
+
+    def shutdown(self, wait=True):
+        self.pool.shutdown(wait=wait)
+
+def init_actions(conn):
+    c = conn.cursor()
+    c.execute(ACTIONS_SCHEMA)
+    c.execute(f"CREATE INDEX IF NOT EXISTS idx_{ACTIONS_TABLE}_ts_us ON {ACTIONS_TABLE}(ts_us)")
+    c.execute(f"CREATE INDEX IF NOT EXISTS idx_{ACTIONS_TABLE}_tx_id ON {ACTIONS_TABLE}(tx_id)")
+    conn.commit()
+
+def write_actions(conn, actions):
+    if not actions:
+        return
+    with DB_WRITE_SECONDS.time(table="actions"):
+        conn.cursor().executemany(f"INSERT OR REPLACE INTO {ACTIONS_TABLE} VALUES (?,?,?,?,?,?,?,?)", [a.row() for a in actions])
+        conn.commit()
+
+def write_action_results(conn, actions):
+    if not actions:
+        return
+    with DB_WRITE_SECONDS.time(table="actions"):
+        conn.cursor().executemany(f"UPDATE {ACTIONS_TABLE} SET status=?, latency_us=? WHERE id=?",
+                                  [(a.status, a.latency_us, a.id) for a in actions])
+        conn.commit()
+
+def read_actions_since(conn, since_us):
+    # (action_type, tx_id) for every action taken after since_us, oldest first
+    c = conn.cursor()
+    c.execute(f"SELECT action_type, tx_id FROM {ACTIONS_TABLE} WHERE ts_us > ? ORDER BY ts_us", (since_us,))
+    return c.fetchall()
+
+def clear_actions(conn):
+    conn.cursor().execute(f"DELETE FROM {ACTIONS_TABLE}")
+    conn.commit()
@@ -1,24 +1,241 @@
-import random
 import time
-import os
-import csv
-from datetime import datetime
-from src.models import Transaction, log_event, get_config, set_config, init_db
+from src.models import (Transaction, log_event, get_config, set_config, init_db, archive_old_transactions,
+                        save_transactions, existing_transaction_ids, recent_transaction_ids, save_alerts,
+                        save_actions, save_action_results, flush_transactions, get_store, save_baselines, load_baselines,
+                        get_transactions_between, get_actions_since, CHECKPOINT_PATH)
+from src.dataset import load_all, by_event_time, transaction_dicts
+from src.backtest import ThresholdOptimizer
+from src.dedup import IngestDeduper
+from src.synthetic import SyntheticGenerator, new_id_prefix
+from src.rings import FraudRingGraph, ring_entities
+from src.hll import DistinctFeatures
+from src.alerts import AlertCoalescer
+from src.profiling import ProfileCapture, capture_from_env
+from src.memory import MemoryBudget, track_agent_state
+from src.batching import BatchScheduler
+from src.tiers import TierLatency, SlowPath
+from src.baselines import KINDS, EntityBaselines
+from src.quantiles import AmountSketches, local_hour
+from src.checkpoint import encode, write_checkpoint, read_checkpoint
+from src.metrics import record_cycle, record_ingest, watch_agent, serve_metrics
+from src.actions import Action, ActionExecutor, StubHandler
+from src.timestamps import now_us
 
 AGENT_CONFIG = {
     "highRiskThreshold": 20,
     "retryCountThreshold": 3,
+    "archiveAfterSec": 24 * 3600,
+    "archiveEverySteps": 50,
+    "archiveExpired": True,
+    "dedupCapacity": 100_000,
+    "syntheticFraudRate": 0.15,
+    "syntheticSpamRate": 0.25,
+    "syntheticRingRate": 0.0,
+    "ringMinBlocks": 1,
+    "ringMinSize": 3,
+    "ringTtlSec": 24 * 3600,
+    "ringMaxEntities": 100_000,
+    "distinctWindowSec": 600,
+    "subnetDeviceThreshold": 5,
+    "deviceBankThreshold": 6,
+    "deviceAppThreshold": 5,
+    "alertWindowSec": 300,
+    "actionWorkers": 4,
+    "actionMaxPending": 1000,
+    "processMemoryBudgetMB": 1024,
+    "memoryBudgetMB": {"hot_store": 64, "fraud_rings": 64, "distinct_features": 32},
+    "memoryCheckEvery": 10,
+    "metricsPort": 9108,
+    "latencyThreshold": 500,
+    "fastPathBudgetUs": 200,
+    "slowPathMaxPending": 100,
+    "ringBlockAfterBlocks": 3,
+    "baselineAlpha": 0.01,
+    "baselineFastAlpha": 0.1,
+    "baselineMinSamples": 30,
+    "baselineZ": 4.0,
+    "baselineSaveEvery": 20,
+    "amountQuantile": 0.995,
+    "amountSketchK": 200,
+    "amountMinCount": 200,
+    "minBatchSize": 2,
+    "maxBatchSize": 500,
+    "checkpointEverySteps": 50,
 }
 
 class SentinelAgent:
-    def __init__(self):
+    # checkpoint=False neither restores nor writes CHECKPOINT_PATH (benchmarks, throwaway agents)
+    def __init__(self, checkpoint=True):
         init_db()
         self.stats = {
             "processed": 0,
             "blocked": 0,
             "investigated": 0
         }
+        self.steps = 0
+        self.checkpointing = checkpoint
+        self.learned_threshold = None
+        # Ingest offsets: newest stream transaction decided on, dataset rows replayed
+        self.offset_us = 0
+        self.replayed = 0
+        # REASON/ACT batch size and loop interval, sized to keep p99 decision latency under latencyThreshold (ms)
+        self.scheduler = BatchScheduler(AGENT_CONFIG["latencyThreshold"], AGENT_CONFIG["minBatchSize"], AGENT_CONFIG["maxBatchSize"])
+        # Learned state comes from the last checkpoint when there is one, so startup does
+        # not refit the dataset; only the transactions stored after it are replayed below
+        state = read_checkpoint(CHECKPOINT_PATH) if checkpoint else None
+        if state is not None:
+            self.restore(state)
+        else:
+            self.fit(load_all())
+        # Downstream action handlers by action type ("*" catches the rest); the stub just records calls
+        self.executor = ActionExecutor({"*": StubHandler()}, max_workers=AGENT_CONFIG["actionWorkers"],
+                                       max_pending=AGENT_CONFIG["actionMaxPending"])
+        # Threshold rules decide inline; ring/sketch enrichments escalate later from the slow path
+        self.tiers = TierLatency(AGENT_CONFIG["fastPathBudgetUs"])
+        self.slow_path = SlowPath(self.enrich, self.tiers, max_pending=AGENT_CONFIG["slowPathMaxPending"])
+        # Byte budgets for the in-process state, shrunk before the process outgrows its limit
+        self.memory = MemoryBudget(AGENT_CONFIG["processMemoryBudgetMB"])
+        track_agent_state(self.memory, get_store(), self.rings, self.distinct, AGENT_CONFIG["memoryBudgetMB"])
+        # Prometheus text format on http://127.0.0.1:<metricsPort>/metrics
+        watch_agent(self, get_store())
+        serve_metrics(AGENT_CONFIG["metricsPort"])
+        self.deduper = IngestDeduper(existing_transaction_ids, capacity=AGENT_CONFIG["dedupCapacity"])
+        if state is not None:
+            self.deduper.filter = state["dedup"]
+            self.catch_up(state["saved_us"])
+        else:
+            self.deduper.warm(recent_transaction_ids(AGENT_CONFIG["dedupCapacity"]))
+        # Profiling capture of the next N run_step calls (SENTINEL_PROFILE or Settings); None when off
+        self.profile = capture_from_env(self, "run_step")
+
+    def fit(self, datasets):
+        # Cold start: every model is fitted to the historical dataset, which stands in for
+        # everything stored so far; a later catch_up() only replays what is stored after now
+        self.offset_us = now_us()
+        self.optimizer = ThresholdOptimizer()
+        self.optimizer.fit_dataset(datasets)
+        self.generator = SyntheticGenerator.from_datasets(datasets, fraud_rate=AGENT_CONFIG["syntheticFraudRate"],
+                                                          spam_rate=AGENT_CONFIG["syntheticSpamRate"],
+                                                          ring_rate=AGENT_CONFIG["syntheticRingRate"])
+        # What normal looks like per bank and merchant: restored from the last save, else fitted to the dataset
+        self.baselines = EntityBaselines(AGENT_CONFIG["baselineAlpha"], AGENT_CONFIG["baselineFastAlpha"],
+                                         AGENT_CONFIG["baselineMinSamples"])
+        saved = load_baselines()
+        if saved:
+            self.baselines.load(saved)
+        else:
+            self.baselines.fit_dataset(datasets)
+            save_baselines(self.baselines)
+        # Amount quantile sketches per merchant, bank and hour of day, seeded from the dataset
+        self.amounts = AmountSketches(AGENT_CONFIG["amountSketchK"], AGENT_CONFIG["amountQuantile"], AGENT_CONFIG["amountMinCount"])
+        self.amounts.fit_dataset(datasets)
+        # Wall-clock windows, so their timestamps still mean something after a restore
+        self.rings = FraudRingGraph(ttl_sec=AGENT_CONFIG["ringTtlSec"], max_entities=AGENT_CONFIG["ringMaxEntities"], clock=time.time)
+        self.distinct = DistinctFeatures(window_sec=AGENT_CONFIG["distinctWindowSec"], clock=time.time)
+        self.alerts = AlertCoalescer(window_sec=AGENT_CONFIG["alertWindowSec"])
+
+    def state(self):
+        # Everything restore() needs; call with the slow path's lock held
+        return {
+            "saved_us": now_us(),
+            "stats": dict(self.stats),
+            "steps": self.steps,
+            "learned_threshold": self.learned_threshold,
+            "offset_us": self.offset_us,
+            "replayed": self.replayed,
+            "batch": (self.scheduler.batch_size, self.scheduler.interval_sec),
+            "optimizer": self.optimizer,
+            "generator": self.generator,
+            "baselines": self.baselines,
+            "amounts": self.amounts,
+            "rings": self.rings,
+            "distinct": self.distinct,
+            "alerts": self.alerts,
+            "dedup": self.deduper.filter,
+        }
+
+    def restore(self, state):
+        for name in ("stats", "steps", "learned_threshold", "offset_us", "replayed", "optimizer",
+                     "generator", "baselines", "amounts", "rings", "distinct", "alerts"):
+            setattr(self, name, state[name])
+        self.scheduler.resume(*state["batch"])
+        # A fresh id namespace, as a new generator would have; the saved sequence was already used
+        self.generator.id_prefix = new_id_prefix()
+        self.generator.seq = 0
+
+    def checkpoint(self):
+        # Snapshots the state under the slow path's lock without waiting for its queue, so
+        # the loop is never held up by pending enrichments, then writes it atomically;
+        # returns the bytes written. Batches still queued are covered by offset_us but not
+        # yet by the rings and distinct counts, which restore as checkpointed anyway.
+        if not self.checkpointing:
+            return 0
+        with self.slow_path.lock:
+            blob = encode(self.state())
+        return write_checkpoint(CHECKPOINT_PATH, blob)
+
+    def catch_up(self, saved_us):
+        # Transactions stored after the checkpoint were already decided on, so they are only
+        # learned from (no actions) and the actions taken since are counted. Stored rows carry
+        # no device/IP or label, so the rings, distinct counts and threshold backtest resume
+        # as of the checkpoint, at most checkpointEverySteps behind.
+        start = time.perf_counter()
+        tail = get_transactions_between(self.offset_us + 1, now_us() + 1)[::-1]
+        actions = get_actions_since(saved_us)
+        for t in tail:
+            for kind in KINDS:
+                entity = getattr(t, kind)
+                if entity:
+                    self.baselines.observe(kind, entity, t.amount, t.status == 'Failed', t.retry_count)
+            self.amounts.observe(t.merchant, t.bank, local_hour(t.ts_us), t.amount)
+            self.offset_us = max(self.offset_us, t.ts_us)
+        self.deduper.warm(t.id for t in tail)
+        self.stats["processed"] += len(tail)
+        for action_type, _ in actions:
+            self.stats["blocked" if action_type == "BLOCK" else "investigated"] += 1
+        log_event("SYSTEM", f"Restored checkpoint ({self.stats['processed']} processed, {len(tail)} newer transactions replayed) "
+                  f"in {(time.perf_counter() - start) * 1000:.0f} ms.", details={"tail": len(tail), "actions": len(actions)})
+        return len(tail)
     
+    def shared_infra_reasons(self, features):
+        # Approximate (HyperLogLog) distinct counts, so thresholds carry a few percent of slack
+        reasons = []
+        if features["subnet_devices"] > AGENT_CONFIG["subnetDeviceThreshold"]:
+            reasons.append(f"{features['subnet_devices']} devices on {features['subnet']}")
+        if features["device_banks"] > AGENT_CONFIG["deviceBankThreshold"]:
+            reasons.append(f"device used {features['device_banks']} banks")
+        if features["device_apps"] > AGENT_CONFIG["deviceAppThreshold"]:
+            reasons.append(f"device used {features['device_apps']} UPI apps")
+        return reasons
+
+    def baseline_reasons(self, t, spikes):
+        # z-scores against the bank's and merchant's running baselines (scored, then learned);
+        # failure-rate spikes belong to the entity, so they are collected into spikes instead
+        reasons = []
+        limit = AGENT_CONFIG["baselineZ"]
+        for kind in KINDS:
+            entity = getattr(t, kind)
+            scores = self.baselines.observe(kind, entity, t.amount, t.status == 'Failed', t.retry_count) if entity else None
+            if scores is None:
+                continue
+            amount_z, retry_z, failure_z = scores
+            if abs(amount_z) > limit:
+                reasons.append(f"amount {t.amount:,.0f} is {amount_z:+.1f} sd from {entity}'s baseline")
+            if retry_z > limit:
+                reasons.append(f"{t.retry_count} retries is {retry_z:+.1f} sd above {entity}'s baseline")
+            if failure_z > limit:
+                spikes[(kind, entity)] = (failure_z, t.id)
+        return reasons
+
+    def amount_reasons(self, t):
+        # Flags amounts above the merchant's quantile cutoff, naming any bank/hour cutoffs also exceeded
+        above = self.amounts.observe(t.merchant, t.bank, local_hour(t.ts_us), t.amount)
+        if not any(kind == "merchant" for kind, _, _ in above):
+            return None
+        label = f"p{AGENT_CONFIG['amountQuantile'] * 100:g}"
+        return f"amount {t.amount:,.0f} above {label} of " + ", ".join(
+            f"{key:02d}h ({cutoff:,.0f})" if kind == "hour" else f"{key} ({cutoff:,.0f})" for kind, key, cutoff in above)
+
     @property
     def fraud_threshold(self):
         return float(get_config("fraud_threshold", 0.8))
@@ -28,111 +245,212 @@ class SentinelAgent:
         set_config("fraud_threshold", value)
 
     def load_historical_data(self):
-        paths = [
-            os.path.join("attached_assets", "fraud_data.csv"),
-            os.path.join("..", "datasettt", "fraud_data_20251225_004640.csv")
-        ]
-        
         count = 0
-        for path in paths:
-            if os.path.exists(path):
-                try:
-                    with open(path, 'r', encoding='utf-8') as f:
-                        reader = csv.reader(f)
-                        header = next(reader, None)
-                        if not header: continue
-                        for row in reader:
-                            if len(row) < 14: continue
-                            try:
-                                status = row[9]
-                                if status.lower() == 'success': status = 'Processed'
-                                elif status.lower() == 'failed': status = 'Failed'
-                                
-                                tx = Transaction({
-                                    "id": row[1],
-                                    "timestamp": row[2],
-                                    "amount": row[4],
-                                    "merchant": row[7],
-                                    "bank": row[8],
-                                    "status": status,
-                                    "error_code": row[10] if row[10] else None,
-                                    "risk_score": row[13] if row[13] else 0,
-                                    "fraud_probability": (float(row[13] or 0) / 100),
-                                    "retry_count": row[20] if row[20] else 0
-                                })
-                                tx.save()
-                                count += 1
-                            except: continue
-                except: pass
+        for path, cols in load_all():
+            received = [Transaction(d) for d in transaction_dicts(cols)]
+            txs = self.deduper.filter_batch(received)
+            record_ingest("historical", len(received), len(txs))
+            save_transactions(txs)
+            count += len(txs)
         
-        log_event("SYSTEM", f"Dataset loaded: {count} historical records.")
+        log_event("SYSTEM", f"Dataset loaded: {count} historical records ({self.deduper.stats['duplicates']} duplicates dropped).")
 
     def generate_synthetic_stream(self, n=1):
-        merchants = ["Amazon", "Walmart", "Apple", "Netflix", "Uber", "Airbnb"]
-        banks = ["HDFC", "SBI", "Axis", "ICICI", "Chase"]
-        error_codes = ["UPI_AUTHENTICATION_FAILED", "INSUFFICIENT_FUNDS", "BANK_SERVER_ERROR", "RISK_CHECK_FAILED"]
-        
-        batch = []
-        for i in range(n):
-            is_spam = random.random() < 0.25
-            is_fraud = random.random() < 0.15
-            
-            tx = Transaction({
-                "id": f"TX_{int(time.time())}_{random.randint(1000,9999)}",
-                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "merchant": random.choice(merchants),
-                "amount": round(random.uniform(10, 5000), 2),
-                "bank": random.choice(banks),
-                "status": "Failed" if is_spam else "Processed",
-                "error_code": random.choice(error_codes) if is_spam else None,
-                "risk_score": random.randint(80, 100) if is_fraud else random.randint(0, 30),
-                "fraud_probability": round(random.uniform(0.8, 0.99) if is_fraud else random.uniform(0.01, 0.2), 2),
-                "retry_count": random.randint(4, 10) if is_spam else 0
-            })
-            tx.save()
-            batch.append(tx)
+        received = [Transaction(d) for d in self.generator.transactions(n, start_us=now_us())]
+        batch = self.deduper.filter_batch(received)
+        record_ingest("synthetic", len(received), len(batch))
+        save_transactions(batch)
         return batch
 
-    def run_step(self):
-        # 1. OBSERVE
-        current_batch = self.generate_synthetic_stream(random.randint(2, 5))
+    def run_step(self, batch=None):
+        start, stats_before = time.perf_counter(), dict(self.stats)
+        # 1. OBSERVE (replay passes its own batch, otherwise the synthetic stream)
+        current_batch = batch if batch is not None else self.generate_synthetic_stream(self.scheduler.batch_size)
+        if batch is None and current_batch:
+            self.offset_us = max(self.offset_us, max(t.ts_us for t in current_batch))
         self.stats["processed"] += len(current_batch)
-        log_event("OBSERVE", f"Ingested {len(current_batch)} new transactions.")
+        log_event("OBSERVE", f"Ingested {len(current_batch)} new transactions.", details={"ids": [t.id for t in current_batch]})
 
-        # 2. REASON
+        # 2. FAST PATH (threshold rules: every transaction is allowed, blocked or flagged right here)
+        threshold = self.fraud_threshold
+        fast_start = time.perf_counter()
         high_risk = [t for t in current_batch if t.risk_score > AGENT_CONFIG["highRiskThreshold"] and t.status == 'Processed']
-        fraud_spikes = [t for t in current_batch if t.fraud_probability > self.fraud_threshold]
+        fraud_spikes = [t for t in current_batch if t.fraud_probability > threshold]
         banking_spam = [t for t in current_batch if t.status == 'Failed' and t.error_code and (t.retry_count > AGENT_CONFIG["retryCountThreshold"] or "AUTHENTICATION_FAILED" in t.error_code)]
 
-        # 3. DECIDE & ACT
         actions = []
         if high_risk:
             for t in high_risk:
-                actions.append(f"INVESTIGATE: High Risk {t.id}")
+                actions.append(Action("INVESTIGATE", "High Risk", t.id, f"risk score {t.risk_score} > {AGENT_CONFIG['highRiskThreshold']}",
+                                      key=t.device_fingerprint))
                 self.stats["investigated"] += 1
         
         if fraud_spikes:
             for t in fraud_spikes:
-                actions.append(f"BLOCK: Fraud Spike {t.id} ({t.fraud_probability})")
+                actions.append(Action("BLOCK", "Fraud Spike", t.id, f"fraud probability {t.fraud_probability} > {threshold:.2f}",
+                                      key=t.device_fingerprint))
                 self.stats["blocked"] += 1
                 
         if banking_spam:
             for t in banking_spam:
-                actions.append(f"ALERT: Banking Spam {t.bank} ({t.error_code})")
+                actions.append(Action("ALERT", "Banking Spam", t.id, f"{t.bank} ({t.error_code}), {t.retry_count} retries",
+                                      key=f"{t.bank}/{t.error_code}"))
                 self.stats["investigated"] += 1
 
-        if actions:
-            if len(actions) > 3:
-                log_event("ACT", f"Executed {len(actions)} defensive actions.")
-            else:
-                for a in actions:
-                    log_event("ACT", a)
+        spikes = {}
+        for t in current_batch:
+            reasons = self.baseline_reasons(t, spikes)
+            if reasons:
+                actions.append(Action("INVESTIGATE", "Baseline Deviation", t.id, ", ".join(reasons), key=t.device_fingerprint))
+                self.stats["investigated"] += 1
+            outlier = self.amount_reasons(t)
+            if outlier:
+                actions.append(Action("INVESTIGATE", "Amount Outlier", t.id, outlier, key=t.device_fingerprint))
+                self.stats["investigated"] += 1
+        for (kind, entity), (z, tx_id) in spikes.items():
+            base = self.baselines.get(kind, entity)
+            actions.append(Action("ALERT", "Failure Rate Spike", tx_id, f"{kind} {entity} failing {base.fail_fast:.0%} "
+                                  f"vs {base.fail_rate:.0%} baseline ({z:+.1f} sd)", key=f"{kind}/{entity}"))
+            self.stats["investigated"] += 1
+        if current_batch:
+            self.tiers.observe("fast", len(current_batch), time.perf_counter() - fast_start)
+
+        # 3. SLOW PATH (ring graph and distinct-count enrichments run off-thread; what they
+        # escalate for earlier batches is acted on now, together with the fast-path actions)
+        self.slow_path.submit(current_batch, fraud_spikes)
+        actions.extend(self.take_escalations())
+        self.act(actions)
         
-        # 4. LEARN (Feedback Loop)
-        if random.random() < 0.2:
-            direction = random.choice([-0.01, 0.01])
-            current_thresh = self.fraud_threshold
-            new_thresh = max(0.5, min(0.99, current_thresh + direction))
-            if new_thresh != current_thresh:
+        # 4. LEARN (Feedback Loop: backtest every threshold over labelled outcomes)
+        for t in current_batch:
+            if t.is_suspicious is not None:
+                self.optimizer.update(t.fraud_probability, t.is_suspicious)
+        best = self.optimizer.best_threshold()
+        if best is not None:
+            new_thresh, precision, recall = best
+            # Only act when the backtest optimum moves, so manual overrides stick until then
+            if new_thresh != self.learned_threshold:
+                self.learned_threshold = new_thresh
                 self.fraud_threshold = new_thresh
-                log_event("LEARN", f"Adjusted fraud threshold to {new_thresh:.2f} based on patterns.")
+                log_event("LEARN", f"Adjusted fraud threshold to {new_thresh:.2f} (precision {precision:.2f}, recall {recall:.2f}).",
+                          details={"threshold": new_thresh, "precision": precision, "recall": recall})
+
+        # The decision cycle ends here; maintenance below is not decision latency
+        seconds = time.perf_counter() - start
+        self.scheduler.record(len(current_batch), seconds)
+        record_cycle("run_step", stats_before, self.stats, seconds)
+
+        # 5. RETENTION (expired partitions are sealed into columnar segments, then dropped)
+        self.steps += 1
+        if self.steps % AGENT_CONFIG["archiveEverySteps"] == 0:
+            dropped = archive_old_transactions(AGENT_CONFIG["archiveAfterSec"], AGENT_CONFIG["archiveExpired"])
+            if dropped:
+                log_event("SYSTEM", f"Retention dropped {len(dropped)} partition(s): {', '.join(dropped)}.", details={"partitions": dropped})
+
+        # Baselines are saved every few steps; a restart resumes from the last save
+        if self.steps % AGENT_CONFIG["baselineSaveEvery"] == 0:
+            save_baselines(self.baselines)
+
+        # 6. MEMORY (structures over budget are shrunk, oldest/least recently used first;
+        # the rings and sketches belong to the slow path, so it pauses meanwhile)
+        if self.steps % AGENT_CONFIG["memoryCheckEvery"] == 0:
+            with self.slow_path.lock:
+                shrunk = self.memory.check()
+            for name, before, after in shrunk:
+                log_event("SYSTEM", f"Memory budget: shrank {name} from {before / 1e6:.2f} MB to {after / 1e6:.2f} MB.",
+                          details={"structure": name, "before": before, "after": after})
+
+        # 7. CHECKPOINT (a restart resumes from here)
+        if self.steps % AGENT_CONFIG["checkpointEverySteps"] == 0:
+            self.checkpoint()
+        return current_batch
+
+    def enrich(self, batch, blocked):
+        # Slow path, on the SlowPath thread: transactions whose device/IP links them to a
+        # component that was blocked before, and devices/subnets fanning out over many
+        # distinct banks, apps or devices. Rings with ringBlockAfterBlocks prior blocks are
+        # blocked outright unless the fast path already did.
+        actions = []
+        blocked = list(blocked)
+        blocked_ids = {t.id for t in blocked}
+        for t in batch:
+            ring = self.rings.observe(ring_entities(t.device_fingerprint, t.ip_address), t.amount, now=t.ts_us / 1_000_000)
+            if ring and ring["size"] >= AGENT_CONFIG["ringMinSize"] and ring["blocked"] >= AGENT_CONFIG["ringMinBlocks"]:
+                reason = f"{ring['size']} linked devices/IPs, {ring['blocked']} prior blocks"
+                if ring["blocked"] >= AGENT_CONFIG["ringBlockAfterBlocks"] and t.id not in blocked_ids:
+                    actions.append(Action("BLOCK", "Fraud Ring", t.id, reason, key=t.device_fingerprint))
+                    blocked.append(t)
+                else:
+                    actions.append(Action("INVESTIGATE", "Fraud Ring", t.id, reason, key=t.device_fingerprint))
+            reasons = self.shared_infra_reasons(self.distinct.observe(t.device_fingerprint, t.ip_address, t.bank, t.merchant,
+                                                                      now=t.ts_us / 1_000_000))
+            if reasons:
+                actions.append(Action("INVESTIGATE", "Shared Infrastructure", t.id, ", ".join(reasons), key=t.device_fingerprint))
+        for t in blocked:
+            self.rings.mark_blocked(ring_entities(t.device_fingerprint, t.ip_address))
+        return actions
+
+    def take_escalations(self):
+        escalated = self.slow_path.drain()
+        for a in escalated:
+            self.stats["blocked" if a.action_type == "BLOCK" else "investigated"] += 1
+        return escalated
+
+    def act(self, actions):
+        if actions:
+            # Persisted as one batch, then dispatched off-thread so slow handlers never hold up the loop
+            save_actions(actions)
+            self.executor.submit(actions)
+            # Repeats of an open alert only bump its count in the alerts table
+            opened = [a for a in actions if self.alerts.add(a.label, a.key, f"{a.tx_id} ({a.reason})")]
+            if len(opened) > 3:
+                log_event("ACT", f"Executed {len(actions)} defensive actions ({len(opened)} new alerts).",
+                          details={"actions": [a.record() for a in opened]}, reasons=[a.reason for a in opened])
+            else:
+                for a in opened:
+                    log_event("ACT", f"{a.label} {a.tx_id} ({a.reason})", details=a.record(), reasons=[a.reason])
+            save_alerts(self.alerts)
+        save_action_results(self.executor.drain())
+
+    def start_profile(self, cycles, mode="cprofile"):
+        self.profile = ProfileCapture(self, "run_step", cycles, mode)
+        return self.profile
+
+    def close(self):
+        # Waits for pending enrichments, in-flight actions and cold-tier writes and records their outcome;
+        # the slow path stops first, so the final checkpoint covers every batch
+        self.slow_path.close()
+        self.act(self.take_escalations())
+        self.checkpoint()
+        self.executor.shutdown()
+        save_action_results(self.executor.drain())
+        save_baselines(self.baselines)
+        flush_transactions()
+        if self.profile is not None:
+            self.profile.finish()
+
+    def replay(self, batch_size=None, limit=None, resume=False):
+        # Feeds the historical dataset through REASON/ACT/LEARN instead of the synthetic stream;
+        # without a fixed batch_size the scheduler sizes each batch. resume skips the rows
+        # already replayed before the last checkpoint.
+        skip = self.replayed if resume else 0
+        replayed = 0
+        batch = []
+        for path, cols in load_all():
+            for tx_data in transaction_dicts(by_event_time(cols)):
+                if skip:
+                    skip -= 1
+                    continue
+                if limit is not None and replayed + len(batch) >= limit:
+                    break
+                batch.append(Transaction(tx_data))
+                if len(batch) >= (batch_size or self.scheduler.batch_size):
+                    self.replayed += len(batch)
+                    self.run_step(batch)
+                    replayed += len(batch)
+                    batch = []
+        if batch:
+            self.replayed += len(batch)
+            self.run_step(batch)
+            replayed += len(batch)
+        return replayed
@@ -0,0 +1,90 @@
+from src.timestamps import now_us
+from src.metrics import DB_WRITE_SECONDS
+
+# One row per coalesced alert: identical (action, key) pairs raised within
+# window_sec of the row's first occurrence only bump its count and last_seen_us.
+ALERTS_TABLE = "alerts"
+ALERTS_SCHEMA = f'''CREATE TABLE IF NOT EXISTS {ALERTS_TABLE} (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    action TEXT,
+    alert_key TEXT,
+    message TEXT,
+    count INTEGER,
+    first_seen_us INTEGER,
+    last_seen_us INTEGER
+)'''
+
+class AlertCoalescer:
+    def __init__(self, window_sec=300, clock=now_us):
+        self.window_us = int(window_sec * 1_000_000)
+        self.clock = clock
+        # (action, key) -> open group; insertion order is first-seen order
+        self.groups = {}
+        # Expired groups whose final count has not been flushed yet
+        self.closed = []
+        self.raised = 0
+
+    def _expire(self, now):
+        while self.groups:
+            key, group = next(iter(self.groups.items()))
+            if now - group["first_seen_us"] < self.window_us:
+                break
+            del self.groups[key]
+            if group["dirty"]:
+                self.closed.append(group)
+
+    def add(self, action, key, message="", now=None):
+        # Returns True when this opens a new alert, False when it was coalesced
+        now = self.clock() if now is None else now
+        self.raised += 1
+        self._expire(now)
+        group = self.groups.get((action, key))
+        if group is not None:
+            group["count"] += 1
+            group["last_seen_us"] = now
+            group["message"] = message
+            group["dirty"] = True
+            return False
+        self.groups[(action, key)] = {"id": None, "action": action, "key": key, "message": message,
+                                      "count": 1, "first_seen_us": now, "last_seen_us": now, "dirty": True}
+        return True
+
+    def pending(self):
+        # Groups created or updated since the last flush
+        closed, self.closed = self.closed, []
+        return closed + [g for g in self.groups.values() if g["dirty"]]
+
+def init_alerts(conn):
+    c = conn.cursor()
+    c.execute(ALERTS_SCHEMA)
+    c.execute(f"CREATE INDEX IF NOT EXISTS idx_{ALERTS_TABLE}_last_seen_us ON {ALERTS_TABLE}(last_seen_us)")
+    conn.commit()
+
+def write_alerts(conn, coalescer):
+    # New alerts are inserted once; later occurrences become one UPDATE per alert per flush
+    groups = coalescer.pending()
+    if not groups:
+        return 0
+    c = conn.cursor()
+    with DB_WRITE_SECONDS.time(table="alerts"):
+        c.executemany(f"UPDATE {ALERTS_TABLE} SET message=?, count=?, last_seen_us=? WHERE id=?",
+                      [(g["message"], g["count"], g["last_seen_us"], g["id"]) for g in groups if g["id"] is not None])
+        for g in groups:
+            if g["id"] is None:
+                c.execute(f"INSERT INTO {ALERTS_TABLE} (action, alert_key, message, count, first_seen_us, last_seen_us) "
+                          "VALUES (?,?,?,?,?,?)", (g["action"], g["key"], g["message"], g["count"], g["first_seen_us"], g["last_seen_us"]))
+                g["id"] = c.lastrowid
+        conn.commit()
+    for g in groups:
+        g["dirty"] = False
+    return len(groups)
+
+def recent_alerts(conn, limit=50):
+    c = conn.cursor()
+    c.execute(f"SELECT action, alert_key, message, count, first_seen_us, last_seen_us FROM {ALERTS_TABLE} "
+              "ORDER BY last_seen_us DESC LIMIT ?", (limit,))
+    return c.fetchall()
+
+def clear_alerts(conn):
+    conn.cursor().execute(f"DELETE FROM {ALERTS_TABLE}")
+    conn.commit()
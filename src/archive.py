@@ -0,0 +1,189 @@
+import os
+import json
+import time
+import shutil
+import numpy as np
+from src.timestamps import to_epoch_us
+from src.partitions import expired_partitions, drop_partitions
+
+ARCHIVE_DIR = "sentinel_archive"
+
+# Column layout of a sealed segment (one .npy file per column)
+SEGMENT_COLUMNS = {
+    "id": "U",
+    "ts_us": "int64",
+    "timestamp": "U",
+    "merchant": "U",
+    "amount": "float64",
+    "bank": "U",
+    "status": "U",
+    "risk_score": "int32",
+    "fraud_probability": "float64",
+    "error_code": "U",
+    "retry_count": "int32",
+}
+
+OPS = {
+    "==": lambda col, v: col == v,
+    "!=": lambda col, v: col != v,
+    "<": lambda col, v: col < v,
+    "<=": lambda col, v: col <= v,
+    ">": lambda col, v: col > v,
+    ">=": lambda col, v: col >= v,
+}
+
+def column_array(values, kind):
+    if kind == "U":
+        return np.array(["" if v is None else str(v) for v in values], dtype=str)
+    return np.array(values, dtype=kind)
+
+# --- WRITER ---
+def seal_segment(rows, archive_dir=ARCHIVE_DIR):
+    # rows: list of dicts with the transaction columns; the segment is immutable once sealed
+    if not rows:
+        return None
+    for r in rows:
+        if "ts_us" not in r:
+            r["ts_us"] = to_epoch_us(r.get("timestamp")) or 0
+    rows = sorted(rows, key=lambda r: r["ts_us"])
+
+    os.makedirs(archive_dir, exist_ok=True)
+    name = f"seg_{rows[0]['ts_us']}_{rows[-1]['ts_us']}_{len(rows)}"
+    final_path = os.path.join(archive_dir, name)
+    if os.path.exists(final_path):
+        name = f"{name}_{time.time_ns()}"
+        final_path = os.path.join(archive_dir, name)
+    tmp_path = os.path.join(archive_dir, f".tmp_{name}")
+    os.makedirs(tmp_path)
+
+    meta = {"rows": len(rows), "sealed_at": time.time(), "columns": {}}
+    for col, kind in SEGMENT_COLUMNS.items():
+        values = [r.get(col) for r in rows]
+        arr = column_array(values, kind)
+        np.save(os.path.join(tmp_path, f"{col}.npy"), arr)
+        if kind == "U":
+            lo, hi = min(arr.tolist()), max(arr.tolist())
+        else:
+            lo, hi = arr.min().item(), arr.max().item()
+        meta["columns"][col] = {"min": lo, "max": hi}
+
+    with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+        json.dump(meta, f)
+    # Rename last so readers never see a half-written segment
+    os.rename(tmp_path, final_path)
+    return final_path
+
+def seal_from_db(conn, cutoff_us, archive_dir=ARCHIVE_DIR):
+    # Seals every transaction partition that ended before cutoff_us into its own
+    # segment, then drops the partition table; returns the dropped partitions.
+    # Ids already in the archive are skipped, so re-ingested history that expires
+    # again is not sealed a second time
+    c = conn.cursor()
+    sealed = []
+    archived = ArchiveReader(archive_dir)
+    for name, start_us, end_us in expired_partitions(conn, cutoff_us):
+        c.execute("SELECT id, timestamp, merchant, amount, bank, status, risk_score, fraud_probability, error_code, retry_count, ts_us "
+                  f"FROM {name}")
+        rows = [{
+            "id": r[0], "timestamp": r[1], "merchant": r[2], "amount": r[3] or 0.0,
+            "bank": r[4], "status": r[5], "risk_score": r[6] or 0, "fraud_probability": r[7] or 0.0,
+            "error_code": r[8], "retry_count": r[9] or 0, "ts_us": r[10]
+        } for r in c.fetchall()]
+        if rows and archived.segments:
+            known = archived.contains([r["id"] for r in rows])
+            rows = [r for r, seen in zip(rows, known.tolist()) if not seen]
+        if seal_segment(rows, archive_dir):
+            archived.refresh()
+        sealed.append(name)
+    drop_partitions(conn, sealed)
+    return sealed
+
+def clear_archive(archive_dir=ARCHIVE_DIR):
+    if os.path.isdir(archive_dir):
+        shutil.rmtree(archive_dir)
+
+# --- READER ---
+class ArchiveReader:
+    def __init__(self, archive_dir=ARCHIVE_DIR):
+        self.archive_dir = archive_dir
+        self.segments = []
+        self.refresh()
+
+    def refresh(self):
+        self.segments = []
+        if not os.path.isdir(self.archive_dir):
+            return
+        for name in sorted(os.listdir(self.archive_dir)):
+            meta_path = os.path.join(self.archive_dir, name, "meta.json")
+            if name.startswith("seg_") and os.path.exists(meta_path):
+                with open(meta_path) as f:
+                    self.segments.append((os.path.join(self.archive_dir, name), json.load(f)))
+
+    def _may_match(self, meta, where):
+        # Predicate pruning on the per-segment min/max stats
+        for col, op, value in where:
+            stats = meta["columns"].get(col)
+            if stats is None:
+                continue
+            lo, hi = stats["min"], stats["max"]
+            if op == "==" and (value < lo or value > hi): return False
+            if op == "<" and lo >= value: return False
+            if op == "<=" and lo > value: return False
+            if op == ">" and hi <= value: return False
+            if op == ">=" and hi < value: return False
+        return True
+
+    def scan(self, columns=None, where=()):
+        # where: iterable of (column, op, value); returns a dict of column -> ndarray
+        columns = list(columns or SEGMENT_COLUMNS)
+        where = list(where)
+        needed = list(dict.fromkeys(columns + [w[0] for w in where]))
+        parts = {col: [] for col in columns}
+        self.segments_scanned = 0
+        for path, meta in self.segments:
+            if not self._may_match(meta, where):
+                continue
+            self.segments_scanned += 1
+            # Column projection: only the needed files are mapped
+            data = {col: np.load(os.path.join(path, f"{col}.npy"), mmap_mode="r") for col in needed}
+            mask = None
+            for col, op, value in where:
+                m = OPS[op](data[col], value)
+                mask = m if mask is None else (mask & m)
+            for col in columns:
+                parts[col].append(data[col] if mask is None else data[col][mask])
+        return {
+            col: np.concatenate(chunks) if chunks else np.array([], dtype=SEGMENT_COLUMNS[col])
+            for col, chunks in parts.items()
+        }
+
+    def to_dataframe(self, columns=None, where=()):
+        import pandas as pd
+        return pd.DataFrame(self.scan(columns, where))
+
+    def newest(self, limit, columns):
+        # The newest `limit` rows, newest first; older segments are pruned on ts_us
+        if limit <= 0 or not self.segments:
+            return {col: np.array([], dtype=SEGMENT_COLUMNS[col]) for col in columns}
+        cutoff, rows = 0, 0
+        for _, meta in sorted(self.segments, key=lambda s: -s[1]["columns"]["ts_us"]["max"]):
+            cutoff, rows = meta["columns"]["ts_us"]["min"], rows + meta["rows"]
+            if rows >= limit:
+                break
+        data = self.scan(list(dict.fromkeys(list(columns) + ["ts_us"])), [("ts_us", ">=", cutoff)])
+        order = np.argsort(data["ts_us"], kind="stable")[::-1][:limit]
+        return {col: data[col][order] for col in columns}
+
+    def contains(self, ids):
+        # Boolean mask over ids: which are already sealed in some segment
+        ids = np.asarray(ids, dtype=str)
+        found = np.zeros(len(ids), dtype=bool)
+        for path, meta in self.segments:
+            stats = meta["columns"]["id"]
+            candidates = (ids >= stats["min"]) & (ids <= stats["max"]) & ~found
+            if candidates.any():
+                found[candidates] = np.isin(ids[candidates], np.load(os.path.join(path, "id.npy"), mmap_mode="r"))
+        return found
+
+    def total_rows(self):
+        return sum(meta["rows"] for _, meta in self.segments)
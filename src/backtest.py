@@ -0,0 +1,90 @@
+import numpy as np
+
+# Relative cost of letting a fraudulent transaction through vs. blocking a good one
+FP_COST = 1.0
+FN_COST = 5.0
+
+def sweep(scores, labels, fp_cost=FP_COST, fn_cost=FN_COST):
+    # Exact backtest of the "block if score > t" rule for every distinct score t,
+    # in one sort + cumsum pass over the labelled history
+    scores = np.asarray(scores, dtype=np.float64)
+    labels = np.asarray(labels, dtype=bool)
+    order = np.argsort(scores, kind="mergesort")
+    s, y = scores[order], labels[order]
+    pos_total, neg_total = int(y.sum()), int((~y).sum())
+
+    # Last index of each run of equal scores: everything after it is strictly greater
+    last = np.r_[s[1:] != s[:-1], True] if len(s) else np.array([], dtype=bool)
+    tp = pos_total - np.cumsum(y)[last]
+    fp = neg_total - np.cumsum(~y)[last]
+    return _curve(s[last], tp, fp, pos_total, fp_cost, fn_cost)
+
+def _curve(thresholds, tp, fp, pos_total, fp_cost, fn_cost):
+    fn = pos_total - tp
+    flagged = tp + fp
+    precision = np.divide(tp, flagged, out=np.ones(len(tp)), where=flagged > 0)
+    recall = tp / pos_total if pos_total else np.zeros(len(tp))
+    return {
+        "threshold": thresholds,
+        "tp": tp,
+        "fp": fp,
+        "fn": fn,
+        "precision": precision,
+        "recall": recall,
+        "cost": fp * fp_cost + fn * fn_cost,
+    }
+
+class ThresholdOptimizer:
+    # Candidate thresholds live on a fixed grid (0.00 .. 1.00 by default) so every
+    # new outcome is an O(grid) in-place update of the tp/fp curves
+    def __init__(self, resolution=0.01, fp_cost=FP_COST, fn_cost=FN_COST):
+        self.bins = int(round(1 / resolution)) + 1
+        self.resolution = resolution
+        self.fp_cost = fp_cost
+        self.fn_cost = fn_cost
+        self.thresholds = np.arange(self.bins) * resolution
+        self.tp = np.zeros(self.bins, dtype=np.int64)
+        self.fp = np.zeros(self.bins, dtype=np.int64)
+        self.pos_total = 0
+        self.neg_total = 0
+
+    def _bin(self, scores):
+        return np.clip(np.rint(np.asarray(scores, dtype=np.float64) / self.resolution), 0, self.bins - 1).astype(np.int64)
+
+    def fit(self, scores, labels):
+        # Bulk load: histogram the outcomes, then a reverse cumsum gives "count of scores > t"
+        b = self._bin(scores)
+        labels = np.asarray(labels, dtype=bool)
+        pos = np.bincount(b[labels], minlength=self.bins)
+        neg = np.bincount(b[~labels], minlength=self.bins)
+        self.tp += np.r_[np.cumsum(pos[::-1])[::-1][1:], 0]
+        self.fp += np.r_[np.cumsum(neg[::-1])[::-1][1:], 0]
+        self.pos_total += int(pos.sum())
+        self.neg_total += int(neg.sum())
+
+    def update(self, score, is_fraud):
+        # One new outcome only moves the thresholds strictly below its score
+        b = int(self._bin(score))
+        if is_fraud:
+            self.tp[:b] += 1
+            self.pos_total += 1
+        else:
+            self.fp[:b] += 1
+            self.neg_total += 1
+
+    def curve(self):
+        return _curve(self.thresholds, self.tp, self.fp, self.pos_total, self.fp_cost, self.fn_cost)
+
+    def best_threshold(self, lo=0.5, hi=0.99):
+        if not self.pos_total and not self.neg_total:
+            return None
+        curve = self.curve()
+        idx = np.flatnonzero((self.thresholds >= lo - 1e-9) & (self.thresholds <= hi + 1e-9))
+        cost = curve["cost"][idx]
+        # Among equally cheap thresholds prefer the highest (fewest blocks)
+        best = idx[np.flatnonzero(cost == cost.min())[-1]]
+        return round(float(self.thresholds[best]), 4), float(curve["precision"][best]), float(curve["recall"][best])
+
+    def fit_dataset(self, datasets):
+        for path, cols in datasets:
+            self.fit(cols["fraud_score"] / 100, cols["is_suspicious"])
@@ -0,0 +1,156 @@
+import math
+from src.timestamps import now_us
+from src.metrics import DB_WRITE_SECONDS
+
+# Running behavioural baselines per bank and per merchant (UPI app), updated in
+# O(1) per transaction. Each statistic is an exponentially weighted Welford
+# update with weight max(1/n, alpha): exact running mean/variance for the first
+# 1/alpha transactions, an EWMA that follows drift after that.
+#   amount   - log1p(amount), so one large payment does not swamp the variance
+#   retries  - retry count per transaction
+#   failures - failure rate twice over: a slow baseline and a fast EWMA; the
+#              fast one drifting above the baseline is an EWMA control chart
+# Transactions are scored against the baseline *before* it learns from them.
+BASELINES_TABLE = "baselines"
+BASELINES_SCHEMA = f'''CREATE TABLE IF NOT EXISTS {BASELINES_TABLE} (
+    kind TEXT,
+    entity TEXT,
+    n INTEGER,
+    amount_mean REAL,
+    amount_var REAL,
+    retry_mean REAL,
+    retry_var REAL,
+    fail_rate REAL,
+    fail_fast REAL,
+    updated_us INTEGER,
+    PRIMARY KEY (kind, entity)
+)'''
+KINDS = ("bank", "merchant")
+
+def _z(x, mean, var):
+    return (x - mean) / math.sqrt(var) if var > 0 else 0.0
+
+class Baseline:
+    __slots__ = ("n", "amount_mean", "amount_var", "retry_mean", "retry_var", "fail_rate", "fail_fast", "dirty")
+
+    def __init__(self, n=0, amount_mean=0.0, amount_var=0.0, retry_mean=0.0, retry_var=0.0, fail_rate=0.0, fail_fast=0.0):
+        self.n = n
+        self.amount_mean = amount_mean
+        self.amount_var = amount_var
+        self.retry_mean = retry_mean
+        self.retry_var = retry_var
+        self.fail_rate = fail_rate
+        self.fail_fast = fail_fast
+        self.dirty = False
+
+    def update(self, log_amount, failed, retries, alpha, fast_alpha):
+        self.n += 1
+        a = max(1 / self.n, alpha)
+        d = log_amount - self.amount_mean
+        self.amount_mean += a * d
+        self.amount_var = (1 - a) * (self.amount_var + a * d * d)
+        d = retries - self.retry_mean
+        self.retry_mean += a * d
+        self.retry_var = (1 - a) * (self.retry_var + a * d * d)
+        self.fail_rate += a * (failed - self.fail_rate)
+        self.fail_fast += max(1 / self.n, fast_alpha) * (failed - self.fail_fast)
+        self.dirty = True
+
+    def failure_z(self, fast_alpha):
+        # Stationary variance of an EWMA of Bernoulli(p) draws: p(1-p) * a / (2 - a)
+        p = self.fail_rate
+        var = p * (1 - p) * fast_alpha / (2 - fast_alpha)
+        return _z(self.fail_fast, p, var)
+
+    def row(self):
+        return (self.n, self.amount_mean, self.amount_var, self.retry_mean, self.retry_var, self.fail_rate, self.fail_fast)
+
+class EntityBaselines:
+    def __init__(self, alpha=0.01, fast_alpha=0.1, min_samples=30):
+        self.alpha = alpha
+        self.fast_alpha = fast_alpha
+        self.min_samples = min_samples
+        # (kind, entity) -> Baseline
+        self.entities = {}
+
+    def __len__(self):
+        return len(self.entities)
+
+    def get(self, kind, entity):
+        return self.entities.get((kind, entity))
+
+    def observe(self, kind, entity, amount, failed, retries):
+        # Returns (amount z, retry z, failure-rate z) against the baseline so far,
+        # or None while the entity has fewer than min_samples transactions
+        base = self.entities.get((kind, entity))
+        if base is None:
+            base = self.entities[(kind, entity)] = Baseline()
+        log_amount = math.log1p(max(amount, 0.0))
+        scores = None
+        if base.n >= self.min_samples:
+            scores = (_z(log_amount, base.amount_mean, base.amount_var), _z(retries, base.retry_mean, base.retry_var), None)
+        base.update(log_amount, 1.0 if failed else 0.0, retries, self.alpha, self.fast_alpha)
+        if scores is not None:
+            scores = scores[:2] + (base.failure_z(self.fast_alpha),)
+        return scores
+
+    def fit(self, kind, entities, amounts, failed, retries):
+        # Seeds the baselines from labelled history in one vectorized pass per column
+        import numpy as np
+        names, inverse = np.unique(np.asarray(entities), return_inverse=True)
+        counts = np.bincount(inverse)
+        stats = {}
+        for col, values in (("amount", np.log1p(np.maximum(np.asarray(amounts, dtype=np.float64), 0.0))),
+                            ("retry", np.asarray(retries, dtype=np.float64)),
+                            ("fail", np.asarray(failed, dtype=np.float64))):
+            mean = np.bincount(inverse, values) / counts
+            stats[col] = (mean, np.maximum(np.bincount(inverse, values * values) / counts - mean * mean, 0.0))
+        for i, name in enumerate(names.tolist()):
+            if not name:
+                continue
+            base = Baseline(int(counts[i]), float(stats["amount"][0][i]), float(stats["amount"][1][i]),
+                            float(stats["retry"][0][i]), float(stats["retry"][1][i]),
+                            float(stats["fail"][0][i]), float(stats["fail"][0][i]))
+            base.dirty = True
+            self.entities[(kind, name)] = base
+
+    def fit_dataset(self, datasets):
+        for path, cols in datasets:
+            failed = cols["status"] == "Failed"
+            for kind, col in (("bank", "bank"), ("merchant", "upi_app")):
+                self.fit(kind, cols[col], cols["amount"], failed, cols["attempt_count"])
+
+    def dirty_rows(self):
+        rows = [(kind, entity) + base.row() for (kind, entity), base in self.entities.items() if base.dirty]
+        for base in self.entities.values():
+            base.dirty = False
+        return rows
+
+    def load(self, rows):
+        for kind, entity, *values in rows:
+            self.entities[(kind, entity)] = Baseline(*values)
+
+def init_baselines(conn):
+    conn.cursor().execute(BASELINES_SCHEMA)
+    conn.commit()
+
+def write_baselines(conn, baselines):
+    # Upserts the entities updated since the last write; returns how many
+    rows = baselines.dirty_rows()
+    if not rows:
+        return 0
+    ts_us = now_us()
+    with DB_WRITE_SECONDS.time(table="baselines"):
+        conn.cursor().executemany(f"INSERT OR REPLACE INTO {BASELINES_TABLE} VALUES (?,?,?,?,?,?,?,?,?,?)",
+                                  [row + (ts_us,) for row in rows])
+        conn.commit()
+    return len(rows)
+
+def read_baselines(conn):
+    c = conn.cursor()
+    c.execute(f"SELECT kind, entity, n, amount_mean, amount_var, retry_mean, retry_var, fail_rate, fail_fast FROM {BASELINES_TABLE}")
+    return c.fetchall()
+
+def clear_baselines(conn):
+    conn.cursor().execute(f"DELETE FROM {BASELINES_TABLE}")
+    conn.commit()
@@ -0,0 +1,127 @@
+import time
+from bisect import bisect_right
+from collections import deque
+
+def percentile(values, q):
+    # Interpolated between the closest ranks (numpy's default), so a short window's p99 is not just its max
+    if not values:
+        return None
+    values = sorted(values)
+    pos = (len(values) - 1) * q / 100
+    lo = int(pos)
+    hi = min(lo + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (pos - lo)
+
+class BatchScheduler:
+    # Sizes REASON/ACT micro-batches from measured cycle latency. The decision
+    # latency budget (latency_ms) is split between waiting for a batch and
+    # processing it: cycles may use cycle_share of it, and the flush interval
+    # is whatever the measured p99 cycle leaves of headroom * latency_ms, so a
+    # transaction that just missed a flush still gets its decision in time.
+    # The batch doubles (slow start) and then grows by `grow` while p99 is below
+    # headroom * the budget, and shrinks by `shrink` as soon as it is over; every
+    # decision starts a fresh measurement window so one slow cycle is not punished
+    # twice. Growth stops where the p99 projected from the marginal cost per
+    # transaction would pass headroom * the budget.
+    def __init__(self, latency_ms, min_batch=1, max_batch=5000, initial=None, window=50, min_samples=5,
+                 grow=1.25, shrink=0.5, headroom=0.8, cycle_share=0.5, min_interval_sec=0.0, max_interval_sec=2.0):
+        self.latency_sec = latency_ms / 1000
+        self.min_batch = min_batch
+        self.max_batch = max_batch
+        self.batch_size = initial or min_batch
+        self.window = deque(maxlen=window)
+        # (batch size, seconds), kept across resizes
+        self.history = deque(maxlen=window)
+        self.min_samples = min_samples
+        self.grow = grow
+        self.shrink = shrink
+        self.headroom = headroom
+        self.cycle_budget = self.latency_sec * cycle_share
+        self.min_interval_sec = min_interval_sec
+        self.max_interval_sec = max_interval_sec
+        self.interval_sec = min(max_interval_sec, max(min_interval_sec, self.latency_sec - self.cycle_budget))
+        self.slow_start = True
+        self.changes = {"grow": 0, "shrink": 0}
+
+    def resume(self, batch_size, interval_sec):
+        # A size tuned in an earlier run; its latencies are not carried over, and slow start is over
+        self.batch_size = min(self.max_batch, max(self.min_batch, batch_size))
+        self.interval_sec = interval_sec
+        self.slow_start = False
+
+    def p99(self):
+        return percentile(self.window, 99)
+
+    def _resize(self, size, change):
+        size = min(self.max_batch, max(self.min_batch, size))
+        if size != self.batch_size:
+            self.batch_size = size
+            self.changes[change] += 1
+        # Also when clamped at min/max_batch, or a slow cycle there would hold p99 for a whole window
+        self.window.clear()
+
+    def cost_per_tx(self):
+        # Least-squares slope of cycle time over batch size; the mean (which overestimates) until sizes vary
+        ns = [n for n, _ in self.history]
+        secs = [sec for _, sec in self.history]
+        mean = sum(secs) / sum(ns)
+        mean_n, mean_s = sum(ns) / len(ns), sum(secs) / len(secs)
+        var = sum((n - mean_n) ** 2 for n in ns)
+        if not var:
+            return mean
+        slope = sum((n - mean_n) * (sec - mean_s) for n, sec in self.history) / var
+        return slope if slope > 0 else mean
+
+    def record(self, n, seconds, waiting=0):
+        # waiting: transactions that had already arrived but were left for the next cycle
+        if not n:
+            return
+        self.window.append(seconds)
+        self.history.append((n, seconds))
+        p99 = self.p99()
+        target = self.cycle_budget * self.headroom
+        self.interval_sec = min(self.max_interval_sec, max(self.min_interval_sec, self.latency_sec * self.headroom - p99))
+        if p99 > self.cycle_budget:
+            self.slow_start = False
+            self._resize(int(self.batch_size * self.shrink), "shrink")
+        elif (waiting or len(self.window) >= self.min_samples) and p99 < target:
+            grow = 2 if self.slow_start or waiting else self.grow
+            size = max(self.batch_size + 1, int(self.batch_size * grow))
+            cap = self.batch_size + int((target - p99) / self.cost_per_tx())
+            if cap < size:
+                self.slow_start = False
+                size = cap
+            self._resize(size, "grow")
+
+    def stats(self):
+        p99 = self.p99()
+        return {"batch_size": self.batch_size, "interval_sec": round(self.interval_sec, 4),
+                "p99_cycle_ms": None if p99 is None else round(p99 * 1000, 2), **self.changes}
+
+def replay_at_rate(items, rate, step, scheduler=None, batch_size=50, wait_sec=0.0):
+    # Replays items as if they arrived at `rate` per second, on a virtual clock
+    # advanced by the real duration of each step(batch). A batch is flushed
+    # once it is full or its oldest item has waited wait_sec (the scheduler's
+    # size and interval when one is given); if the previous step is still
+    # running, whatever arrived meanwhile goes in the next batch.
+    # Returns per-item decision latencies (seconds) and total step time.
+    arrivals = [i / rate for i in range(len(items))]
+    latencies, busy, free, i = [], 0.0, 0.0, 0
+    while i < len(items):
+        if scheduler is not None:
+            batch_size, wait_sec = scheduler.batch_size, scheduler.interval_sec
+        full = min(i + batch_size, len(items))
+        start = max(free, min(arrivals[full - 1], arrivals[i] + wait_sec))
+        j = i + 1
+        while j < full and arrivals[j] <= start:
+            j += 1
+        t0 = time.perf_counter()
+        step(items[i:j])
+        seconds = time.perf_counter() - t0
+        if scheduler is not None:
+            scheduler.record(j - i, seconds, bisect_right(arrivals, start) - j)
+        busy += seconds
+        free = start + seconds
+        latencies.extend(free - a for a in arrivals[i:j])
+        i = j
+    return latencies, busy
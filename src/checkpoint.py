@@ -0,0 +1,59 @@
+import os
+import zlib
+import pickle
+import struct
+from src.metrics import histogram
+
+CHECKPOINT_SECONDS = histogram("sentinel_checkpoint_seconds", "Time to encode and write an agent checkpoint")
+
+# Agent checkpoints: the learned state (stats, optimizer, sketches, graphs,
+# windows, ingest offsets) pickled, zlib-compressed and framed by a header
+#   magic (8 bytes) | crc32 of the payload (u32) | payload length (u64)
+# Files are written to <path>.tmp, fsynced and renamed over <path>, so a crash
+# mid-write leaves the previous checkpoint in place. A checkpoint that fails
+# its length or CRC check is ignored, never half-restored.
+# Only load checkpoints this agent wrote: unpickling runs arbitrary code.
+MAGIC = b"SNTLCK02"
+HEADER = struct.Struct("<8sIQ")
+
+def encode(state):
+    payload = zlib.compress(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL), 1)
+    return HEADER.pack(MAGIC, zlib.crc32(payload), len(payload)) + payload
+
+def decode(blob):
+    if len(blob) < HEADER.size:
+        raise ValueError("truncated checkpoint header")
+    magic, crc, length = HEADER.unpack_from(blob)
+    payload = blob[HEADER.size:]
+    if magic != MAGIC:
+        raise ValueError("not a Sentinel checkpoint")
+    if len(payload) != length or zlib.crc32(payload) != crc:
+        raise ValueError("checkpoint payload is corrupt")
+    return pickle.loads(zlib.decompress(payload))
+
+def write_checkpoint(path, blob):
+    # Returns the bytes written; blob comes from encode()
+    with CHECKPOINT_SECONDS.time():
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(blob)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    return len(blob)
+
+def read_checkpoint(path):
+    # The saved state, or None when there is no usable checkpoint
+    try:
+        with open(path, "rb") as f:
+            return decode(f.read())
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        print(f"[CHECKPOINT] ignoring {path}: {e}")
+        return None
+
+def remove_checkpoint(path):
+    for name in (path, f"{path}.tmp"):
+        if os.path.exists(name):
+            os.remove(name)
@@ -0,0 +1,110 @@
+import math
+import hashlib
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, int(round(self.num_bits / capacity * math.log(2))))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        # Double hashing (Kirsch-Mitzenmacher) from one 128-bit digest
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, key):
+        for p in self._positions(key):
+            self.bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        bits = self.bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+    @property
+    def nbytes(self):
+        return len(self.bits)
+
+class RollingBloomFilter:
+    # Two generations of `capacity` keys each: once the current one is full it
+    # becomes the previous one and the oldest generation is dropped, so the
+    # filter always remembers between `capacity` and 2 * `capacity` recent keys.
+    def __init__(self, capacity=100_000, error_rate=0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.current = BloomFilter(capacity, error_rate)
+        self.previous = None
+
+    def add(self, key):
+        if self.current.count >= self.capacity:
+            self.previous = self.current
+            self.current = BloomFilter(self.capacity, self.error_rate)
+        self.current.add(key)
+
+    def __contains__(self, key):
+        return key in self.current or (self.previous is not None and key in self.previous)
+
+    @property
+    def nbytes(self):
+        return self.current.nbytes + (self.previous.nbytes if self.previous is not None else 0)
+
+class IngestDeduper:
+    # exists(ids) -> set of the given ids already stored; only called for probable hits
+    def __init__(self, exists, capacity=100_000, error_rate=0.001):
+        self.exists = exists
+        self.filter = RollingBloomFilter(capacity, error_rate)
+        self.stats = {
+            "seen": 0,
+            "duplicates": 0,
+            "probable_hits": 0,
+            "false_positives": 0,
+        }
+
+    def warm(self, ids):
+        for i in ids:
+            self.filter.add(i)
+
+    def filter_batch(self, txs, key=lambda t: t.id):
+        # Returns the transactions whose id has not been ingested before
+        fresh, probable = [], []
+        batch_ids = set()
+        for tx in txs:
+            k = key(tx)
+            self.stats["seen"] += 1
+            if k in batch_ids:
+                self.stats["duplicates"] += 1
+                continue
+            batch_ids.add(k)
+            if k in self.filter:
+                probable.append(tx)
+            else:
+                fresh.append(tx)
+
+        if probable:
+            self.stats["probable_hits"] += len(probable)
+            # One exact lookup for the whole batch of probable hits
+            stored = self.exists([key(t) for t in probable])
+            for tx in probable:
+                if key(tx) in stored:
+                    self.stats["duplicates"] += 1
+                else:
+                    self.stats["false_positives"] += 1
+                    fresh.append(tx)
+
+        for tx in fresh:
+            self.filter.add(key(tx))
+        return fresh
+
+    def false_positive_rate(self):
+        # Share of genuinely new ids that still paid for an exact lookup
+        new = self.stats["seen"] - self.stats["duplicates"]
+        return self.stats["false_positives"] / new if new else 0.0
+
+    @property
+    def nbytes(self):
+        return self.filter.nbytes
@@ -0,0 +1,69 @@
+from src.partitions import list_partitions
+from src.storage import TX_COLUMNS
+
+# Transaction explorer queries. Filters are pushed into SQL against each
+# partition table directly, newest partition first, instead of through the
+# UNION ALL view. Pages are keyed on the last row shown: the next page is the
+# rows strictly after its (ts_us, id) in (ts_us DESC, id DESC) order, so a
+# deep page costs the same index range read as the first one.
+LIST_FILTERS = ("status", "bank", "merchant")
+
+def filter_clauses(filters):
+    # filters: status/bank/merchant value lists (None = any, [] = none),
+    # risk_min/risk_max inclusive, start_us/end_us half-open
+    clauses, params = [], []
+    for col in LIST_FILTERS:
+        values = filters.get(col)
+        if values is None:
+            continue
+        if not values:
+            return ["0"], []
+        clauses.append(f"{col} IN ({','.join('?' * len(values))})")
+        params.extend(values)
+    for key, clause in (("risk_min", "risk_score >= ?"), ("risk_max", "risk_score <= ?"),
+                        ("start_us", "ts_us >= ?"), ("end_us", "ts_us < ?")):
+        if filters.get(key) is not None:
+            clauses.append(clause)
+            params.append(filters[key])
+    return clauses, params
+
+def page_transactions(conn, filters=None, after=None, limit=100):
+    # One page of TX_COLUMNS rows, newest first, plus the cursor for the next
+    # page (None once there is nothing older). after is a previous cursor.
+    filters = filters or {}
+    clauses, params = filter_clauses(filters)
+    if after is not None:
+        clauses.append("ts_us <= ? AND (ts_us < ? OR id < ?)")
+        params.extend((after[0], after[0], after[1]))
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+    start_us, end_us = filters.get("start_us"), filters.get("end_us")
+    c = conn.cursor()
+    rows = []
+    for name, part_start, part_end in reversed(list_partitions(conn)):
+        if start_us is not None and part_end <= start_us:
+            break
+        if (end_us is not None and part_start >= end_us) or (after is not None and part_start > after[0]):
+            continue
+        c.execute(f"SELECT {', '.join(TX_COLUMNS)} FROM {name}{where} ORDER BY ts_us DESC, id DESC LIMIT ?",
+                  params + [limit - len(rows)])
+        rows.extend(c.fetchall())
+        if len(rows) >= limit:
+            break
+    cursor = (rows[-1][-1], rows[-1][0]) if len(rows) >= limit else None
+    return rows, cursor
+
+def distinct_values(conn, column):
+    # Sorted distinct values of an indexed column, found by hopping the index
+    # one value at a time rather than scanning every row
+    if column not in LIST_FILTERS:
+        raise ValueError(f"no index on {column}")
+    values = set()
+    c = conn.cursor()
+    for name, _, _ in list_partitions(conn):
+        c.execute(f"""WITH RECURSIVE v(x) AS (
+                          SELECT MIN({column}) FROM {name}
+                          UNION ALL
+                          SELECT (SELECT MIN({column}) FROM {name} WHERE {column} > x) FROM v WHERE x IS NOT NULL)
+                      SELECT x FROM v WHERE x IS NOT NULL""")
+        values.update(r[0] for r in c.fetchall())
+    return sorted(values)
@@ -0,0 +1,166 @@
+import math
+import time
+import hashlib
+from collections import OrderedDict
+import numpy as np
+
+_INV_POW2 = np.ldexp(1.0, -np.arange(66))
+
+def _hash64(value):
+    return int.from_bytes(hashlib.blake2b(str(value).encode("utf-8"), digest_size=8).digest(), "little")
+
+def _estimate(registers):
+    # Standard HyperLogLog estimate with the linear-counting small-range correction
+    m = len(registers)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / float(_INV_POW2[registers].sum())
+    zeros = m - int(np.count_nonzero(registers))
+    if raw <= 2.5 * m and zeros:
+        return m * math.log(m / zeros)
+    return raw
+
+class HyperLogLog:
+    # 2**p one-byte registers; relative standard error is 1.04 / sqrt(2**p)
+    def __init__(self, p=10):
+        self.p = p
+        self.registers = np.zeros(1 << p, dtype=np.uint8)
+
+    @staticmethod
+    def position(value, p):
+        h = _hash64(value)
+        index = h >> (64 - p)
+        rest = h & ((1 << (64 - p)) - 1)
+        return index, (64 - p) - rest.bit_length() + 1
+
+    def add(self, value):
+        index, rank = self.position(value, self.p)
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self):
+        return _estimate(self.registers)
+
+    @property
+    def relative_error(self):
+        return 1.04 / math.sqrt(len(self.registers))
+
+class WindowedDistinctCounter:
+    # Approximate distinct values per key over a sliding window. Each key owns a
+    # fixed ring of `buckets` HyperLogLog register sets covering window_sec / buckets
+    # each, so memory per key is buckets * 2**p bytes whatever the cardinality.
+    # Keys idle for a whole window, or the least recently updated ones beyond
+    # max_keys, are dropped.
+    def __init__(self, window_sec, buckets=4, p=8, max_keys=10_000, clock=time.monotonic):
+        self.window_sec = window_sec
+        self.buckets = buckets
+        self.bucket_sec = window_sec / buckets
+        self.p = p
+        self.max_keys = max_keys
+        self.clock = clock
+        self.keys = OrderedDict()
+        # Newest epoch added so far: keys expire against it, so replayed history ages by event time
+        self.latest = None
+
+    def _evict(self, epoch):
+        while self.keys:
+            key, entry = next(iter(self.keys.items()))
+            if len(self.keys) <= self.max_keys and entry[2] > epoch - self.buckets:
+                break
+            del self.keys[key]
+
+    def add(self, key, value, now=None):
+        epoch = int((self.clock() if now is None else now) // self.bucket_sec)
+        entry = self.keys.get(key)
+        if entry is None:
+            # [registers, epoch of each slot, last epoch written]
+            entry = self.keys[key] = [np.zeros((self.buckets, 1 << self.p), dtype=np.uint8),
+                                      np.full(self.buckets, -self.buckets, dtype=np.int64), epoch]
+        else:
+            self.keys.move_to_end(key)
+            entry[2] = max(entry[2], epoch)
+        registers, epochs, _ = entry
+        slot = epoch % self.buckets
+        self.latest = epoch if self.latest is None else max(self.latest, epoch)
+        # Event time can arrive out of order: a value older than the slot's bucket is
+        # already outside the window the slot now covers
+        if epochs[slot] > epoch:
+            self._evict(self.latest)
+            return
+        if epochs[slot] != epoch:
+            registers[slot] = 0
+            epochs[slot] = epoch
+        index, rank = HyperLogLog.position(value, self.p)
+        if rank > registers[slot, index]:
+            registers[slot, index] = rank
+        self._evict(self.latest)
+
+    def count(self, key, now=None):
+        entry = self.keys.get(key)
+        if entry is None:
+            return 0
+        epoch = int((self.clock() if now is None else now) // self.bucket_sec)
+        registers, epochs, _ = entry
+        live = (epochs > epoch - self.buckets) & (epochs <= epoch)
+        if live.all():
+            return int(round(_estimate(registers.max(axis=0))))
+        if not live.any():
+            return 0
+        return int(round(_estimate(registers[live].max(axis=0))))
+
+    def shrink(self, max_keys):
+        # Memory pressure: drops least recently updated keys down to max_keys
+        while len(self.keys) > max_keys:
+            self.keys.popitem(last=False)
+
+    @property
+    def relative_error(self):
+        return 1.04 / math.sqrt(1 << self.p)
+
+    @property
+    def bytes_per_key(self):
+        return self.buckets * ((1 << self.p) + 8)
+
+    def __len__(self):
+        return len(self.keys)
+
+def subnet_24(ip_address):
+    return ip_address.rsplit(".", 1)[0] + ".0/24" if ip_address and "." in ip_address else None
+
+class DistinctFeatures:
+    # The shared-infrastructure features the rule engine reads: distinct devices
+    # behind an IP /24, and distinct banks / UPI apps used by one device
+    def __init__(self, window_sec=600, buckets=4, p=8, max_keys=10_000, clock=time.monotonic):
+        make = lambda: WindowedDistinctCounter(window_sec, buckets, p, max_keys, clock)
+        self.subnet_devices = make()
+        self.device_banks = make()
+        self.device_apps = make()
+
+    @property
+    def counters(self):
+        return (self.subnet_devices, self.device_banks, self.device_apps)
+
+    @property
+    def nbytes(self):
+        return sum(len(c) * c.bytes_per_key for c in self.counters)
+
+    def shrink(self, fraction):
+        for counter in self.counters:
+            counter.shrink(int(len(counter) * fraction))
+
+    def observe(self, device_fingerprint, ip_address, bank, upi_app, now=None):
+        subnet = subnet_24(ip_address)
+        features = {"subnet": subnet, "subnet_devices": 0, "device_banks": 0, "device_apps": 0}
+        if subnet and device_fingerprint:
+            self.subnet_devices.add(subnet, device_fingerprint, now)
+            features["subnet_devices"] = self.subnet_devices.count(subnet, now)
+        if device_fingerprint:
+            if bank:
+                self.device_banks.add(device_fingerprint, bank, now)
+                features["device_banks"] = self.device_banks.count(device_fingerprint, now)
+            if upi_app:
+                self.device_apps.add(device_fingerprint, upi_app, now)
+                features["device_apps"] = self.device_apps.count(device_fingerprint, now)
+        return features
@@ -0,0 +1,111 @@
+import json
+import zlib
+from src.timestamps import now_us, format_us, ensure_epoch_column
+from src.metrics import DB_WRITE_SECONDS
+
+# Log details are stored as compact JSON in a BLOB, zlib-compressed once they
+# reach ZLIB_MIN_BYTES; the first byte says which. Rows written before this
+# kept a free-text `details` string, which is still returned as-is.
+# logs_fts is a contentless FTS5 index (rowid = logs.id) over the message and
+# the reason strings of each entry, so searches never scan the logs table.
+LOGS_TABLE = "logs"
+FTS_TABLE = "logs_fts"
+ZLIB_MIN_BYTES = 512
+RAW, ZLIB = b"j", b"z"
+
+LOGS_SCHEMA = f'''CREATE TABLE IF NOT EXISTS {LOGS_TABLE} (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT,
+    phase TEXT,
+    message TEXT,
+    details BLOB,
+    ts_us INTEGER
+)'''
+
+def encode_details(details):
+    if details is None:
+        return None
+    data = json.dumps(details, separators=(",", ":"), default=str).encode("utf-8")
+    if len(data) >= ZLIB_MIN_BYTES:
+        return ZLIB + zlib.compress(data)
+    return RAW + data
+
+def decode_details(blob):
+    if blob is None or isinstance(blob, str):
+        return blob or None
+    blob = bytes(blob)
+    data = zlib.decompress(blob[1:]) if blob[:1] == ZLIB else blob[1:]
+    return json.loads(data)
+
+def fts_query(text):
+    # Every word must match (as a prefix); quoting keeps FTS5 syntax out of user input
+    words = text.split()
+    return " ".join('"' + w.replace('"', '""') + '"*' for w in words)
+
+def init_logs(conn):
+    c = conn.cursor()
+    c.execute(LOGS_SCHEMA)
+    c.execute(f"PRAGMA table_info({LOGS_TABLE})")
+    if "details" not in {row[1] for row in c.fetchall()}:
+        c.execute(f"ALTER TABLE {LOGS_TABLE} ADD COLUMN details BLOB")
+    conn.commit()
+    ensure_epoch_column(conn, LOGS_TABLE)
+    c.execute("SELECT 1 FROM sqlite_master WHERE name=?", (FTS_TABLE,))
+    if not c.fetchone():
+        c.execute(f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(message, reasons, content='')")
+        # Index what is already there; legacy text details stand in for reasons
+        c.execute(f"INSERT INTO {FTS_TABLE} (rowid, message, reasons) SELECT id, message, "
+                  f"CASE WHEN typeof(details) = 'text' THEN details ELSE '' END FROM {LOGS_TABLE}")
+    conn.commit()
+
+def write_log(conn, phase, message, details=None, reasons=()):
+    # details: any JSON-serializable record; reasons: strings to make searchable
+    ts_us = now_us()
+    c = conn.cursor()
+    with DB_WRITE_SECONDS.time(table="logs"):
+        c.execute(f"INSERT INTO {LOGS_TABLE} (timestamp, phase, message, details, ts_us) VALUES (?,?,?,?,?)",
+                  (format_us(ts_us, '%H:%M:%S'), phase, message, encode_details(details), ts_us))
+        c.execute(f"INSERT INTO {FTS_TABLE} (rowid, message, reasons) VALUES (?,?,?)",
+                  (c.lastrowid, message, "\n".join(r for r in reasons if r)))
+        conn.commit()
+
+def _decoded(rows):
+    return [row[:-1] + (decode_details(row[-1]),) for row in rows]
+
+def recent_logs(conn, limit=50, phases=None):
+    # (timestamp, phase, message, ts_us, details) rows, newest first
+    sql = f"SELECT timestamp, phase, message, ts_us, details FROM {LOGS_TABLE}"
+    params = []
+    if phases:
+        sql += f" WHERE phase IN ({','.join('?' * len(phases))})"
+        params.extend(phases)
+    c = conn.cursor()
+    c.execute(sql + " ORDER BY id DESC LIMIT ?", params + [limit])
+    return _decoded(c.fetchall())
+
+def search_logs(conn, text, limit=50, phases=None, start_us=None, end_us=None):
+    # Full-text match over message and reasons, newest first, same row shape as recent_logs
+    query = fts_query(text)
+    if not query:
+        return recent_logs(conn, limit, phases)
+    sql = (f"SELECT l.timestamp, l.phase, l.message, l.ts_us, l.details FROM {FTS_TABLE} "
+           f"JOIN {LOGS_TABLE} l ON l.id = {FTS_TABLE}.rowid WHERE {FTS_TABLE} MATCH ?")
+    params = [query]
+    if phases:
+        sql += f" AND l.phase IN ({','.join('?' * len(phases))})"
+        params.extend(phases)
+    if start_us is not None:
+        sql += " AND l.ts_us >= ?"
+        params.append(start_us)
+    if end_us is not None:
+        sql += " AND l.ts_us < ?"
+        params.append(end_us)
+    c = conn.cursor()
+    c.execute(sql + " ORDER BY l.id DESC LIMIT ?", params + [limit])
+    return _decoded(c.fetchall())
+
+def clear_logs(conn):
+    c = conn.cursor()
+    c.execute(f"DELETE FROM {LOGS_TABLE}")
+    c.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('delete-all')")
+    conn.commit()
@@ -0,0 +1,135 @@
+import os
+import sys
+import math
+import itertools
+import tracemalloc
+from collections import deque
+import numpy as np
+
+# Memory accounting for the long-lived in-process structures. Each tracked
+# structure has a size function (bytes), a byte budget and a shrink callback
+# called as shrink(target_bytes, current_bytes); check() measures everything, shrinks
+# whatever is over budget to low_water of it, and, if the whole process is
+# over its RSS budget, shrinks every structure by the same factor.
+# SENTINEL_TRACEMALLOC=1 additionally traces Python allocations for metrics().
+TRACEMALLOC_ENV = "SENTINEL_TRACEMALLOC"
+MB = 1024 * 1024
+_ATOMS = (str, bytes, int, float, bool, type(None))
+
+def deep_size(obj, sample=32, depth=6):
+    # Estimated deep size in bytes. Containers are measured from up to `sample`
+    # elements and scaled to their length, so cost does not grow with size;
+    # shared objects (interned strings, small ints) are counted every time.
+    size = sys.getsizeof(obj)
+    if isinstance(obj, _ATOMS) or depth == 0:
+        return size
+    if isinstance(obj, np.ndarray):
+        return size if obj.base is None else size + obj.nbytes
+    if isinstance(obj, dict):
+        n, items = len(obj), itertools.islice(obj.items(), sample)
+        measured = [deep_size(k, sample, depth - 1) + deep_size(v, sample, depth - 1) for k, v in items]
+    elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+        n, items = len(obj), itertools.islice(obj, sample)
+        measured = [deep_size(v, sample, depth - 1) for v in items]
+    elif hasattr(obj, "__dict__"):
+        return size + deep_size(vars(obj), sample, depth - 1)
+    else:
+        return size
+    return size + (int(sum(measured) / len(measured) * n) if measured else 0)
+
+def rss_bytes():
+    # Current resident set size; falls back to the peak where /proc is missing
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+def items_to_drop(seq, size, target_bytes):
+    # How many elements of seq to remove to bring `size` bytes down to target_bytes
+    if not seq or size <= target_bytes:
+        return 0
+    return min(len(seq), math.ceil(len(seq) * (1 - target_bytes / size)))
+
+def target_count(count, size, target_bytes):
+    # Element count that should fit in target_bytes, at the current bytes per element
+    return int(count * target_bytes / size) if size else count
+
+def trim_oldest(seq, size, target_bytes, newest_first=False):
+    # Drops the oldest elements of a list/deque in place; returns how many
+    k = items_to_drop(seq, size, target_bytes)
+    if k:
+        if newest_first:
+            del seq[len(seq) - k:]
+        elif isinstance(seq, deque):
+            for _ in range(k):
+                seq.popleft()
+        else:
+            del seq[:k]
+    return k
+
+def downsample_oldest(seq, size, target_bytes):
+    # Thins out the oldest part of a list instead of cutting it off: to lose k
+    # elements, the oldest 2k keep an evenly spaced k (every other one)
+    k = items_to_drop(seq, size, target_bytes)
+    if not k:
+        return 0
+    span = min(len(seq), 2 * k)
+    keep = span - k
+    seq[:span] = [seq[int(i * span / keep)] for i in range(keep)] if keep else []
+    return k
+
+def track_agent_state(budget, store, rings, distinct, budgets_mb):
+    # The agents' long-lived state: hot transaction tier, fraud-ring graph and
+    # distinct-count sketches, each shrunk in proportion to its overshoot
+    budget.track("hot_store", lambda: deep_size(store.hot.cols),
+                 lambda target, size: store.shrink(target_count(len(store), size, target)), budgets_mb["hot_store"])
+    budget.track("fraud_rings", lambda: sum(deep_size(d) for d in (rings.parent, rings.members, rings.totals, rings.active)),
+                 lambda target, size: rings.shrink(target_count(len(rings), size, target)), budgets_mb["fraud_rings"])
+    budget.track("distinct_features", lambda: distinct.nbytes,
+                 lambda target, size: distinct.shrink(target / size if size else 1.0), budgets_mb["distinct_features"])
+
+class MemoryBudget:
+    def __init__(self, process_budget_mb=None, low_water=0.8):
+        self.process_budget = int(process_budget_mb * MB) if process_budget_mb else None
+        self.low_water = low_water
+        self.tracked = {}
+        self.last = {}
+        self.checks = 0
+        if os.environ.get(TRACEMALLOC_ENV) and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def track(self, name, size_fn, shrink_fn, budget_mb):
+        self.tracked[name] = {"size": size_fn, "shrink": shrink_fn, "budget": int(budget_mb * MB), "evictions": 0}
+
+    def _shrink(self, name, entry, size, target):
+        entry["shrink"](int(target), size)
+        entry["evictions"] += 1
+        after = entry["size"]()
+        self.last[name] = after
+        return (name, size, after)
+
+    def check(self):
+        # Returns (name, bytes before, bytes after) for every structure it shrank
+        self.checks += 1
+        shrunk = []
+        for name, entry in self.tracked.items():
+            size = self.last[name] = entry["size"]()
+            if size > entry["budget"]:
+                shrunk.append(self._shrink(name, entry, size, entry["budget"] * self.low_water))
+        if self.process_budget is not None and rss_bytes() > self.process_budget:
+            done = {name for name, _, _ in shrunk}
+            for name, entry in self.tracked.items():
+                if name not in done and self.last[name]:
+                    shrunk.append(self._shrink(name, entry, self.last[name], self.last[name] * self.low_water))
+        return shrunk
+
+    def metrics(self):
+        # Bytes, budget and eviction count per structure as of the last check
+        out = {name: {"bytes": self.last.get(name, 0), "budget_bytes": entry["budget"], "evictions": entry["evictions"]}
+               for name, entry in self.tracked.items()}
+        out["process"] = {"bytes": rss_bytes(), "budget_bytes": self.process_budget or 0,
+                          "evictions": 0, "traced_bytes": tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None}
+        return out
@@ -0,0 +1,258 @@
+import os
+import math
+import time
+import threading
+from bisect import bisect_left
+
+# In-process metrics registry rendered in the Prometheus text exposition
+# format (0.0.4). Updates are a dict lookup plus an add under one lock per
+# metric; collection only happens when something scrapes /metrics.
+# Metrics are get-or-create by name, so every module can declare the ones it
+# touches at import time and a second agent in the same process reuses them.
+METRICS_PORT_ENV = "SENTINEL_METRICS_PORT"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} takes labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[k]) for k in self.label_names)
+
+    def samples(self):
+        with self.lock:
+            return [(self.name, key, (), value) for key, value in self.values.items()]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for name, key, extra, value in self.samples():
+            lines.append(f"{name}{_labels(self.label_names, key, extra)} {_format_value(value)}")
+        return lines
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self.values.get(self._key(labels), 0)
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, help, labels=()):
+        super().__init__(name, help, labels)
+        self.function = None
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def set_function(self, function):
+        # Evaluated at scrape time: returns a number, or {label tuple: number}
+        # for labelled gauges. Replaces any earlier function.
+        self.function = function
+
+    def samples(self):
+        if self.function is None:
+            return super().samples()
+        try:
+            value = self.function()
+        except Exception:
+            return []
+        if isinstance(value, dict):
+            return [(self.name, key if isinstance(key, tuple) else (key,), (), v) for key, v in value.items()]
+        return [(self.name, (), (), value)]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.bounds = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        i = bisect_left(self.bounds, value)
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [[0] * len(self.bounds), 0.0, 0]
+            entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def samples(self):
+        out = []
+        with self.lock:
+            items = [(key, list(counts), total, count) for key, (counts, total, count) in self.values.items()]
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, n in zip(self.bounds, counts):
+                cumulative += n
+                out.append((self.name + "_bucket", key, (("le", _format_value(bound)),), cumulative))
+            out.append((self.name + "_sum", key, (), total))
+            out.append((self.name + "_count", key, (), count))
+        return out
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _get(self, cls, name, help, labels, **kwargs):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, help, labels, **kwargs)
+            elif type(metric) is not cls:
+                raise ValueError(f"{name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name, help, labels=()):
+        return self._get(Counter, name, help, labels)
+
+    def gauge(self, name, help, labels=()):
+        return self._get(Gauge, name, help, labels)
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._get(Histogram, name, help, labels, buckets=buckets)
+
+    def render(self):
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+
+# Shared by every module that writes to SQLite
+DB_WRITE_SECONDS = histogram("sentinel_db_write_seconds", "SQLite write latency by table", ("table",))
+
+_servers = {}
+
+def start_http_server(port, addr="127.0.0.1", registry=REGISTRY):
+    # Serves GET /metrics from a daemon thread; one server per (addr, port)
+    # per process, so calling it again (e.g. on a Streamlit rerun) is a no-op
+    if (addr, port) in _servers:
+        return _servers[(addr, port)]
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((addr, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="sentinel-metrics", daemon=True).start()
+    _servers[(addr, port)] = server
+    return server
+
+def serve_metrics(port):
+    # SENTINEL_METRICS_PORT overrides the configured port; 0 disables the endpoint.
+    # A port already taken by another process only costs the endpoint, not the agent.
+    port = int(os.environ.get(METRICS_PORT_ENV, port or 0))
+    if not port:
+        return None
+    try:
+        return start_http_server(port)
+    except OSError as e:
+        print(f"[METRICS] could not serve on 127.0.0.1:{port}: {e}")
+        return None
+
+# --- Sentinel agent metrics ---
+CYCLE_SECONDS = histogram("sentinel_cycle_seconds", "Duration of one OBSERVE/REASON/ACT/LEARN cycle", ("loop",))
+TRANSACTIONS = counter("sentinel_transactions_total", "Transactions run through the decision loop", ("loop",))
+DECISIONS = counter("sentinel_decisions_total", "Blocked and investigated transactions", ("loop", "decision"))
+INGESTED = counter("sentinel_ingested_total", "Transactions accepted at ingest", ("source",))
+DUPLICATES = counter("sentinel_ingest_duplicates_total", "Transactions dropped at ingest as duplicates", ("source",))
+FRAUD_THRESHOLD = gauge("sentinel_fraud_threshold", "Current fraud probability threshold")
+QUEUE_DEPTH = gauge("sentinel_queue_depth", "Items waiting in an in-process queue", ("queue",))
+MEMORY_BYTES = gauge("sentinel_memory_bytes", "Estimated bytes held by a budgeted structure", ("structure",))
+
+def record_cycle(loop, before, stats, seconds):
+    # before/stats: the agent's processed/blocked/investigated counts around the cycle
+    CYCLE_SECONDS.observe(seconds, loop=loop)
+    TRANSACTIONS.inc(stats["processed"] - before["processed"], loop=loop)
+    for decision in ("blocked", "investigated"):
+        if stats[decision] != before[decision]:
+            DECISIONS.inc(stats[decision] - before[decision], loop=loop, decision=decision)
+
+def record_ingest(source, received, accepted):
+    INGESTED.inc(accepted, source=source)
+    if received != accepted:
+        DUPLICATES.inc(received - accepted, source=source)
+
+def watch_agent(agent, store):
+    # Scrape-time gauges over the live agent; a newer agent replaces an older one
+    FRAUD_THRESHOLD.set_function(lambda: agent.fraud_threshold)
+    QUEUE_DEPTH.set_function(lambda: {"actions": agent.executor.pending, "slow_path": agent.slow_path.pending,
+                                          "cold_writer": store.queue.unfinished_tasks})
+    MEMORY_BYTES.set_function(lambda: dict(agent.memory.last))
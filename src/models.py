@@ -1,35 +1,48 @@
 import sqlite3
 import json
-from datetime import datetime
+import atexit
+from src.timestamps import to_epoch_us, now_us, format_us
+from src.logstore import init_logs, write_log, recent_logs, search_logs, clear_logs
+from src.alerts import init_alerts, write_alerts, recent_alerts, clear_alerts
+from src.actions import init_actions, write_actions, write_action_results, read_actions_since, clear_actions
+from src.baselines import init_baselines, write_baselines, read_baselines, clear_baselines
+from src.checkpoint import remove_checkpoint
+from src.partitions import init_partitions, drop_all_partitions, drop_partitions_before
+from src.storage import TX_COLUMNS, SQLiteStore, TieredStore
 
 DB_PATH = "sentinel.db"
+ARCHIVE_DIR = "sentinel_archive"
+# Agent state snapshot (see src/checkpoint.py); it describes this database, so RESET removes it too
+CHECKPOINT_PATH = "sentinel_state.ckpt"
+PARTITION_SEC = 24 * 3600
+# Transactions newer than this are served from memory; SQLite is written behind
+HOT_WINDOW_SEC = 15 * 60
+# What the 3D topology plots and shows on hover
+TOPOLOGY_COLUMNS = ("id", "merchant", "amount", "bank", "status", "risk_score", "fraud_probability")
+
+_store = None
+
+def get_store():
+    # Created on first use so DB_PATH can still be pointed elsewhere before that
+    global _store
+    if _store is None:
+        _store = TieredStore(SQLiteStore(DB_PATH, PARTITION_SEC), HOT_WINDOW_SEC)
+        atexit.register(_store.close)
+    return _store
+
+def use_database(db_path, archive_dir=ARCHIVE_DIR):
+    # Points every helper below (and a fresh store) at another database and archive,
+    # e.g. a benchmark's temporary one; the current store is flushed and closed first
+    global DB_PATH, ARCHIVE_DIR, _store
+    if _store is not None:
+        _store.close()
+        _store = None
+    DB_PATH, ARCHIVE_DIR = db_path, archive_dir
 
 def init_db():
     conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
     
-    # Transactions Table
-    c.execute('''CREATE TABLE IF NOT EXISTS transactions (
-        id TEXT PRIMARY KEY,
-        timestamp TEXT,
-        merchant TEXT,
-        amount REAL,
-        bank TEXT,
-        status TEXT,
-        risk_score INTEGER,
-        fraud_probability REAL,
-        error_code TEXT,
-        retry_count INTEGER
-    )''')
-    
-    # System Logs Table
-    c.execute('''CREATE TABLE IF NOT EXISTS logs (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        timestamp TEXT,
-        phase TEXT,
-        message TEXT
-    )''')
-    
     # Config/State Table
     c.execute('''CREATE TABLE IF NOT EXISTS config (
         key TEXT PRIMARY KEY,
@@ -38,8 +51,20 @@ def init_db():
     
     # Initialize default config if not exists
     c.execute("INSERT OR IGNORE INTO config (key, value) VALUES ('fraud_threshold', '0.8')")
-    
     conn.commit()
+
+    # System logs: compact JSON details plus a full-text index over messages and reasons
+    init_logs(conn)
+
+    # Coalesced alerts: one row per (action, key) per window instead of one log per hit
+    init_alerts(conn)
+    # Structured record of every action and its dispatch outcome
+    init_actions(conn)
+    # Per-bank/merchant running baselines, saved every few steps
+    init_baselines(conn)
+
+    # Transactions: one table per PARTITION_SEC bucket behind the `transactions` view
+    init_partitions(conn, PARTITION_SEC)
     conn.close()
 
 class Transaction:
@@ -54,48 +79,131 @@ class Transaction:
         self.fraud_probability = float(data.get("fraud_probability", 0))
         self.error_code = data.get("error_code")
         self.retry_count = int(float(data.get("retry_count", 0)))
+        self.is_suspicious = data.get("is_suspicious")
+        self.device_fingerprint = data.get("device_fingerprint")
+        self.ip_address = data.get("ip_address")
+        # Normalized once here; every query orders and filters on this integer
+        self.ts_us = data.get("ts_us") or to_epoch_us(self.timestamp) or 0
+
+    def row(self):
+        return (self.id, self.timestamp, self.merchant, self.amount, self.bank, self.status,
+                self.risk_score, self.fraud_probability, self.error_code, self.retry_count, self.ts_us)
 
     def save(self):
-        conn = sqlite3.connect(DB_PATH)
-        c = conn.cursor()
-        c.execute('''INSERT OR REPLACE INTO transactions VALUES (?,?,?,?,?,?,?,?,?,?)''',
-                  (self.id, self.timestamp, self.merchant, self.amount, self.bank, 
-                   self.status, self.risk_score, self.fraud_probability, self.error_code, self.retry_count))
-        conn.commit()
-        conn.close()
+        get_store().append([self.row()])
+
+def save_transactions(txs):
+    get_store().append([t.row() for t in txs])
+
+def _transactions(rows):
+    return [Transaction(dict(zip(TX_COLUMNS, r))) for r in rows]
+
+def existing_transaction_ids(ids):
+    return get_store().exists(ids)
+
+def recent_transaction_ids(limit):
+    return get_store().recent_ids(limit)
 
 def get_recent_transactions(limit=100):
+    return _transactions(get_store().recent(limit))
+
+def get_transactions_between(start_us, end_us, limit=None):
+    # Half-open [start_us, end_us), newest first; hot rows from memory, older from SQLite
+    return _transactions(get_store().between(start_us, end_us, limit))
+
+def flush_transactions():
+    # Blocks until every saved transaction is durable in SQLite
+    get_store().flush()
+
+def get_transactions_since(seconds, limit=None):
+    end = now_us()
+    return get_transactions_between(end - int(seconds * 1_000_000), end + 1, limit)
+
+def get_topology(limit=200):
+    # The newest `limit` transactions as TOPOLOGY_COLUMNS arrays: stored rows, then archived
+    # ones once retention has sealed the older history
+    import numpy as np
+    from src.archive import SEGMENT_COLUMNS, ArchiveReader, column_array
+    rows = get_store().recent(limit)
+    archived = ArchiveReader(ARCHIVE_DIR).newest(limit - len(rows), TOPOLOGY_COLUMNS)
+    return {col: np.concatenate([column_array([r[TX_COLUMNS.index(col)] for r in rows], SEGMENT_COLUMNS[col]), archived[col]])
+            for col in TOPOLOGY_COLUMNS}
+
+def fraud_probability_history():
+    # Every stored and archived transaction's fraud probability (one column of each)
+    import numpy as np
+    from src.archive import ArchiveReader
+    init_db()
     conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT * FROM transactions ORDER BY timestamp DESC LIMIT ?", (limit,))
-    rows = c.fetchall()
+    stored = np.array([r[0] or 0.0 for r in conn.execute("SELECT fraud_probability FROM transactions")], dtype=float)
     conn.close()
-    
-    txs = []
-    for r in rows:
-        txs.append(Transaction({
-            "id": r[0], "timestamp": r[1], "merchant": r[2], "amount": r[3],
-            "bank": r[4], "status": r[5], "risk_score": r[6], "fraud_probability": r[7],
-            "error_code": r[8], "retry_count": r[9]
-        }))
-    return txs
+    return np.concatenate([stored, ArchiveReader(ARCHIVE_DIR).scan(["fraud_probability"])["fraud_probability"]])
+
+def transactions_dataframe(txs):
+    # pandas is only imported once a DataFrame is actually requested
+    import pandas as pd
+    return pd.DataFrame([vars(t) for t in txs])
 
-def log_event(phase, message):
+def log_event(phase, message, details=None, reasons=()):
     conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    timestamp = datetime.now().strftime('%H:%M:%S')
-    c.execute("INSERT INTO logs (timestamp, phase, message) VALUES (?,?,?)", (timestamp, phase, message))
-    conn.commit()
+    write_log(conn, phase, message, details, reasons)
     conn.close()
 
 def get_logs(limit=50):
     conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT timestamp, phase, message FROM logs ORDER BY id DESC LIMIT ?", (limit,))
-    rows = c.fetchall()
+    rows = recent_logs(conn, limit)
     conn.close()
     return [f"[{r[0]}] [{r[1]}] {r[2]}" for r in rows]
 
+def find_logs(text, limit=50, phases=None):
+    # Full-text search over every log message and reason, newest first
+    conn = sqlite3.connect(DB_PATH)
+    rows = search_logs(conn, text, limit, phases)
+    conn.close()
+    return [f"[{format_us(r[3])}] [{r[1]}] {r[2]}" for r in rows]
+
+def save_alerts(coalescer):
+    conn = sqlite3.connect(DB_PATH)
+    written = write_alerts(conn, coalescer)
+    conn.close()
+    return written
+
+def save_actions(actions):
+    conn = sqlite3.connect(DB_PATH)
+    write_actions(conn, actions)
+    conn.close()
+
+def save_action_results(actions):
+    if not actions:
+        return
+    conn = sqlite3.connect(DB_PATH)
+    write_action_results(conn, actions)
+    conn.close()
+
+def save_baselines(baselines):
+    conn = sqlite3.connect(DB_PATH)
+    written = write_baselines(conn, baselines)
+    conn.close()
+    return written
+
+def get_actions_since(since_us):
+    conn = sqlite3.connect(DB_PATH)
+    rows = read_actions_since(conn, since_us)
+    conn.close()
+    return rows
+
+def load_baselines():
+    conn = sqlite3.connect(DB_PATH)
+    rows = read_baselines(conn)
+    conn.close()
+    return rows
+
+def get_alerts(limit=50):
+    conn = sqlite3.connect(DB_PATH)
+    rows = recent_alerts(conn, limit)
+    conn.close()
+    return rows
+
 def get_config(key, default=None):
     conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
@@ -111,12 +219,34 @@ def set_config(key, value):
     conn.commit()
     conn.close()
 
+def archive_old_transactions(max_age_sec, archive=True):
+    # Retention: partitions that ended more than max_age_sec ago are sealed into
+    # the columnar archive (unless archive=False) and dropped as whole tables.
+    # The archive, and numpy with it, is only imported once retention runs
+    from src.archive import seal_from_db
+    flush_transactions()
+    conn = sqlite3.connect(DB_PATH)
+    cutoff_us = now_us() - int(max_age_sec * 1_000_000)
+    if archive:
+        dropped = seal_from_db(conn, cutoff_us, ARCHIVE_DIR)
+    else:
+        dropped = drop_partitions_before(conn, cutoff_us)
+    conn.close()
+    return dropped
+
 def clear_all_data():
+    from src.archive import clear_archive
+    get_store().clear_hot()
     conn = sqlite3.connect(DB_PATH)
     c = conn.cursor()
-    c.execute("DELETE FROM transactions")
-    c.execute("DELETE FROM logs")
+    clear_logs(conn)
     # Reset config
     c.execute("UPDATE config SET value='0.8' WHERE key='fraud_threshold'")
     conn.commit()
+    clear_alerts(conn)
+    clear_actions(conn)
+    clear_baselines(conn)
+    drop_all_partitions(conn)
     conn.close()
+    clear_archive(ARCHIVE_DIR)
+    remove_checkpoint(CHECKPOINT_PATH)
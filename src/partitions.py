@@ -0,0 +1,163 @@
+import time
+from src.timestamps import ensure_epoch_column
+
+# `transactions` is a read-only UNION ALL view over one table per time bucket
+# (daily by default). Writes go straight to the bucket's table, and retention
+# drops whole tables instead of deleting rows. SQLite caps a compound SELECT at
+# 500 terms, so retention must keep the partition count below that.
+# A partition's primary key is only unique within it, so IDS_TABLE holds every
+# stored id once: a row whose id is already there (in any partition) is not
+# written again. Partition names carry the minute, so buckets are >= 60 s.
+VIEW_NAME = "transactions"
+TEMPLATE_TABLE = "transactions_template"
+REGISTRY_TABLE = "tx_partitions"
+IDS_TABLE = "tx_ids"
+MIN_PARTITION_SEC = 60
+PARTITION_PREFIX = "transactions_p"
+DEFAULT_PARTITION_SEC = 24 * 3600
+# Every partition carries these (name suffix, columns) indexes; the filtered
+# explorer columns lead with the column and end in ts_us so a filter on one
+# value is already in time order
+PARTITION_INDEXES = (
+    ("ts_us", "ts_us"),
+    ("status_ts", "status, ts_us"),
+    ("bank_ts", "bank, ts_us"),
+    ("merchant_ts", "merchant, ts_us"),
+)
+
+TX_SCHEMA = '''(
+    id TEXT PRIMARY KEY,
+    timestamp TEXT,
+    merchant TEXT,
+    amount REAL,
+    bank TEXT,
+    status TEXT,
+    risk_score INTEGER,
+    fraud_probability REAL,
+    error_code TEXT,
+    retry_count INTEGER,
+    ts_us INTEGER
+)'''
+
+def partition_name(start_us):
+    return PARTITION_PREFIX + time.strftime("%Y%m%d_%H%M", time.gmtime(start_us // 1_000_000))
+
+def check_granularity(granularity_sec):
+    if granularity_sec < MIN_PARTITION_SEC:
+        raise ValueError(f"partitions must span at least {MIN_PARTITION_SEC} s, not {granularity_sec}")
+
+def partition_bounds(ts_us, granularity_sec=DEFAULT_PARTITION_SEC):
+    span = granularity_sec * 1_000_000
+    start = (ts_us // span) * span
+    return start, start + span
+
+def list_partitions(conn):
+    c = conn.cursor()
+    c.execute(f"SELECT name, start_us, end_us FROM {REGISTRY_TABLE} ORDER BY start_us")
+    return c.fetchall()
+
+def rebuild_view(conn):
+    c = conn.cursor()
+    selects = [f"SELECT * FROM {TEMPLATE_TABLE}"] + [f"SELECT * FROM {name}" for name, _, _ in list_partitions(conn)]
+    c.execute(f"DROP VIEW IF EXISTS {VIEW_NAME}")
+    c.execute(f"CREATE VIEW {VIEW_NAME} AS " + " UNION ALL ".join(selects))
+    conn.commit()
+
+def ensure_partition(conn, start_us, end_us):
+    name = partition_name(start_us)
+    c = conn.cursor()
+    c.execute(f"SELECT 1 FROM {REGISTRY_TABLE} WHERE name=?", (name,))
+    if c.fetchone():
+        return name
+    c.execute(f"CREATE TABLE IF NOT EXISTS {name} {TX_SCHEMA}")
+    create_indexes(conn, name)
+    c.execute(f"INSERT OR IGNORE INTO {REGISTRY_TABLE} (name, start_us, end_us) VALUES (?,?,?)", (name, start_us, end_us))
+    conn.commit()
+    rebuild_view(conn)
+    return name
+
+def create_indexes(conn, name):
+    c = conn.cursor()
+    for suffix, columns in PARTITION_INDEXES:
+        c.execute(f"CREATE INDEX IF NOT EXISTS idx_{name}_{suffix} ON {name}({columns})")
+
+def insert_rows(conn, rows, granularity_sec=DEFAULT_PARTITION_SEC):
+    # rows: tuples in TX_SCHEMA column order, ts_us last; ids already stored are skipped.
+    # Partitions are created first, so the ids and rows are committed together
+    check_granularity(granularity_sec)
+    by_partition = {}
+    for row in rows:
+        by_partition.setdefault(partition_bounds(row[-1] or 0, granularity_sec), []).append(row)
+    names = {bounds: ensure_partition(conn, *bounds) for bounds in by_partition}
+    c = conn.cursor()
+    for bounds, part_rows in by_partition.items():
+        new_rows = []
+        for row in part_rows:
+            c.execute(f"INSERT OR IGNORE INTO {IDS_TABLE} (id) VALUES (?)", (row[0],))
+            if c.rowcount:
+                new_rows.append(row)
+        if new_rows:
+            c.executemany(f"INSERT INTO {names[bounds]} VALUES ({','.join('?' * len(new_rows[0]))})", new_rows)
+    conn.commit()
+
+def expired_partitions(conn, cutoff_us):
+    c = conn.cursor()
+    c.execute(f"SELECT name, start_us, end_us FROM {REGISTRY_TABLE} WHERE end_us <= ? ORDER BY start_us", (cutoff_us,))
+    return c.fetchall()
+
+def drop_partitions(conn, names):
+    if not names:
+        return
+    c = conn.cursor()
+    for name in names:
+        c.execute(f"DELETE FROM {REGISTRY_TABLE} WHERE name=?", (name,))
+    conn.commit()
+    # The view must stop referencing the tables before they go away
+    rebuild_view(conn)
+    for name in names:
+        c.execute(f"DELETE FROM {IDS_TABLE} WHERE id IN (SELECT id FROM {name})")
+        c.execute(f"DROP TABLE IF EXISTS {name}")
+    conn.commit()
+
+def drop_partitions_before(conn, cutoff_us):
+    names = [name for name, _, _ in expired_partitions(conn, cutoff_us)]
+    drop_partitions(conn, names)
+    return names
+
+def drop_all_partitions(conn):
+    drop_partitions(conn, [name for name, _, _ in list_partitions(conn)])
+
+def init_partitions(conn, granularity_sec=DEFAULT_PARTITION_SEC):
+    check_granularity(granularity_sec)
+    c = conn.cursor()
+    c.execute(f"CREATE TABLE IF NOT EXISTS {TEMPLATE_TABLE} {TX_SCHEMA}")
+    c.execute(f"CREATE INDEX IF NOT EXISTS idx_{TEMPLATE_TABLE}_ts_us ON {TEMPLATE_TABLE}(ts_us)")
+    c.execute(f"CREATE TABLE IF NOT EXISTS {REGISTRY_TABLE} (name TEXT PRIMARY KEY, start_us INTEGER, end_us INTEGER)")
+    c.execute("SELECT 1 FROM sqlite_master WHERE name=?", (IDS_TABLE,))
+    new_ids = c.fetchone() is None
+    c.execute(f"CREATE TABLE IF NOT EXISTS {IDS_TABLE} (id TEXT PRIMARY KEY)")
+    if new_ids:
+        # Partitions written before the id table existed register their ids here, oldest
+        # first; a copy of an id in a later partition is removed
+        for name, _, _ in list_partitions(conn):
+            c.execute(f"DELETE FROM {name} WHERE id IN (SELECT id FROM {IDS_TABLE})")
+            c.execute(f"INSERT INTO {IDS_TABLE} (id) SELECT id FROM {name}")
+    conn.commit()
+
+    c.execute("SELECT type FROM sqlite_master WHERE name=?", (VIEW_NAME,))
+    row = c.fetchone()
+    if row and row[0] == "table":
+        # One-off migration of a pre-partitioning database
+        ensure_epoch_column(conn, VIEW_NAME)
+        c.execute(f"ALTER TABLE {VIEW_NAME} RENAME TO transactions_legacy")
+        conn.commit()
+        c.execute("SELECT id, timestamp, merchant, amount, bank, status, risk_score, fraud_probability, "
+                  "error_code, retry_count, ts_us FROM transactions_legacy")
+        insert_rows(conn, c.fetchall(), granularity_sec)
+        c.execute("DROP TABLE transactions_legacy")
+        conn.commit()
+    # Partitions created before the filter indexes existed get them here
+    for name, _, _ in list_partitions(conn):
+        create_indexes(conn, name)
+    conn.commit()
+    rebuild_view(conn)
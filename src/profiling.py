@@ -0,0 +1,162 @@
+import os
+import sys
+import time
+import pstats
+import cProfile
+import threading
+from collections import Counter
+
+# On-demand profiling of the agent loop. A capture replaces one method (e.g.
+# run_step) on the agent *instance* for the next N calls, then deletes the
+# override so the class method is back; while no capture is armed nothing is
+# wrapped at all. Two modes:
+#   cprofile - deterministic; writes a .pstats dump plus a top-functions summary
+#   sample   - a background thread samples the calling thread's stack every
+#              interval_sec; writes collapsed stacks (flamegraph.pl, speedscope,
+#              inferno) plus a self/total summary
+# SENTINEL_PROFILE=<cycles>[:<mode>] arms a capture when the agent starts.
+PROFILE_ENV = "SENTINEL_PROFILE"
+PROFILE_DIR_ENV = "SENTINEL_PROFILE_DIR"
+DEFAULT_PROFILE_DIR = "profiles"
+MODES = ("cprofile", "sample")
+TOP_N = 25
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class StackSampler:
+    def __init__(self, interval_sec=0.001):
+        self.interval_sec = interval_sec
+        self.stacks = Counter()
+        self.samples = 0
+        self.thread_id = None
+        self.active = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._loop, name="sentinel-sampler", daemon=True)
+
+    def start(self, thread_id):
+        self.thread_id = thread_id
+        self.thread.start()
+
+    def _loop(self):
+        while not self.stopped.is_set():
+            if self.active.wait(0.1) and not self.stopped.is_set():
+                frame = sys._current_frames().get(self.thread_id)
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                if stack:
+                    self.stacks[";".join(reversed(stack))] += 1
+                    self.samples += 1
+                time.sleep(self.interval_sec)
+
+    def stop(self):
+        self.stopped.set()
+        self.active.set()
+        self.thread.join()
+
+    def summary(self, top=TOP_N):
+        own, total = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        lines = [f"{self.samples} samples every {self.interval_sec * 1000:g} ms", "",
+                 f"{'self%':>7} {'total%':>7}  function"]
+        for frame, count in own.most_common(top):
+            lines.append(f"{100 * count / self.samples:>6.1f}% {100 * total[frame] / self.samples:>6.1f}%  {frame}")
+        return "\n".join(lines)
+
+class ProfileCapture:
+    # Profiles the next `cycles` calls of obj.<method>; finished captures expose
+    # `files` (paths written) and `summary` (top functions as text)
+    def __init__(self, obj, method, cycles, mode="cprofile", out_dir=None, interval_sec=0.001):
+        if mode not in MODES:
+            raise ValueError(f"unknown profiling mode {mode!r} (expected one of {', '.join(MODES)})")
+        self.obj = obj
+        self.method = method
+        self.remaining = cycles
+        self.cycles = cycles
+        self.mode = mode
+        self.out_dir = out_dir or os.environ.get(PROFILE_DIR_ENV, DEFAULT_PROFILE_DIR)
+        self.interval_sec = interval_sec
+        self.elapsed = 0.0
+        self.files = []
+        self.summary = None
+        self.profile = cProfile.Profile() if mode == "cprofile" else None
+        self.sampler = None
+        original = getattr(obj, method)
+
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            if self.profile is not None:
+                self.profile.enable()
+            else:
+                if self.sampler is None:
+                    self.sampler = StackSampler(self.interval_sec)
+                    self.sampler.start(threading.get_ident())
+                self.sampler.active.set()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                if self.profile is not None:
+                    self.profile.disable()
+                else:
+                    self.sampler.active.clear()
+                self.elapsed += time.perf_counter() - start
+                self.remaining -= 1
+                if self.remaining <= 0:
+                    self.finish()
+
+        setattr(obj, method, wrapper)
+
+    @property
+    def done(self):
+        return self.summary is not None
+
+    def finish(self):
+        if self.done:
+            return
+        # Back to the class method: a finished capture leaves nothing behind
+        self.obj.__dict__.pop(self.method, None)
+        os.makedirs(self.out_dir, exist_ok=True)
+        base = os.path.join(self.out_dir, f"{self.method}_{time.strftime('%Y%m%d_%H%M%S')}_{self.mode}")
+        calls = self.cycles - max(self.remaining, 0)
+        header = f"{self.method}: {calls} cycles in {self.elapsed:.3f}s ({self.elapsed / max(calls, 1) * 1000:.2f} ms/cycle)"
+        if self.profile is not None:
+            self.profile.dump_stats(base + ".pstats")
+            self.files.append(base + ".pstats")
+            summary = self._cprofile_summary()
+        else:
+            if self.sampler is not None:
+                self.sampler.stop()
+                with open(base + ".collapsed", "w") as f:
+                    for stack, count in self.sampler.stacks.most_common():
+                        f.write(f"{stack} {count}\n")
+                self.files.append(base + ".collapsed")
+                summary = self.sampler.summary()
+            else:
+                summary = "no samples"
+        self.summary = header + "\n\n" + summary
+        with open(base + "_top.txt", "w") as f:
+            f.write(self.summary + "\n")
+        self.files.append(base + "_top.txt")
+
+    def _cprofile_summary(self):
+        stats = pstats.Stats(self.profile)
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:TOP_N]
+        lines = [f"{'calls':>8} {'own s':>8} {'cum s':>8}  function"]
+        for (filename, line, name), (_, calls, own, cum, _) in rows:
+            lines.append(f"{calls:>8} {own:>8.4f} {cum:>8.4f}  {name} ({os.path.basename(filename)}:{line})")
+        return "\n".join(lines)
+
+def capture_from_env(obj, method):
+    # Arms a capture when SENTINEL_PROFILE=<cycles>[:<mode>] is set; returns it or None
+    value = os.environ.get(PROFILE_ENV)
+    if not value:
+        return None
+    cycles, _, mode = value.partition(":")
+    return ProfileCapture(obj, method, int(cycles), mode or "cprofile")
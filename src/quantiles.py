@@ -0,0 +1,195 @@
+import os
+import math
+import time
+import random
+import numpy as np
+
+# KLL quantile sketches (Karnin, Lang, Liberty 2016) of transaction amounts per
+# merchant, per bank and per hour of day. A sketch is a stack of compactors:
+# level h holds items of weight 2**h and, when full, sorts itself and promotes
+# every other item of its lower half (random offset) to level h+1; like the
+# REQ sketch, the upper half stays put, so high quantiles (the p99.5 checks)
+# are far more accurate than the median. Capacities shrink by c per level
+# down from k, so memory stays around k / (1 - c) items however many amounts
+# go in, and two sketches merge by concatenating levels and compacting, so
+# per-process sketches can be combined.
+DEFAULT_K = 200
+KINDS = ("merchant", "bank", "hour")
+
+class KLLSketch:
+    def __init__(self, k=DEFAULT_K, c=2 / 3, seed=None):
+        self.k = k
+        self.c = c
+        self.n = 0
+        self.levels = [[]]
+        self.size = 0
+        self.rng = random.Random(seed)
+        self.max_size = self._max_size()
+
+    def _capacity(self, h):
+        return int(math.ceil(self.c ** (len(self.levels) - h - 1) * self.k)) + 1
+
+    def _max_size(self):
+        return sum(self._capacity(h) for h in range(len(self.levels)))
+
+    def _compact(self, h):
+        level = self.levels[h]
+        if h + 1 == len(self.levels):
+            self.levels.append([])
+            self.max_size = self._max_size()
+        level.sort()
+        # Only the lower half is compacted; the largest items stay at this
+        # weight, which keeps the upper tail (p99+) close to exact
+        half = max(2, len(level) // 2) & ~1
+        self.levels[h + 1].extend(level[self.rng.getrandbits(1):half:2])
+        del level[:half]
+
+    def _compress(self):
+        while self.size >= self.max_size:
+            for h in range(len(self.levels)):
+                if len(self.levels[h]) >= self._capacity(h):
+                    self._compact(h)
+                    break
+            self.size = sum(len(level) for level in self.levels)
+
+    def update(self, x):
+        self.levels[0].append(x)
+        self.n += 1
+        self.size += 1
+        if self.size >= self.max_size:
+            self._compress()
+
+    def update_many(self, values):
+        values = list(values)
+        self.levels[0].extend(values)
+        self.n += len(values)
+        self.size += len(values)
+        self._compress()
+
+    def merge(self, other):
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+        for h, level in enumerate(other.levels):
+            self.levels[h].extend(level)
+        self.n += other.n
+        self.max_size = self._max_size()
+        self.size = sum(len(level) for level in self.levels)
+        self._compress()
+        return self
+
+    def quantile(self, q):
+        items = sorted((x, 1 << h) for h, level in enumerate(self.levels) for x in level)
+        if not items:
+            return None
+        target = q * sum(w for _, w in items)
+        seen = 0
+        for x, w in items:
+            seen += w
+            if seen >= target:
+                return x
+        return items[-1][0]
+
+    def rank(self, x):
+        # Estimated fraction of the stream <= x
+        total = sum(len(level) << h for h, level in enumerate(self.levels))
+        below = sum(sum(1 for v in level if v <= x) << h for h, level in enumerate(self.levels))
+        return below / total if total else 0.0
+
+    @property
+    def retained(self):
+        return self.size
+
+class AmountSketches:
+    # One KLLSketch per (kind, key) for kind in KINDS. The q-quantile cutoff of
+    # each sketch is cached and recomputed after `refresh` updates or 1% growth,
+    # whichever is more, so checking an amount is a dict lookup and a compare.
+    def __init__(self, k=DEFAULT_K, q=0.995, min_count=200, refresh=64):
+        self.k = k
+        self.q = q
+        self.min_count = min_count
+        self.refresh = refresh
+        self.sketches = {}
+        self.cutoffs = {}
+
+    def __len__(self):
+        return len(self.sketches)
+
+    @staticmethod
+    def keys(merchant, bank, hour):
+        return (("merchant", merchant), ("bank", bank), ("hour", hour))
+
+    def _sketch(self, key):
+        sketch = self.sketches.get(key)
+        if sketch is None:
+            sketch = self.sketches[key] = KLLSketch(self.k)
+        return sketch
+
+    def cutoff(self, key):
+        # The cached q-quantile, or None while the sketch has under min_count amounts
+        sketch = self.sketches.get(key)
+        if sketch is None or sketch.n < self.min_count:
+            return None
+        cached = self.cutoffs.get(key)
+        if cached is None or sketch.n - cached[1] >= max(self.refresh, cached[1] // 100):
+            cached = self.cutoffs[key] = (sketch.quantile(self.q), sketch.n)
+        return cached[0]
+
+    def observe(self, merchant, bank, hour, amount):
+        # (kind, key, cutoff) for every bucket whose cutoff the amount tops,
+        # checked before the amount is added
+        above = []
+        for key in self.keys(merchant, bank, hour):
+            cutoff = self.cutoff(key)
+            if cutoff is not None and amount > cutoff:
+                above.append(key + (cutoff,))
+            self._sketch(key).update(amount)
+        return above
+
+    def fit(self, merchants, banks, hours, amounts):
+        # Bulk load from columns: one update_many per bucket
+        amounts = np.asarray(amounts, dtype=np.float64)
+        for kind, col in zip(KINDS, (merchants, banks, hours)):
+            col = np.asarray(col)
+            for key in np.unique(col).tolist():
+                self._sketch((kind, key)).update_many(amounts[col == key].tolist())
+        self.cutoffs.clear()
+
+    def fit_dataset(self, datasets):
+        for path, cols in datasets:
+            self.fit(cols["upi_app"], cols["bank"], cols["hour_of_day"], cols["amount"])
+
+    def merge(self, other):
+        for key, sketch in other.sketches.items():
+            if key in self.sketches:
+                self.sketches[key].merge(sketch)
+            else:
+                self.sketches[key] = sketch
+        self.cutoffs.clear()
+        return self
+
+    @property
+    def retained(self):
+        return sum(s.retained for s in self.sketches.values())
+
+def local_hour(ts_us):
+    return time.localtime(ts_us // 1_000_000).tm_hour
+
+def _fit_chunk(args):
+    k, merchants, banks, hours, amounts = args
+    sketches = AmountSketches(k)
+    sketches.fit(merchants, banks, hours, amounts)
+    return sketches
+
+def fit_parallel(merchants, banks, hours, amounts, processes=None, k=DEFAULT_K):
+    # Each worker sketches one slice of the columns; the parent merges the results.
+    # multiprocessing is imported here so the agent's startup does not pay for it
+    from multiprocessing import Pool
+    processes = processes or os.cpu_count() or 1
+    bounds = np.linspace(0, len(amounts), processes + 1).astype(int)
+    chunks = [(k, merchants[a:b], banks[a:b], hours[a:b], amounts[a:b]) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+    with Pool(processes=processes) as pool:
+        parts = pool.map(_fit_chunk, chunks)
+    merged = AmountSketches(k)
+    for part in parts:
+        merged.merge(part)
+    return merged
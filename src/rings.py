@@ -0,0 +1,110 @@
+import time
+from collections import OrderedDict
+
+def ring_entities(device_fingerprint, ip_address):
+    # The entities a transaction links together; missing values link nothing
+    return [key for key in (("device", device_fingerprint), ("ip", ip_address)) if key[1]]
+
+class FraudRingGraph:
+    # Union-find over the devices and IPs that transactions share. Every root
+    # carries its component's member list and running totals, so observing a
+    # transaction is a few near-constant-time find/union steps. Components are
+    # evicted whole once idle for ttl_sec, or least-recently-active first when
+    # the graph holds more than max_entities, which keeps the forest consistent
+    # without ever unlinking a single node.
+    def __init__(self, ttl_sec=24 * 3600, max_entities=100_000, clock=time.monotonic):
+        self.ttl_sec = ttl_sec
+        self.max_entities = max_entities
+        self.clock = clock
+        self.parent = {}
+        self.members = {}
+        self.totals = {}
+        self.active = OrderedDict()
+        self.evicted = 0
+        # Newest observation time; shrink() expires against it rather than the clock
+        self.latest = None
+
+    def find(self, key):
+        parent = self.parent
+        while parent[key] != key:
+            # Path halving
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    def _add(self, key, now):
+        self.parent[key] = key
+        self.members[key] = [key]
+        self.totals[key] = {"transactions": 0, "blocked": 0, "amount": 0.0, "last_seen": now}
+        self.active[key] = None
+
+    def _union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return ra
+        # Union by size: the smaller member list is the one that moves
+        if len(self.members[ra]) < len(self.members[rb]):
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        self.members[ra].extend(self.members.pop(rb))
+        small, big = self.totals.pop(rb), self.totals[ra]
+        big["transactions"] += small["transactions"]
+        big["blocked"] += small["blocked"]
+        big["amount"] += small["amount"]
+        big["last_seen"] = max(big["last_seen"], small["last_seen"])
+        del self.active[rb]
+        return ra
+
+    def _evict(self, now):
+        horizon = now - self.ttl_sec
+        while self.active:
+            root = next(iter(self.active))
+            if len(self.parent) <= self.max_entities and self.totals[root]["last_seen"] >= horizon:
+                break
+            del self.active[root]
+            del self.totals[root]
+            for key in self.members.pop(root):
+                del self.parent[key]
+                self.evicted += 1
+
+    def observe(self, entities, amount=0.0, now=None):
+        # Links the entities of one transaction and returns its component's
+        # totals (including this transaction) plus its size in entities
+        if not entities:
+            return None
+        now = self.clock() if now is None else now
+        self.latest = now if self.latest is None else max(self.latest, now)
+        self._evict(self.latest)
+        for key in entities:
+            if key not in self.parent:
+                self._add(key, now)
+        root = self.find(entities[0])
+        for key in entities[1:]:
+            root = self._union(root, key)
+        totals = self.totals[root]
+        totals["transactions"] += 1
+        totals["amount"] += amount
+        totals["last_seen"] = max(totals["last_seen"], now)
+        self.active.move_to_end(root)
+        return dict(totals, size=len(self.members[root]))
+
+    def shrink(self, max_entities):
+        # Memory pressure: drops least-recently-active components down to max_entities
+        cap, self.max_entities = self.max_entities, max_entities
+        self._evict(self.clock() if self.latest is None else self.latest)
+        self.max_entities = cap
+
+    def mark_blocked(self, entities):
+        for key in entities:
+            if key in self.parent:
+                self.totals[self.find(key)]["blocked"] += 1
+                return
+
+    def component(self, key):
+        if key not in self.parent:
+            return None
+        root = self.find(key)
+        return dict(self.totals[root], size=len(self.members[root]))
+
+    def __len__(self):
+        return len(self.parent)
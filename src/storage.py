@@ -0,0 +1,292 @@
+import queue
+import sqlite3
+import threading
+from bisect import bisect_left, bisect_right
+from src.timestamps import now_us
+from src.partitions import insert_rows, check_granularity, DEFAULT_PARTITION_SEC, IDS_TABLE
+from src.metrics import DB_WRITE_SECONDS
+
+# Every backend stores and returns transaction rows as tuples in TX_COLUMNS
+# order (ts_us last, as insert_rows expects) and answers the same calls:
+# append, recent, between, exists, recent_ids, flush, close. Reads are newest
+# first; between() is the half-open [start_us, end_us) range.
+TX_COLUMNS = ("id", "timestamp", "merchant", "amount", "bank", "status",
+              "risk_score", "fraud_probability", "error_code", "retry_count", "ts_us")
+TS = len(TX_COLUMNS) - 1
+
+class SQLiteStore:
+    # The durable tier: the partitioned `transactions` view, one connection per call
+    def __init__(self, db_path, granularity_sec=DEFAULT_PARTITION_SEC):
+        check_granularity(granularity_sec)
+        self.db_path = db_path
+        self.granularity_sec = granularity_sec
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path, timeout=30.0)
+
+    def _query(self, sql, params=()):
+        conn = self._connect()
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def append(self, rows):
+        if not rows:
+            return
+        conn = self._connect()
+        try:
+            with DB_WRITE_SECONDS.time(table="transactions"):
+                insert_rows(conn, rows, self.granularity_sec)
+        finally:
+            conn.close()
+
+    def recent(self, limit):
+        return self._query(f"SELECT {', '.join(TX_COLUMNS)} FROM transactions ORDER BY ts_us DESC LIMIT ?", (limit,))
+
+    def between(self, start_us, end_us, limit=None):
+        sql = f"SELECT {', '.join(TX_COLUMNS)} FROM transactions WHERE ts_us >= ? AND ts_us < ? ORDER BY ts_us DESC"
+        params = (start_us, end_us)
+        if limit is not None:
+            sql += " LIMIT ?"
+            params += (limit,)
+        return self._query(sql, params)
+
+    def exists(self, ids):
+        ids = list(ids)
+        found = set()
+        conn = self._connect()
+        try:
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                rows = conn.execute(f"SELECT id FROM {IDS_TABLE} WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+                found.update(r[0] for r in rows)
+        finally:
+            conn.close()
+        return found
+
+    def recent_ids(self, limit):
+        return [r[0] for r in self._query("SELECT id FROM transactions ORDER BY ts_us DESC LIMIT ?", (limit,))]
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+class MemoryStore:
+    # Columnar in-memory tier: one list per column kept sorted by ts_us, so
+    # appends of live traffic are list appends and time ranges are bisects.
+    # Rows older than window_sec, or beyond max_rows, are dropped from the front
+    # on append unless auto_evict is off (the tiered store evicts explicitly).
+    def __init__(self, window_sec=None, max_rows=None, auto_evict=True, clock=now_us):
+        self.window_us = int(window_sec * 1_000_000) if window_sec else None
+        self.max_rows = max_rows
+        self.auto_evict = auto_evict
+        self.clock = clock
+        self.lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        with self.lock:
+            self.cols = tuple([] for _ in TX_COLUMNS)
+            self.ids = set()
+
+    @property
+    def horizon_us(self):
+        # Oldest timestamp still held (None when empty)
+        with self.lock:
+            ts = self.cols[TS]
+            return ts[0] if ts else None
+
+    def cutoff_us(self):
+        return self.clock() - self.window_us if self.window_us else None
+
+    def append(self, rows):
+        with self.lock:
+            cols, ts = self.cols, self.cols[TS]
+            for row in rows:
+                if row[0] in self.ids:
+                    continue
+                self.ids.add(row[0])
+                if not ts or row[TS] >= ts[-1]:
+                    for col, value in zip(cols, row):
+                        col.append(value)
+                else:
+                    at = bisect_right(ts, row[TS])
+                    for col, value in zip(cols, row):
+                        col.insert(at, value)
+            if self.auto_evict:
+                self.evict()
+
+    def evict(self, cutoff_us=None):
+        with self.lock:
+            ts = self.cols[TS]
+            cutoff_us = self.cutoff_us() if cutoff_us is None else cutoff_us
+            drop = bisect_left(ts, cutoff_us) if cutoff_us is not None else 0
+            if self.max_rows is not None:
+                drop = max(drop, len(ts) - self.max_rows)
+            if drop <= 0:
+                return 0
+            self.ids.difference_update(self.cols[0][:drop])
+            for col in self.cols:
+                del col[:drop]
+            return drop
+
+    def shrink(self, max_rows):
+        # Memory pressure: keeps at most the newest max_rows
+        with self.lock:
+            cap, self.max_rows = self.max_rows, max_rows
+            self.evict()
+            self.max_rows = cap
+
+    def _rows(self, lo, hi, limit):
+        # Rows [lo, hi) of the sorted columns, newest first
+        if limit is not None:
+            lo = max(lo, hi - limit)
+        return list(zip(*(col[lo:hi] for col in self.cols)))[::-1]
+
+    def recent(self, limit):
+        with self.lock:
+            return self._rows(0, len(self.cols[TS]), limit)
+
+    def between(self, start_us, end_us, limit=None):
+        with self.lock:
+            ts = self.cols[TS]
+            return self._rows(bisect_left(ts, start_us), bisect_left(ts, end_us), limit)
+
+    def exists(self, ids):
+        with self.lock:
+            return self.ids.intersection(ids)
+
+    def recent_ids(self, limit):
+        with self.lock:
+            return self.cols[0][-limit:][::-1] if limit else []
+
+    def columns(self):
+        # Copy of every column, oldest first, e.g. for pd.DataFrame(store.columns())
+        with self.lock:
+            return {name: list(col) for name, col in zip(TX_COLUMNS, self.cols)}
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def __len__(self):
+        return len(self.cols[TS])
+
+class TieredStore:
+    # Hot MemoryStore for the last window_sec in front of a durable cold store.
+    # Every row is written through to cold by a background thread that batches
+    # whatever has queued up; rows already older than the hot window skip the
+    # hot tier. Hot rows are only evicted once the writer has caught up, so a
+    # row is always readable from at least one tier. Reads at or after the hot
+    # tier's horizon are served from memory, older ones from cold.
+    def __init__(self, cold, window_sec=600, max_batch=5000, clock=now_us):
+        self.cold = cold
+        self.hot = MemoryStore(window_sec, auto_evict=False, clock=clock)
+        self.max_batch = max_batch
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.errors = 0
+        self.writer = threading.Thread(target=self._write_loop, name="sentinel-cold-writer", daemon=True)
+        self.writer.start()
+
+    def _write_loop(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            rows = [row for rows in batch if rows for row in rows]
+            try:
+                self.cold.append(rows)
+            except Exception as e:
+                self.errors += 1
+                print(f"Cold store write error: {e}")
+            for _ in batch:
+                self.queue.task_done()
+            if stop:
+                return
+            self._evict_if_idle()
+
+    def _evict_if_idle(self):
+        with self.lock:
+            if self.queue.unfinished_tasks == 0:
+                self.hot.evict()
+
+    def append(self, rows):
+        rows = list(rows)
+        if not rows:
+            return
+        with self.lock:
+            # Anything at or after the hot horizon must land in hot, or reads would miss it
+            floor = self.hot.cutoff_us()
+            horizon = self.hot.horizon_us
+            if horizon is not None and floor is not None:
+                floor = min(floor, horizon)
+            self.hot.append(rows if floor is None else [row for row in rows if row[TS] >= floor])
+            self.queue.put(rows)
+
+    def _merge(self, hot_rows, horizon, start_us, end_us, limit, cold_read):
+        # hot_rows cover [horizon, ...); the cold tier fills in below the horizon
+        if horizon is None:
+            return cold_read(start_us, end_us, limit)
+        if limit is not None and len(hot_rows) >= limit or start_us >= horizon:
+            return hot_rows
+        rest = None if limit is None else limit - len(hot_rows)
+        return hot_rows + cold_read(start_us, min(end_us, horizon), rest)
+
+    def recent(self, limit):
+        with self.hot.lock:
+            horizon, hot_rows = self.hot.horizon_us, self.hot.recent(limit)
+        if horizon is None:
+            return self.cold.recent(limit)
+        return self._merge(hot_rows, horizon, 0, horizon, limit, self.cold.between)
+
+    def between(self, start_us, end_us, limit=None):
+        with self.hot.lock:
+            horizon = self.hot.horizon_us
+            hot_rows = self.hot.between(max(start_us, horizon), end_us, limit) if horizon is not None else []
+        return self._merge(hot_rows, horizon, start_us, end_us, limit, self.cold.between)
+
+    def exists(self, ids):
+        ids = set(ids)
+        found = self.hot.exists(ids)
+        missing = ids - found
+        return found | self.cold.exists(missing) if missing else found
+
+    def recent_ids(self, limit):
+        return [row[0] for row in self.recent(limit)]
+
+    def columns(self):
+        return self.hot.columns()
+
+    def shrink(self, max_rows):
+        # Hot rows are only dropped once durable, so rows stay readable from one tier
+        self.flush()
+        with self.lock:
+            self.hot.shrink(max_rows)
+
+    def clear_hot(self):
+        self.flush()
+        self.hot.clear()
+
+    def flush(self):
+        # Blocks until every appended row is durable in the cold tier
+        self.queue.join()
+        self._evict_if_idle()
+
+    def close(self):
+        if self.writer.is_alive():
+            self.queue.put(None)
+            self.writer.join()
+        self.cold.close()
+
+    def __len__(self):
+        return len(self.hot)
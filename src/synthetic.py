@@ -0,0 +1,184 @@
+import time
+import uuid
+import numpy as np
+from src.dataset import transaction_dicts
+from src.timestamps import now_us, format_us_array
+
+# Categorical columns are generated as small integer codes into a vocabulary and
+# only turned into strings by decode(). Every distribution is precomputed into a
+# TABLE_SIZE lookup table of its inverse CDF, so drawing a column is one random
+# integer array plus one gather, whatever the batch size.
+# Each device keeps the IP it was seen with, so IPs are derived, not drawn.
+DRAWN = ("upi_app", "bank", "error_code", "device_fingerprint")
+CATEGORICAL = DRAWN + ("ip_address",)
+QUANTILES = 1001
+TABLE_SIZE = 1 << 16
+DAY_US = 24 * 3600 * 1_000_000
+HOUR_US = 3600 * 1_000_000
+
+def new_id_prefix(tag="TX"):
+    # Creation second plus random hex: generators created in the same second (other
+    # sessions, processes or restores) all start at seq 0, so the second alone collides
+    return f"{tag}_{int(time.time())}_{uuid.uuid4().hex[:8]}_"
+
+def _categorical(values):
+    vocab, counts = np.unique(np.asarray(values), return_counts=True)
+    return vocab, counts / counts.sum()
+
+def _quantiles(values, default):
+    values = np.asarray(values, dtype=np.float64)
+    if not len(values):
+        values = np.asarray(default, dtype=np.float64)
+    return np.quantile(values, np.linspace(0, 1, QUANTILES))
+
+def _grid():
+    return (np.arange(TABLE_SIZE) + 0.5) / TABLE_SIZE
+
+def _code_table(probs):
+    cdf = np.cumsum(probs)
+    return np.searchsorted(cdf / cdf[-1], _grid(), side="right").clip(0, len(probs) - 1).astype(np.int32)
+
+def _value_table(quantiles):
+    return np.interp(_grid(), np.linspace(0, 1, len(quantiles)), quantiles)
+
+def default_profile():
+    # Used when no dataset is available; mirrors the old hard-coded stream
+    return {
+        "upi_app": (np.array(["Amazon", "Walmart", "Apple", "Netflix", "Uber", "Airbnb"]), np.full(6, 1 / 6)),
+        "bank": (np.array(["HDFC", "SBI", "Axis", "ICICI", "Chase"]), np.full(5, 1 / 5)),
+        "error_code": (np.array(["UPI_AUTHENTICATION_FAILED", "INSUFFICIENT_FUNDS", "BANK_SERVER_ERROR", "RISK_CHECK_FAILED"]), np.full(4, 1 / 4)),
+        "device_fingerprint": (np.array([f"device_{i:04d}" for i in range(250)]), np.full(250, 1 / 250)),
+        "ip_address": (np.array([f"10.0.{i // 250}.{i % 250}" for i in range(250)]), np.full(250, 1 / 250)),
+        "device_ip": np.arange(250),
+        "amount": _quantiles([], [10, 5000]),
+        "hour": np.full(24, 1 / 24),
+        "attempts_ok": (np.array([0]), np.array([1.0])),
+        "attempts_failed": (np.arange(4, 11), np.full(7, 1 / 7)),
+        "score_clean": _quantiles([], [0, 30]),
+        "score_fraud": _quantiles([], [80, 100]),
+        "fraud_rate": 0.15,
+        "spam_rate": 0.25,
+    }
+
+def fit_profile(datasets):
+    # Empirical distributions of every generated column, from load_all() output
+    if not datasets:
+        return default_profile()
+    col = {name: np.concatenate([np.asarray(cols[name]) for _, cols in datasets])
+           for name in ("amount", "upi_app", "bank", "status", "error_code", "device_fingerprint",
+                        "ip_address", "fraud_score", "is_suspicious", "hour_of_day", "attempt_count")}
+    failed = col["status"] == "Failed"
+    labels = col["is_suspicious"].astype(bool)
+    errors = col["error_code"][failed & (col["error_code"] != "")]
+    hours = np.bincount(col["hour_of_day"] % 24, minlength=24)
+    profile = {name: _categorical(col[name]) for name in ("upi_app", "bank", "device_fingerprint", "ip_address")}
+    device_ip = np.zeros(len(profile["device_fingerprint"][0]), dtype=np.int64)
+    device_ip[np.searchsorted(profile["device_fingerprint"][0], col["device_fingerprint"])] = \
+        np.searchsorted(profile["ip_address"][0], col["ip_address"])
+    profile.update({
+        "device_ip": device_ip,
+        "error_code": _categorical(errors) if len(errors) else default_profile()["error_code"],
+        "amount": _quantiles(col["amount"], [10, 5000]),
+        "hour": hours / hours.sum(),
+        "attempts_ok": _categorical(col["attempt_count"][~failed]) if (~failed).any() else (np.array([0]), np.array([1.0])),
+        "attempts_failed": _categorical(col["attempt_count"][failed]) if failed.any() else (np.arange(4, 11), np.full(7, 1 / 7)),
+        "score_clean": _quantiles(col["fraud_score"][~labels], [0, 30]),
+        "score_fraud": _quantiles(col["fraud_score"][labels], [80, 100]),
+        "fraud_rate": float(labels.mean()),
+        "spam_rate": float(failed.mean()),
+    })
+    return profile
+
+class SyntheticGenerator:
+    # fraud_rate / spam_rate override the fitted injection rates (None keeps them).
+    # ring_rate is the share of fraudulent transactions coming from a ring: a
+    # fixed set of ring_size devices rotating over ring_size shared IPs.
+    def __init__(self, profile=None, fraud_rate=None, spam_rate=None, seed=None, id_prefix=None,
+                 ring_rate=0.0, ring_size=8):
+        self.profile = profile or default_profile()
+        self.fraud_rate = self.profile["fraud_rate"] if fraud_rate is None else fraud_rate
+        self.spam_rate = self.profile["spam_rate"] if spam_rate is None else spam_rate
+        self.rng = np.random.default_rng(seed)
+        self.id_prefix = id_prefix or new_id_prefix()
+        self.seq = 0
+        self.ring_rate = ring_rate
+        num_devices, num_ips = len(self.profile["device_fingerprint"][0]), len(self.profile["ip_address"][0])
+        self.ring_devices = self.rng.choice(num_devices, min(ring_size, num_devices), replace=False)
+        self.ring_ips = self.rng.choice(num_ips, min(ring_size, num_ips), replace=False)
+        p = self.profile
+        self.tables = {name: _code_table(p[name][1]) for name in DRAWN}
+        self.tables.update({
+            "hour": _code_table(p["hour"]),
+            "attempts_ok": p["attempts_ok"][0][_code_table(p["attempts_ok"][1])],
+            "attempts_failed": p["attempts_failed"][0][_code_table(p["attempts_failed"][1])],
+            "amount": _value_table(p["amount"]),
+            "score_clean": _value_table(p["score_clean"]),
+            "score_fraud": _value_table(p["score_fraud"]),
+        })
+
+    @classmethod
+    def from_datasets(cls, datasets, **kwargs):
+        return cls(fit_profile(datasets), **kwargs)
+
+    def _draw(self, name, n):
+        return self.tables[name][self.rng.integers(0, TABLE_SIZE, n, dtype=np.uint16)]
+
+    def generate(self, n, start_us=None, span_us=0):
+        # Columnar batch with categorical codes. Timestamps fall in
+        # [start_us, start_us + span_us); without start_us they follow the fitted
+        # hour-of-day profile over the current day.
+        rng = self.rng
+        is_fraud = rng.random(n) < self.fraud_rate
+        failed = rng.random(n) < self.spam_rate
+
+        if start_us is None:
+            day = now_us() // DAY_US * DAY_US
+            hour = self._draw("hour", n)
+            ts_us = day + hour.astype(np.int64) * HOUR_US + rng.integers(0, HOUR_US, n)
+        else:
+            ts_us = start_us + (rng.integers(0, span_us, n) if span_us else np.zeros(n, dtype=np.int64))
+            hour = (ts_us // HOUR_US) % 24
+        ts_us.sort()
+
+        score = np.where(is_fraud, self._draw("score_fraud", n), self._draw("score_clean", n))
+        attempts = np.where(failed, self._draw("attempts_failed", n), self._draw("attempts_ok", n))
+        cols = {
+            "seq": np.arange(self.seq, self.seq + n, dtype=np.int64),
+            "ts_us": ts_us.astype(np.int64),
+            "amount": np.round(self._draw("amount", n), 2),
+            "failed": failed,
+            "fraud_score": np.round(score),
+            "is_suspicious": is_fraud,
+            "hour_of_day": hour.astype(np.int32),
+            "attempt_count": attempts.astype(np.int32),
+        }
+        for name in DRAWN:
+            cols[name] = self._draw(name, n)
+        cols["ip_address"] = self.profile["device_ip"][cols["device_fingerprint"]].astype(np.int32)
+        if self.ring_rate:
+            ring = is_fraud & (rng.random(n) < self.ring_rate)
+            k = int(ring.sum())
+            cols["device_fingerprint"][ring] = self.ring_devices[rng.integers(0, len(self.ring_devices), k)]
+            cols["ip_address"][ring] = self.ring_ips[rng.integers(0, len(self.ring_ips), k)]
+        # Only failed transactions carry an error code
+        cols["error_code"][~failed] = -1
+        self.seq += n
+        return cols
+
+    def decode(self, cols):
+        # Dataset-shaped columns (as load_dataset returns them) from a generated batch
+        p = self.profile
+        n = len(cols["seq"])
+        out = {name: cols[name] for name in ("ts_us", "amount", "fraud_score", "is_suspicious", "hour_of_day", "attempt_count")}
+        out["id"] = np.char.add(self.id_prefix, cols["seq"].astype(str))
+        out["timestamp"] = format_us_array(cols["ts_us"])
+        out["status"] = np.where(cols["failed"], "Failed", "Processed")
+        for name in CATEGORICAL:
+            out[name] = p[name][0][cols[name]]
+        out["error_code"] = np.where(cols["error_code"] >= 0, out["error_code"], "")
+        out["fraud_reasons"] = np.full(n, "")
+        return out
+
+    def transactions(self, n, start_us=None, span_us=0):
+        # Row dicts for the Transaction classes
+        return list(transaction_dicts(self.decode(self.generate(n, start_us, span_us))))
@@ -0,0 +1,113 @@
+import time
+import queue
+import threading
+from collections import deque
+from src.batching import percentile
+from src.metrics import counter, histogram
+
+TIER_SECONDS = histogram("sentinel_tier_seconds", "Per-transaction decision latency by tier (slow includes queueing)", ("tier",),
+                         buckets=(0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0))
+ESCALATIONS = counter("sentinel_escalations_total", "Actions raised by the slow path after the fast-path decision", ("rule",))
+FAST_OVER_BUDGET = counter("sentinel_fast_path_over_budget_total", "Fast-path batches over their per-transaction budget")
+SLOW_DROPPED = counter("sentinel_slow_path_dropped_total", "Batches not enriched because the slow-path queue was full")
+
+# Two-tier decisions: the fast path (threshold rules, run inline) gives every
+# transaction its allow/block/investigate decision within a per-transaction
+# budget; the slow path (graph lookups, sketches, anything expensive) runs on
+# one background thread and can only escalate afterwards.
+
+class TierLatency:
+    # Recent per-transaction latencies by tier; fast-path batches over
+    # budget_us per transaction are counted, not cut short
+    def __init__(self, budget_us, size=1000):
+        self.budget_us = budget_us
+        self.samples = {"fast": deque(maxlen=size), "slow": deque(maxlen=size)}
+        self.stats = {"fast_batches": 0, "fast_over_budget": 0, "slow_batches": 0, "slow_dropped": 0, "escalations": 0}
+        self.lock = threading.Lock()
+
+    def observe(self, tier, n, seconds):
+        # fast: time spent per transaction; slow: submit-to-escalation lag, the same for the whole batch
+        per_tx = seconds / n if tier == "fast" else seconds
+        TIER_SECONDS.observe(per_tx, tier=tier)
+        with self.lock:
+            self.samples[tier].append(per_tx)
+            self.stats[tier + "_batches"] += 1
+            if tier == "fast" and per_tx * 1_000_000 > self.budget_us:
+                self.stats["fast_over_budget"] += 1
+                FAST_OVER_BUDGET.inc()
+
+    def dropped(self):
+        with self.lock:
+            self.stats["slow_dropped"] += 1
+        SLOW_DROPPED.inc()
+
+    def escalated(self, actions):
+        with self.lock:
+            self.stats["escalations"] += len(actions)
+        for a in actions:
+            ESCALATIONS.inc(rule=a.rule)
+
+    def percentiles(self, tier, qs=(50, 99)):
+        # Microseconds per transaction
+        with self.lock:
+            values = list(self.samples[tier])
+        return {q: percentile(values, q) * 1_000_000 for q in qs} if values else {}
+
+class SlowPath:
+    # Runs enrich(batch, context) -> [Action] for each submitted batch on one
+    # worker thread, in order, so the state it enriches from is only touched
+    # there; hold `lock` to measure or shrink that state from another thread.
+    # submit() never blocks the fast path: once max_pending batches are waiting,
+    # new ones are not enriched and counted as slow_dropped. Escalations are kept for drain().
+    def __init__(self, enrich, latency, max_pending=100):
+        self.enrich = enrich
+        self.latency = latency
+        self.queue = queue.Queue(max_pending)
+        self.lock = threading.Lock()
+        self.done = deque()
+        self.thread = threading.Thread(target=self._loop, name="sentinel-slow-path", daemon=True)
+        self.thread.start()
+
+    def _loop(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                return
+            submitted, batch, context = item
+            try:
+                with self.lock:
+                    actions = self.enrich(batch, context)
+            except Exception as e:
+                print(f"[SLOW PATH] enrichment failed: {e}")
+                actions = []
+            self.latency.observe("slow", len(batch), time.perf_counter() - submitted)
+            self.latency.escalated(actions)
+            self.done.extend(actions)
+            self.queue.task_done()
+
+    @property
+    def pending(self):
+        return self.queue.unfinished_tasks
+
+    def submit(self, batch, context=None):
+        if batch:
+            try:
+                self.queue.put_nowait((time.perf_counter(), batch, context))
+            except queue.Full:
+                self.latency.dropped()
+
+    def drain(self):
+        # Escalations raised since the last drain
+        out = []
+        while self.done:
+            out.append(self.done.popleft())
+        return out
+
+    def join(self):
+        self.queue.join()
+
+    def close(self):
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
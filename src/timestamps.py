@@ -0,0 +1,59 @@
+import time
+from datetime import datetime, date
+
+# All stored times are integer microseconds since the Unix epoch (local wall clock,
+# like the naive timestamps they are parsed from). Text timestamps are kept only
+# for display.
+
+def now_us():
+    return time.time_ns() // 1000
+
+def to_epoch_us(value):
+    # Accepts the formats found across the repo: ISO with microseconds (CSV),
+    # "%Y-%m-%d %H:%M:%S" (synthetic stream), isoformat() and bare "%H:%M:%S" (logs)
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return int(value.timestamp() * 1_000_000)
+    if isinstance(value, (int, float)):
+        return int(value * 1_000_000)
+    text = str(value).strip()
+    try:
+        return int(datetime.fromisoformat(text).timestamp() * 1_000_000)
+    except ValueError:
+        pass
+    try:
+        t = datetime.strptime(text, "%H:%M:%S").time()
+        return int(datetime.combine(date.today(), t).timestamp() * 1_000_000)
+    except ValueError:
+        return None
+
+def from_epoch_us(us):
+    return datetime.fromtimestamp(us / 1_000_000)
+
+def format_us(us, fmt="%Y-%m-%d %H:%M:%S"):
+    return from_epoch_us(us).strftime(fmt)
+
+def format_us_array(ts_us):
+    # Vectorized format_us for "%Y-%m-%d %H:%M:%S"; the local UTC offset is
+    # looked up once per distinct hour so DST changes are still honoured
+    import numpy as np
+    ts_us = np.asarray(ts_us, dtype=np.int64)
+    hours, inverse = np.unique(ts_us // 3_600_000_000, return_inverse=True)
+    offsets = np.array([datetime.fromtimestamp(h * 3600).astimezone().utcoffset().total_seconds()
+                        for h in hours.tolist()], dtype=np.int64) * 1_000_000
+    local = (ts_us + offsets[inverse]).astype("datetime64[us]")
+    return np.char.replace(np.datetime_as_string(local, unit="s"), "T", " ")
+
+def ensure_epoch_column(conn, table, source="timestamp", column="ts_us"):
+    # Adds the integer column (once), backfills it from the text column and indexes it
+    c = conn.cursor()
+    cols = [r[1] for r in c.execute(f"PRAGMA table_info({table})").fetchall()]
+    if column not in cols:
+        c.execute(f"ALTER TABLE {table} ADD COLUMN {column} INTEGER")
+    rows = c.execute(f"SELECT rowid, {source} FROM {table} WHERE {column} IS NULL").fetchall()
+    if rows:
+        c.executemany(f"UPDATE {table} SET {column}=? WHERE rowid=?",
+                      [(to_epoch_us(r[1]) or 0, r[0]) for r in rows])
+    c.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{column} ON {table}({column})")
+    conn.commit()
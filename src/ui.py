@@ -1,6 +1,6 @@
 import streamlit as st
-import plotly.express as px
 import pandas as pd
+import plotly.express as px
 
 def apply_custom_styles():
     st.markdown("""
@@ -47,14 +47,10 @@ def apply_custom_styles():
     </style>
     """, unsafe_allow_html=True)
 
-def render_3d_plot(transactions):
-    if not transactions:
-        st.info("Waiting for data stream...")
-        return
-
-    df = pd.DataFrame([vars(t) for t in transactions])
+def render_3d_plot(columns):
+    df = pd.DataFrame(columns)
     if df.empty:
-        st.info("No transaction data available.")
+        st.info("Waiting for data stream...")
         return
 
     fig = px.scatter_3d(
@@ -0,0 +1,62 @@
+import time
+from collections import deque
+
+class RollingCounter:
+    # Keeps the last `size` labels with running per-label counts, so push,
+    # evict and count are all O(1) and memory never exceeds `size` entries
+    def __init__(self, size):
+        self.size = size
+        self.items = deque()
+        self.counts = {}
+        self.total = 0
+
+    def push(self, label):
+        if len(self.items) >= self.size:
+            old = self.items.popleft()
+            self.counts[old] -= 1
+        self.items.append(label)
+        self.counts[label] = self.counts.get(label, 0) + 1
+        self.total += 1
+
+    def count(self, label):
+        return self.counts.get(label, 0)
+
+    def __len__(self):
+        return len(self.items)
+
+class TimeWindowCounter:
+    # Running counts over a sliding time window. Pushes are folded into
+    # `bucket_sec` buckets, so memory is bounded by window_sec / bucket_sec
+    # whatever the event rate, at the cost of bucket-sized edge precision
+    def __init__(self, window_sec, bucket_sec=1.0, clock=time.monotonic):
+        self.window_sec = window_sec
+        self.bucket_sec = bucket_sec
+        self.clock = clock
+        self.buckets = deque()
+        self.counts = {}
+        self.total = 0
+
+    def _evict(self, now):
+        horizon = now - self.window_sec
+        while self.buckets and self.buckets[0][0] + self.bucket_sec <= horizon:
+            _, old = self.buckets.popleft()
+            for label, n in old.items():
+                self.counts[label] -= n
+
+    def push(self, label, now=None):
+        now = self.clock() if now is None else now
+        self._evict(now)
+        start = now - (now % self.bucket_sec)
+        if not self.buckets or self.buckets[-1][0] != start:
+            self.buckets.append((start, {}))
+        bucket = self.buckets[-1][1]
+        bucket[label] = bucket.get(label, 0) + 1
+        self.counts[label] = self.counts.get(label, 0) + 1
+        self.total += 1
+
+    def count(self, label, now=None):
+        self._evict(self.clock() if now is None else now)
+        return self.counts.get(label, 0)
+
+    def __len__(self):
+        return sum(self.counts.values())
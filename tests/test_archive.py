@@ -0,0 +1,35 @@
+from src.archive import ArchiveReader, seal_segment
+
+
+def _row(prefix, i, ts_us):
+    return {"id": f"{prefix}{i:03d}", "ts_us": ts_us, "timestamp": "", "merchant": "Amazon", "amount": float(i),
+            "bank": "HDFC", "status": "Failed" if i % 2 else "Processed", "risk_score": i, "fraud_probability": i / 100,
+            "error_code": None, "retry_count": 0}
+
+
+def _archive(tmp_path):
+    seal_segment([_row("A", i, i) for i in range(100)], str(tmp_path))
+    seal_segment([_row("B", i, 1000 + i) for i in range(50)], str(tmp_path))
+    return ArchiveReader(str(tmp_path))
+
+
+def test_scan_projects_and_prunes(tmp_path):
+    reader = _archive(tmp_path)
+    out = reader.scan(["id", "amount"], [("ts_us", ">=", 1010)])
+    assert set(out) == {"id", "amount"}
+    assert len(out["id"]) == 40
+    assert reader.segments_scanned == 1
+
+
+def test_contains(tmp_path):
+    reader = _archive(tmp_path)
+    assert reader.contains(["A005", "B049", "A999", "C000"]).tolist() == [True, True, False, False]
+
+
+def test_newest_is_newest_first_across_segments(tmp_path):
+    reader = _archive(tmp_path)
+    out = reader.newest(60, ["id"])
+    assert out["id"][0] == "B049" and out["id"][49] == "B000" and out["id"][-1] == "A090"
+    reader.newest(10, ["id"])
+    assert reader.segments_scanned == 1
+    assert len(reader.newest(0, ["id"])["id"]) == 0
@@ -0,0 +1,58 @@
+from src.batching import BatchScheduler, percentile, replay_at_rate
+
+
+def test_percentile_interpolates_between_ranks():
+    assert percentile([], 99) is None
+    assert percentile([5], 99) == 5
+    assert percentile(list(range(101)), 50) == 50
+    values = [0.04] * 49 + [0.372]
+    assert 0.04 < percentile(values, 99) < 0.372
+
+
+def test_slow_start_doubles_under_target():
+    s = BatchScheduler(500, min_batch=2, max_batch=1000, min_samples=1)
+    for _ in range(4):
+        s.record(s.batch_size, 0.001)
+    assert s.batch_size == 32
+    assert s.changes["grow"] == 4
+
+
+def test_shrinks_when_p99_over_budget():
+    s = BatchScheduler(500, min_batch=2, max_batch=1000, initial=200)
+    s.record(200, 0.4)
+    assert s.batch_size == 100
+    assert not s.slow_start
+    assert s.changes["shrink"] == 1
+
+
+def test_one_slow_cycle_at_min_batch_is_forgotten():
+    s = BatchScheduler(500, min_batch=2, max_batch=1000, min_samples=5)
+    s.record(2, 0.372)
+    assert s.batch_size == 2
+    for _ in range(5):
+        s.record(2, 0.02)
+    assert s.batch_size > 2
+
+
+def test_growth_capped_by_projected_p99():
+    # 50 ms fixed + 1 ms per transaction: headroom * cycle budget (200 ms) is reached at 150
+    s = BatchScheduler(500, min_batch=10, max_batch=5000, min_samples=1)
+    for _ in range(30):
+        s.record(s.batch_size, 0.05 + 0.001 * s.batch_size)
+    assert 0.05 + 0.001 * s.batch_size <= s.cycle_budget
+    assert s.batch_size <= 200
+
+
+def test_replay_at_rate_decides_every_item():
+    seen = []
+    latencies, busy = replay_at_rate(list(range(100)), 1000, seen.extend, batch_size=10, wait_sec=0.005)
+    assert seen == list(range(100))
+    assert len(latencies) == 100
+    assert min(latencies) >= 0 and busy >= 0
+
+
+def test_resume_keeps_size_not_latencies():
+    s = BatchScheduler(500, min_batch=2, max_batch=1000)
+    s.resume(5000, 0.1)
+    assert s.batch_size == 1000 and s.interval_sec == 0.1
+    assert s.p99() is None and not s.slow_start
@@ -0,0 +1,40 @@
+import threading
+import time
+from src.tiers import SlowPath, TierLatency
+
+
+def test_submit_never_blocks_when_slow_path_is_full():
+    release = threading.Event()
+
+    def enrich(batch, context):
+        release.wait(5)
+        return []
+
+    latency = TierLatency(200)
+    slow = SlowPath(enrich, latency, max_pending=1)
+    start = time.perf_counter()
+    for i in range(5):
+        slow.submit([i])
+    assert time.perf_counter() - start < 1
+    assert latency.stats["slow_dropped"] >= 3
+    release.set()
+    slow.close()
+
+
+def test_escalations_are_drained_in_order():
+    latency = TierLatency(200)
+    slow = SlowPath(lambda batch, context: list(batch), latency)
+    slow.submit([1, 2])
+    slow.submit([3])
+    slow.join()
+    assert slow.drain() == [1, 2, 3]
+    assert latency.stats["slow_batches"] == 2
+    slow.close()
+
+
+def test_fast_path_over_budget_is_counted():
+    latency = TierLatency(100)
+    latency.observe("fast", 10, 0.01)
+    latency.observe("fast", 10, 0.0001)
+    assert latency.stats["fast_over_budget"] == 1
+    assert set(latency.percentiles("fast")) == {50, 99}